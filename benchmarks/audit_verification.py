@@ -0,0 +1,95 @@
+"""Measure how fast the audit hash chain is verified, in entries per second.
+
+Usage: python -m benchmarks.audit_verification [--entries 500000] [--segment-mb 16] [--processes N] [--new 5000]
+
+A SegmentedAuditLog is filled with status-change entries in a temporary
+directory. It is then verified in full in one process (what rehashing the whole
+chain costs), in full with the segments spread over a process pool, and
+incrementally after `--new` more entries, which only rehashes the entries after
+the last verified checkpoint. Finally one byte of an early entry is changed and
+a full verification must report it.
+
+The pool can only beat one process when there are several segments and as
+many CPU cores.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from services.audit_store import SegmentedAuditLog
+from services.tracking_service import AuditEntry
+
+
+STATUSES = ["submitted", "pending_review", "pending_client", "pending_delivering", "completed"]
+
+
+def make_entries(rng: random.Random, count: int):
+    now = datetime.utcnow()
+    return [
+        AuditEntry(
+            id=str(uuid.uuid4()),
+            action="status_update",
+            entity_type="acat",
+            entity_id=str(uuid.UUID(int=rng.getrandbits(128))),
+            details={"old_status": rng.choice(STATUSES), "new_status": rng.choice(STATUSES), "reason": "benchmark"},
+            performed_by=f"user{rng.randrange(50)}",
+            performed_at=now,
+        )
+        for _ in range(count)
+    ]
+
+
+def timed_verify(log: SegmentedAuditLog, label: str, **options) -> dict:
+    started = time.perf_counter()
+    result = log.verify(**options)
+    elapsed = time.perf_counter() - started
+    assert result["ok"], result["error"]
+    print(f"  {label:<28}{result['checked']:>10,} entries {elapsed * 1000:9.1f} ms {result['checked'] / elapsed:>12,.0f} entries/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=500000)
+    parser.add_argument("--segment-mb", type=int, default=16)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--new", type=int, default=5000, help="entries appended before the incremental check")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix="audit-verification-")
+    try:
+        log = SegmentedAuditLog(directory, segment_bytes=args.segment_mb << 20)
+        started = time.perf_counter()
+        for written in range(0, args.entries, 10000):
+            log.append_entries(make_entries(rng, min(10000, args.entries - written)))
+        print(f"{args.entries:,} entries in {len(log._segments)} segments, written in {time.perf_counter() - started:.1f} s")
+
+        timed_verify(log, "full, 1 process", full=True, processes=1)
+        timed_verify(log, f"full, {args.processes} processes", full=True, processes=args.processes)
+        log.append_entries(make_entries(rng, args.new))
+        timed_verify(log, f"incremental (+{args.new:,})")
+        log.close()
+
+        # Change one digit in an early entry's body; the chain must no longer match
+        first_segment = os.path.join(directory, sorted(name for name in os.listdir(directory) if name.endswith(".log"))[0])
+        with open(first_segment, "r+b") as f:
+            data = f.read(4096)
+            position = data.index(b"user") + 4
+            f.seek(position)
+            f.write(b"9" if data[position:position + 1] != b"9" else b"8")
+        result = SegmentedAuditLog(directory, segment_bytes=args.segment_mb << 20).verify(full=True, processes=args.processes)
+        assert not result["ok"], "tampered entry went unnoticed"
+        print(f"  tampered entry found at position {result['error']['position']}: {result['error']['reason']}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Stress the in-memory tracking stores from several threads and count lost updates.
+
+Usage: python -m benchmarks.concurrent_store [--records 2000] [--updates 10000] [--threads 1,2,4,8]
+
+Every thread applies status updates to records drawn from a small hot set, so
+threads keep colliding on the same records, and lists the whole store every so
+often. Afterwards each record's version and history length are compared with
+the number of updates applied to it; any shortfall is a lost update. The thread
+switch interval is shortened to make races likely rather than lucky.
+
+Under the GIL pure-Python updates do not run in parallel, so throughput stays
+flat or drops as threads are added, and the striped store is no faster than the
+plain one (on one core it is somewhat slower with several threads). All it buys
+is correctness without a store-wide lock, which is why it is not offered as a
+TRACKING_STORE backend.
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from models.acat import ACATStatus
+from benchmarks.memory_layout import make_record
+from services.concurrent_store import ConcurrentACATStore
+from services.tracking_service import AuditLog, InMemoryACATStore
+
+
+STATUSES = [ACATStatus.SUBMITTED, ACATStatus.PENDING_REVIEW, ACATStatus.PENDING_DELIVERING, ACATStatus.PENDING_RECEIVING]
+LIST_EVERY = 2000
+
+
+def run(store_class, records, thread_count: int, updates: int, hot_records: int, seed: int):
+    """Returns (updates per second, lost updates, missing audit entries)."""
+    audit_log = AuditLog()
+    store = store_class(audit_log)
+    store.load(records)
+    hot_ids = [record.id for record in records[:hot_records]]
+    start_versions = {record_id: store.record_version(record_id) for record_id in hot_ids}
+    start_history = {record_id: len(store.get(record_id).status_history) for record_id in hot_ids}
+    applied = Counter()
+    applied_lock = threading.Lock()
+    per_thread = updates // thread_count
+    barrier = threading.Barrier(thread_count + 1)
+
+    def worker(worker_id: int) -> None:
+        rng = random.Random(seed + worker_id)
+        mine = Counter()
+        barrier.wait()
+        for n in range(per_thread):
+            record_id = rng.choice(hot_ids)
+            store.update_status(record_id, rng.choice(STATUSES), "stress test", f"worker-{worker_id}")
+            mine[record_id] += 1
+            if n % LIST_EVERY == 0:
+                store.list()
+        with applied_lock:
+            applied.update(mine)
+
+    threads = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    lost = 0
+    for record_id in hot_ids:
+        record = store.get(record_id)
+        lost += max(
+            start_versions[record_id] + applied[record_id] - record.version,
+            start_history[record_id] + applied[record_id] - len(record.status_history),
+        )
+    missing_audit = per_thread * thread_count - sum(1 for entry in audit_log.get_entries() if entry.action == "status_change")
+    return per_thread * thread_count / elapsed, lost, missing_audit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--updates", type=int, default=10000, help="status updates per run, split across threads")
+    parser.add_argument("--hot", type=int, default=100, help="records the updates are drawn from")
+    parser.add_argument("--threads", default="1,2,4,8")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--switch-interval", type=float, default=1e-5, help="seconds, see sys.setswitchinterval")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    records = [make_record(rng) for _ in range(args.records)]
+    sys.setswitchinterval(args.switch_interval)
+
+    print(f"{args.updates:,} status updates over {args.hot} hot records out of {args.records:,}")
+    for store_class in (InMemoryACATStore, ConcurrentACATStore):
+        print(store_class.__name__)
+        for thread_count in (int(value) for value in args.threads.split(",")):
+            throughput, lost, missing_audit = run(store_class, records, thread_count, args.updates, args.hot, args.seed)
+            print(f"  {thread_count:>2} threads  {throughput:10,.0f} updates/s  lost updates: {lost:<6} missing audit entries: {missing_audit}")
+
+
+if __name__ == "__main__":
+    main()
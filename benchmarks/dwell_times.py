@@ -0,0 +1,94 @@
+"""Time a time-in-status report computed from scratch vs kept up to date by DwellTimeAnalytics.
+
+Usage: python -m benchmarks.dwell_times [--records 50000] [--updates 100] [--rounds 5]
+
+The naive report walks every record's status_history, parses each ISO timestamp
+with datetime.fromisoformat and calls numpy.percentile once per group, which is
+what any ad hoc analysis of the API's records has to do. DwellTimeAnalytics is
+timed for its first (full) build and then, each round, for the refresh and
+report after a batch of status updates, which only reads the changed records.
+Both reports are checked to agree.
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+
+from models.acat import ACATStatus
+from benchmarks.memory_layout import make_record
+from services.dwell_analytics import DwellTimeAnalytics
+from services.tracking_service import InMemoryACATStore
+
+
+PERCENTILES = (50, 90, 95)
+STATUSES = [ACATStatus.PENDING_REVIEW, ACATStatus.PENDING_CLIENT, ACATStatus.PENDING_DELIVERING, ACATStatus.COMPLETED]
+
+
+def naive_report(store) -> dict:
+    """{status: {contra firm: (count, percentiles)}} straight from the records' history."""
+    hours = defaultdict(list)
+    for record in store.list():
+        entered_at = record.created_at
+        for entry in record.status_history:
+            left_at = datetime.fromisoformat(entry["updated_at"])
+            hours[ACATStatus(entry["from_status"]).value, record.acat_data.contra_firm].append(
+                max((left_at - entered_at).total_seconds() / 3600, 0)
+            )
+            entered_at = left_at
+    report = defaultdict(dict)
+    for (status, contra_firm), values in hours.items():
+        report[status][contra_firm] = (len(values), [round(float(value), 2) for value in np.percentile(values, PERCENTILES)])
+    return report
+
+
+def analytics_report(analytics: DwellTimeAnalytics) -> dict:
+    labels = [f"p{percentile:g}" for percentile in PERCENTILES]
+    return {
+        status: {firm: (stats["count"], [stats[label] for label in labels]) for firm, stats in firms.items()}
+        for status, firms in analytics.report(percentiles=PERCENTILES)["by_status_and_contra_firm"].items()
+    }
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--updates", type=int, default=100, help="status updates between reports")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    store = InMemoryACATStore(change_log_size=max(10000, args.updates))
+    store.load([make_record(rng) for _ in range(args.records)])
+    record_ids = [record.id for record in store.list()]
+    analytics = DwellTimeAnalytics(store)
+
+    _, built = timed(lambda: analytics_report(analytics))
+    print(f"{args.records:,} records, {len(analytics):,} completed stays")
+    print(f"  first build + report      {built * 1000:9.1f} ms")
+    naive_total = incremental_total = 0.0
+    for _ in range(args.rounds):
+        for record_id in rng.sample(record_ids, args.updates):
+            store.update_status(record_id, rng.choice(STATUSES), "benchmark", "system")
+        incremental, elapsed = timed(lambda: analytics_report(analytics))
+        incremental_total += elapsed
+        naive, elapsed = timed(lambda: naive_report(store))
+        naive_total += elapsed
+        assert incremental == naive, "incremental report diverged from the naive one"
+    print(f"  naive report              {naive_total / args.rounds * 1000:9.1f} ms per round")
+    print(f"  incremental refresh+report{incremental_total / args.rounds * 1000:9.1f} ms per round ({args.updates} updates)")
+    _, cached = timed(lambda: analytics.report(percentiles=PERCENTILES))
+    print(f"  unchanged store (cached)  {cached * 1000:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Compare the memory footprint of tracking records stored as pydantic models vs CompactRecord.
+
+Usage: python -m benchmarks.memory_layout [--records 100000]
+
+Each layout is built from the same generated transfers while tracemalloc is
+running, and the figures are extrapolated to one million records.
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from models.acat import ACATRecord, ACATRequest, ACATStatus, AssetType, CustomerInfo, Security, TransferType
+from services.compact_records import CompactRecord
+from services.tracking_service import InMemoryACATStore
+
+
+FIRST_NAMES = ["John", "Jane", "Michael", "Sarah", "David", "Lisa", "Robert", "Emily", "James", "Jessica"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis"]
+SECURITIES = [
+    ("037833100", "AAPL", "Apple Inc. Common Stock"),
+    ("594918104", "MSFT", "Microsoft Corporation Common Stock"),
+    ("023135106", "AMZN", "Amazon.com Inc. Common Stock"),
+    ("02079K305", "GOOGL", "Alphabet Inc. Common Stock"),
+    ("88160R101", "TSLA", "Tesla Inc. Common Stock"),
+]
+CONTRA_FIRMS = ["1234", "5678", "9012", "3456", "7890", "2345", "6789", "0123", "4567", "8901"]
+STATUS_PATH = [ACATStatus.SUBMITTED, ACATStatus.PENDING_REVIEW, ACATStatus.COMPLETED]
+
+
+def make_record(rng: random.Random) -> ACATRecord:
+    now = datetime.utcnow()
+    created_at = now - timedelta(days=rng.randint(0, 90), seconds=rng.randint(0, 86400))
+    request = ACATRequest(
+        delivering_account=f"DEL{rng.randint(100000, 999999)}",
+        receiving_account=f"REC{rng.randint(100000, 999999)}",
+        contra_firm=rng.choice(CONTRA_FIRMS),
+        transfer_type=rng.choice([TransferType.FULL, TransferType.PARTIAL]),
+        transfer_date=created_at,
+        securities=[
+            Security(cusip=cusip, symbol=symbol, description=description, quantity=rng.randint(10, 1000), asset_type=AssetType.EQUITY)
+            for cusip, symbol, description in rng.sample(SECURITIES, rng.randint(1, 3))
+        ],
+        customer=CustomerInfo(
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            ssn=f"{rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)}",
+        ),
+        special_instructions="Standard transfer",
+    )
+    history, status, changed_at = [], ACATStatus.NEW, created_at
+    for next_status in STATUS_PATH[:rng.randint(1, len(STATUS_PATH))]:
+        changed_at += timedelta(hours=rng.randint(1, 72))
+        history.append({
+            "from_status": status,
+            "to_status": next_status,
+            "reason": "DTCC cycle update",
+            "updated_by": "system",
+            "updated_at": changed_at.isoformat(),
+        })
+        status = next_status
+    return ACATRecord(
+        id=str(uuid.uuid4()),
+        status=status,
+        acat_data=request,
+        created_at=created_at,
+        updated_at=changed_at,
+        status_history=history,
+    )
+
+
+def measure(build, count: int, seed: int) -> int:
+    """Bytes still allocated after `build` has consumed `count` generated records."""
+    rng = random.Random(seed)
+    gc.collect()
+    tracemalloc.start()
+    holder = build(make_record(rng) for _ in range(count))
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del holder
+    return current
+
+
+def pydantic_layout(records):
+    # The layout InMemoryACATStore used before: id -> ACATRecord
+    return {record.id: record for record in records}
+
+
+def compact_layout(records):
+    compacts = (CompactRecord.from_record(record) for record in records)
+    return {compact.id: compact for compact in compacts}
+
+
+def indexed_store(records):
+    store = InMemoryACATStore()
+    store.load(list(records))
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    scale = 1_000_000 / args.records
+    results = [
+        ("pydantic ACATRecord dict", measure(pydantic_layout, args.records, args.seed)),
+        ("CompactRecord dict", measure(compact_layout, args.records, args.seed)),
+        ("InMemoryACATStore (compact + indexes)", measure(indexed_store, args.records, args.seed)),
+    ]
+    baseline = results[0][1]
+    print(f"{args.records:,} records, extrapolated to 1,000,000")
+    for name, size in results:
+        ratio = "baseline" if size == baseline else f"{baseline / size:.1f}x smaller"
+        print(f"  {name:<40} {size / args.records:8.0f} B/record  {size * scale / 2**20:9.1f} MiB/million  {ratio}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Load-test the API with several uvicorn workers sharing one SHARED_STATE_DB.
+
+Usage: python -m benchmarks.multi_worker [--workers 1,2,4] [--clients 8] [--requests 4000]
+
+For each worker count a fresh database is created and `uvicorn main:app --workers N`
+started on it. Client processes then send a fixed mix of requests, reconnecting
+every so often so the kernel spreads their connections over the workers: status
+updates (each checking the session from a single login), record reads, session
+lookups and learning insights. Afterwards the run is checked for consistency:
+every hot record's version and history must account for every update any worker
+acknowledged, no session lookup may fail, and all workers must report the same
+learning insights.
+
+Throughput can only grow with workers up to the number of CPU cores, and writes
+still take turns on the SQLite write lock.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+STATUSES = ["submitted", "pending_review", "pending_delivering", "pending_receiving"]
+REQUEST_MIX = {"update": 3, "read": 4, "me": 2, "insights": 1}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def call(conn: http.client.HTTPConnection, method: str, path: str, body=None):
+    """(status, parsed JSON body) of one request on a keep-alive connection."""
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    return response.status, json.loads(response.read() or b"null")
+
+
+def start_server(workers: int, port: int, db_path: str) -> subprocess.Popen:
+    env = dict(os.environ, SHARED_STATE_DB=db_path)
+    env.pop("TRACKING_STORE", None)
+    env.pop("TRACKING_DB_PATH", None)
+    env.setdefault("ANTHROPIC_API_KEY", "unused")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if call(http.client.HTTPConnection("127.0.0.1", port, timeout=2), "GET", "/api/health")[0] == 200:
+                return server
+        except OSError:
+            pass
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"uvicorn with {workers} workers did not come up on port {port}")
+
+
+def client(port: int, session_id: str, record_ids: list, count: int, reconnect_every: int, seed: int):
+    """Send `count` requests; returns (updates acknowledged per record, failures per request kind)."""
+    rng = random.Random(seed)
+    kinds, weights = list(REQUEST_MIX), list(REQUEST_MIX.values())
+    applied, failures = Counter(), Counter()
+    conn = None
+    for n in range(count):
+        if n % reconnect_every == 0:
+            if conn:
+                conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        kind = rng.choices(kinds, weights)[0]
+        record_id = rng.choice(record_ids)
+        if kind == "update":
+            status, _ = call(conn, "PATCH", f"/api/tracking/{record_id}/status", {
+                "status": rng.choice(STATUSES), "reason": "load test", "updated_by": "admin",
+                "password": "test", "session_id": session_id,
+            })
+            if status == 200:
+                applied[record_id] += 1
+        elif kind == "read":
+            status, _ = call(conn, "GET", f"/api/tracking/{record_id}")
+        elif kind == "me":
+            status, _ = call(conn, "GET", f"/api/auth/me?session_id={session_id}")
+        else:
+            status, _ = call(conn, "GET", "/api/learning/insights")
+        if status != 200:
+            failures[kind] += 1
+    conn.close()
+    return applied, failures
+
+
+def run(pool, workers: int, clients: int, requests: int, hot_records: int, reconnect_every: int, seed: int):
+    """Returns (requests per second, failed requests, lost updates, distinct learning insights seen)."""
+    port = free_port()
+    with tempfile.TemporaryDirectory() as data_dir:
+        server = start_server(workers, port, os.path.join(data_dir, "state.db"))
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            _, login = call(conn, "POST", "/api/auth/login?username=admin&password=test")
+            _, records = call(conn, "GET", f"/api/tracking?limit={hot_records}")
+            before = {record["id"]: (record["version"], len(record["status_history"])) for record in records}
+
+            per_client = requests // clients
+            started = time.perf_counter()
+            results = pool.starmap(client, [
+                (port, login["session_id"], list(before), per_client, reconnect_every, seed + n) for n in range(clients)
+            ])
+            elapsed = time.perf_counter() - started
+
+            applied, failures = Counter(), Counter()
+            for client_applied, client_failures in results:
+                applied.update(client_applied)
+                failures.update(client_failures)
+            # The setup connection sat idle past uvicorn's keep-alive timeout
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            lost = 0
+            for record_id, (version, history_length) in before.items():
+                _, record = call(conn, "GET", f"/api/tracking/{record_id}")
+                lost += max(
+                    version + applied[record_id] - record["version"],
+                    history_length + applied[record_id] - len(record["status_history"]),
+                )
+            # Fresh connections land on whichever worker accepts them
+            insights = set()
+            for _ in range(workers * 4):
+                fresh = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                insights.add(json.dumps(call(fresh, "GET", "/api/learning/insights")[1], sort_keys=True))
+                fresh.close()
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return per_client * clients / elapsed, sum(failures.values()), lost, len(insights)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--clients", type=int, default=8, help="client processes sending requests")
+    parser.add_argument("--requests", type=int, default=4000, help="requests per run, split across clients")
+    parser.add_argument("--hot", type=int, default=50, help="records the requests are drawn from")
+    parser.add_argument("--reconnect-every", type=int, default=25, help="requests per connection")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{args.requests:,} requests from {args.clients} clients over {args.hot} hot records, {os.cpu_count()} CPUs")
+    with multiprocessing.Pool(args.clients) as pool:
+        for workers in (int(value) for value in args.workers.split(",")):
+            throughput, failed, lost, insights = run(
+                pool, workers, args.clients, args.requests, args.hot, args.reconnect_every, args.seed
+            )
+            print(f"  {workers:>2} workers  {throughput:8,.0f} requests/s  failed: {failed:<5} lost updates: {lost:<5} distinct insights: {insights}")
+
+
+if __name__ == "__main__":
+    main()
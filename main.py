@@ -1,19 +1,38 @@
+import asyncio
+import base64
+import csv
+import hashlib
+import io
+import json
 import os
 import random
-from fastapi import FastAPI, HTTPException, Request
+from datetime import date, datetime
+from typing import AsyncIterator, Literal, Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
 import uvicorn
 
 from models.acat import ACATRequest, ACATValidationResponse, ACATSubmissionRequest
 from services.claude_service import ClaudeACATService
 from services.validation_service import ACATValidationService
-from services.tracking_service import InMemoryACATStore, AuditLog
+from services.tracking_service import IN_FLIGHT_STATUSES, InMemoryACATStore, AuditLog, DuplicateTransfer, VersionConflict, request_fingerprint
+from services.sqlite_store import SQLiteACATStore
+from services.event_store import EventLog, EventSourcedACATStore, EventSourcedAuditLog
 from services.auth_service import SimpleAuthService
 from services.learning_service import ContraFirmLearningService
-from models.acat import ACATRecord, ACATStatus, StatusUpdateRequest, UserRole, UserCreateRequest, OnboardingStep
+from services.shared_state import SharedStateDB, SQLiteAuthService, SQLiteIdempotencyCache, SQLiteLearningService
+from services.idempotency import IdempotencyCache, StoredResponse
+from services.aging_service import AgingService, SettlementHolidayCalendar
+from services.audit_store import SegmentedAuditLog
+from services.audit_writer import AuditWriter
+from services.dwell_analytics import DwellTimeAnalytics
+from services.change_stream import ChangeBroadcaster, format_sse
+from models.acat import ACATRecord, ACATStatus, StatusUpdateRequest, BulkStatusUpdateRequest, UserRole, UserCreateRequest, OnboardingStep
 
 # Load environment variables
 load_dotenv()
@@ -32,15 +51,87 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Idempotent-Replayed"],
 )
 
 # Initialize services
 claude_service = ClaudeACATService()
 validation_service = ACATValidationService()
-audit_log = AuditLog()
-tracking_store = InMemoryACATStore(audit_log)
-auth_service = SimpleAuthService()
-learning_service = ContraFirmLearningService()
+
+
+def create_shared_state():
+    """The database named by SHARED_STATE_DB, or None to keep all state in this process.
+
+    Set it when running several uvicorn workers: users, sessions, learning data
+    and (through a SQLite tracking store on the same file) tracking records are
+    then shared by every worker.
+    """
+    path = os.getenv("SHARED_STATE_DB")
+    return SharedStateDB(path) if path else None
+
+
+def create_tracking_store(shared_state=None):
+    """Pick the tracking store backend from TRACKING_STORE (memory, sqlite or eventlog).
+
+    Returns the audit log together with the store, since the event-sourced
+    backend persists both to the same event log. Other backends keep the audit
+    log in memory, or in segment files under AUDIT_LOG_DIR when that is set.
+    Either way it is wrapped in an AuditWriter, which writes entries in the
+    background once the app has started. In
+    shared-state mode the store must be sqlite, and defaults to the shared
+    database file.
+    """
+    backend = os.getenv("TRACKING_STORE", "sqlite" if shared_state else "memory").lower()
+    change_log_size = int(os.getenv("CHANGE_LOG_SIZE", 10000))
+    audit_dir = os.getenv("AUDIT_LOG_DIR")
+    audit_queue_size = int(os.getenv("AUDIT_QUEUE_SIZE", 10000))
+    if shared_state and backend != "sqlite":
+        raise ValueError(f"TRACKING_STORE={backend} keeps records in one process; SHARED_STATE_DB requires sqlite")
+    if audit_dir and backend == "eventlog":
+        raise ValueError("TRACKING_STORE=eventlog already persists the audit log in its event log; unset AUDIT_LOG_DIR")
+    if audit_dir and shared_state:
+        raise ValueError("AUDIT_LOG_DIR segments are written by a single process; it cannot be combined with SHARED_STATE_DB")
+    if backend == "eventlog":
+        data_dir = os.getenv("EVENT_STORE_DIR", "data")
+        event_log = EventLog(os.path.join(data_dir, "events.log"), fsync=os.getenv("EVENT_LOG_FSYNC", "False").lower() == "true")
+        event_audit_log = AuditWriter(EventSourcedAuditLog(event_log), max_queued=audit_queue_size)
+        store = EventSourcedACATStore(event_log, os.path.join(data_dir, "snapshot.bin"), event_audit_log, change_log_size)
+        replayed = store.recover()
+        print(f"Recovered {len(store)} ACATs from snapshot + {replayed} events")
+        return event_audit_log, store
+    if audit_dir:
+        audit_log = SegmentedAuditLog(
+            audit_dir,
+            segment_bytes=int(os.getenv("AUDIT_SEGMENT_BYTES", 64 << 20)),
+            fsync=os.getenv("AUDIT_LOG_FSYNC", "False").lower() == "true",
+            verify_processes=int(os.getenv("AUDIT_VERIFY_PROCESSES", os.cpu_count() or 1)),
+        )
+    else:
+        audit_log = AuditLog()
+    audit_log = AuditWriter(audit_log, max_queued=audit_queue_size)
+    if backend == "sqlite":
+        path = os.getenv("TRACKING_DB_PATH", shared_state.path if shared_state else "vanta.db")
+        return audit_log, SQLiteACATStore(path, audit_log, change_log_size)
+    if backend != "memory":
+        raise ValueError(f"Unknown TRACKING_STORE backend: {backend}")
+    return audit_log, InMemoryACATStore(audit_log, change_log_size)
+
+
+shared_state = create_shared_state()
+audit_log, tracking_store = create_tracking_store(shared_state)
+auth_service = SQLiteAuthService(shared_state) if shared_state else SimpleAuthService()
+learning_service = SQLiteLearningService(shared_state) if shared_state else ContraFirmLearningService()
+idempotency_max_keys = int(os.getenv("IDEMPOTENCY_MAX_KEYS", 10000))
+idempotency_ttl = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400))
+idempotency_cache = (
+    SQLiteIdempotencyCache(shared_state, idempotency_max_keys, idempotency_ttl) if shared_state
+    else IdempotencyCache(idempotency_max_keys, idempotency_ttl)
+)
+aging_service = AgingService(SettlementHolidayCalendar(
+    date.fromisoformat(day.strip()) for day in os.getenv("SETTLEMENT_EXTRA_HOLIDAYS", "").split(",") if day.strip()
+))
+dwell_analytics = DwellTimeAnalytics(tracking_store)
+change_broadcaster = ChangeBroadcaster(max_queued=int(os.getenv("STREAM_QUEUE_SIZE", 256)))
 
 # Seed dummy data
 def seed_dummy_data():
@@ -155,7 +246,7 @@ def seed_dummy_data():
         record.status = current_status
         record.updated_at = status_date
         record.status_history = status_history
-        tracking_store._records[record.id] = record
+        tracking_store.save(record)
         
         # Record learning data based on outcome
         was_successful = current_status == ACATStatus.COMPLETED
@@ -249,15 +340,57 @@ def generate_daily_acats():
         record = tracking_store.create(acat_request)
         record.created_at = datetime.now()
         record.status = ACATStatus.NEW
-        tracking_store._records[record.id] = record
+        tracking_store.save(record)
     
     print(f"Generated {num_acats} new ACATs for today")
 
-# Seed data on startup
-seed_dummy_data()
+# Seed data on startup (a persistent store keeps what earlier runs created; with
+# shared state only the first worker to start seeds)
+if len(tracking_store) == 0 and (shared_state is None or shared_state.claim("seed_dummy_data")):
+    seed_dummy_data()
+
+    # Generate today's ACATs
+    generate_daily_acats()
+
+
+
+async def _snapshot_periodically(interval: float):
+    """Write a tracking snapshot every `interval` seconds; serialization runs off the event loop."""
+    while True:
+        await asyncio.sleep(interval)
+        if tracking_store.event_log.last_seq == tracking_store.last_snapshot_seq:
+            continue
+        snapshot = tracking_store.capture_snapshot()
+        try:
+            await asyncio.to_thread(tracking_store.write_snapshot, snapshot)
+        except OSError as e:
+            print(f"Snapshot failed: {e}")
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    await audit_log.start()
+    if isinstance(tracking_store, EventSourcedACATStore):
+        interval = float(os.getenv("SNAPSHOT_INTERVAL_SECONDS", 300))
+        app.state.snapshot_task = asyncio.create_task(_snapshot_periodically(interval))
+    if shared_state:
+        app.state.relay_task = asyncio.create_task(_relay_shared_changes(float(os.getenv("STREAM_POLL_SECONDS", 1))))
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    # Flush queued audit entries first, so the snapshot and the audit segments include them
+    await audit_log.stop()
+    if isinstance(tracking_store, EventSourcedACATStore):
+        app.state.snapshot_task.cancel()
+        tracking_store.snapshot()
+        tracking_store.event_log.close()
+    if shared_state:
+        app.state.relay_task.cancel()
+    if isinstance(audit_log.log, SegmentedAuditLog):
+        audit_log.log.close()
+    change_broadcaster.close()
 
-# Generate today's ACATs
-generate_daily_acats()
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -282,6 +415,12 @@ async def validate_acat(acat_request: ACATRequest):
         if not basic_validation.is_valid or basic_validation.suggestions:
             return basic_validation
         
+        # A resubmission of a transfer already in flight would be rejected; skip the AI analysis
+        existing_id = tracking_store.find_duplicate(acat_request)
+        if existing_id:
+            basic_validation.warnings.append(f"Duplicate of in-flight transfer {existing_id}; submitting it again will be rejected")
+            return basic_validation
+        
         # If basic validation passed, use Claude for deeper analysis
         claude_validation = await claude_service.analyze_acat(acat_request)
         
@@ -305,9 +444,68 @@ async def validate_acat(acat_request: ACATRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Validation failed: {str(e)}")
 
+def _request_hash(payload: BaseModel) -> str:
+    # Only what the client sent: defaults such as transfer_date=now differ between retries
+    return hashlib.sha256(payload.json(exclude_unset=True, sort_keys=True).encode()).hexdigest()
+
+
+def _idempotent_replay(idempotency_key: Optional[str], endpoint: str, request_hash: str) -> Optional[Response]:
+    """The stored response when this Idempotency-Key already completed a request, so retries run nothing twice.
+
+    Otherwise the key is reserved for this request until it completes: another
+    request with the key meanwhile gets 409, and _release_key() gives the key
+    back if this one fails.
+    """
+    if idempotency_key is None:
+        return None
+    if not 1 <= len(idempotency_key) <= 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be 1-255 characters")
+    stored = idempotency_cache.reserve(f"{endpoint} {idempotency_key}", request_hash)
+    if stored is None:
+        return None
+    if stored.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+    if stored.in_progress:
+        raise HTTPException(
+            status_code=409, detail="A request with this Idempotency-Key is still in progress", headers={"Retry-After": "1"}
+        )
+    return JSONResponse(stored.body, status_code=stored.status_code, headers={"Idempotent-Replayed": "true"})
+
+
+def _remember_response(idempotency_key: Optional[str], endpoint: str, request_hash: str, body) -> None:
+    # Only successes are kept; a request that failed may be retried with the same key
+    if idempotency_key is not None:
+        idempotency_cache.put(f"{endpoint} {idempotency_key}", StoredResponse(request_hash, 200, jsonable_encoder(body)))
+
+
+def _release_key(idempotency_key: Optional[str], endpoint: str) -> None:
+    # Nothing to release once _remember_response() has stored the response
+    if idempotency_key is not None:
+        idempotency_cache.release(f"{endpoint} {idempotency_key}")
+
+
 @app.post("/api/submit-acat")
-async def submit_acat(submission_request: ACATSubmissionRequest):
-    """Submit corrected ACAT data (placeholder for actual DTCC submission)."""
+async def submit_acat(submission_request: ACATSubmissionRequest, idempotency_key: Optional[str] = Header(None)):
+    """Submit corrected ACAT data (placeholder for actual DTCC submission).
+
+    With an Idempotency-Key header, a retry of a completed submission gets the
+    original response back without submitting, learning or tracking again.
+    """
+    request_hash = _request_hash(submission_request)
+    replay = _idempotent_replay(idempotency_key, "submit-acat", request_hash)
+    if replay:
+        return replay
+    try:
+        return _submit_acat(submission_request, idempotency_key, request_hash)
+    finally:
+        _release_key(idempotency_key, "submit-acat")
+
+
+def _submit_acat(submission_request: ACATSubmissionRequest, idempotency_key: Optional[str], request_hash: str) -> dict:
+    # Refuse resubmissions before anything is sent or learned from them
+    existing_id = tracking_store.find_duplicate(submission_request.acat_data)
+    if existing_id:
+        raise _duplicate_transfer(DuplicateTransfer(existing_id))
     try:
         # In a real implementation, this would submit to DTCC
         # For now, we'll just return a success response
@@ -340,12 +538,15 @@ async def submit_acat(submission_request: ACATSubmissionRequest):
         }
 
         # Create tracking record on submission
-        tracking_record = tracking_store.create(acat_data, created_by="system")
-        tracking_store.update_status(tracking_record.id, ACATStatus.SUBMITTED, "Initial submission", "system")
+        tracking_record = tracking_store.create(acat_data, created_by="system", reject_duplicates=True)
+        tracking_record = tracking_store.update_status(tracking_record.id, ACATStatus.SUBMITTED, "Initial submission", "system")
         submission_response["tracking_id"] = tracking_record.id
         submission_response["tracking_status"] = tracking_record.status
+        _remember_response(idempotency_key, "submit-acat", request_hash, submission_response)
         return submission_response
         
+    except DuplicateTransfer as duplicate:
+        raise _duplicate_transfer(duplicate)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Submission failed: {str(e)}")
 
@@ -361,22 +562,500 @@ async def health_check():
 
 # --- ACAT tracking endpoints ---
 
+def _duplicate_transfer(duplicate: DuplicateTransfer) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"Duplicate of in-flight transfer {duplicate.existing_id}",
+        headers={"Location": f"/api/tracking/{duplicate.existing_id}"},
+    )
+
+
 @app.post("/api/tracking", response_model=ACATRecord)
-async def create_tracking_record(acat_request: ACATRequest):
-    return tracking_store.create(acat_request)
+async def create_tracking_record(acat_request: ACATRequest, idempotency_key: Optional[str] = Header(None)):
+    """Start tracking a transfer; 409 (with the existing record in Location) if the same transfer is already in flight.
+
+    A retry carrying the Idempotency-Key of a completed request gets the original record back.
+    """
+    request_hash = _request_hash(acat_request)
+    replay = _idempotent_replay(idempotency_key, "tracking", request_hash)
+    if replay:
+        return replay
+    try:
+        record = tracking_store.create(acat_request, reject_duplicates=True)
+        _remember_response(idempotency_key, "tracking", request_hash, record)
+    except DuplicateTransfer as duplicate:
+        raise _duplicate_transfer(duplicate)
+    finally:
+        _release_key(idempotency_key, "tracking")
+    return record
+
+
+MAX_BULK_ITEMS = 10000
+
+
+async def _body_lines(head: bytes, chunks) -> AsyncIterator[bytes]:
+    """Lines of a request body whose first bytes (`head`) were already read, split as the rest arrives."""
+    pending = head
+    while True:
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+        try:
+            pending += await chunks.__anext__()
+        except StopAsyncIteration:
+            break
+    yield pending
+
+
+async def _read_bulk_items(request: Request) -> list:
+    """Parse a bulk request body: a JSON array, or NDJSON (one object per line).
+
+    NDJSON is parsed line by line as it arrives, so only a partial line is held
+    back and an oversized batch is refused without reading the rest. A JSON
+    array is read whole first.
+    """
+    chunks = request.stream()
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+    head = b""
+    # Read until the first byte tells an array from NDJSON
+    async for chunk in chunks:
+        head += chunk
+        if ndjson or head.strip():
+            break
+    try:
+        if not ndjson and head.lstrip().startswith(b"["):
+            body = [head]
+            async for chunk in chunks:
+                body.append(chunk)
+            items = json.loads(b"".join(body))
+        else:
+            items = []
+            async for line in _body_lines(head, chunks):
+                if line.strip():
+                    items.append(json.loads(line))
+                    if len(items) > MAX_BULK_ITEMS:
+                        break
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed bulk payload: {str(e)}")
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ITEMS} items per bulk request")
+    return items
+
+
+@app.post("/api/tracking/bulk")
+async def bulk_create_tracking_records(request: Request):
+    """Create many tracking records from a JSON array or NDJSON body.
+
+    Items are validated individually; valid ones are inserted in a single store
+    operation, and invalid ones, and duplicates of an in-flight transfer or of an
+    earlier item, are reported in `results` without failing the batch.
+    """
+    items = await _read_bulk_items(request)
+    results = [None] * len(items)
+    valid_requests, valid_indexes = [], []
+    batch_fingerprints = {}
+    for index, item in enumerate(items):
+        try:
+            acat_request = ACATRequest.parse_obj(item)
+        except ValidationError as e:
+            results[index] = {"index": index, "status": "invalid", "errors": jsonable_encoder(e.errors())}
+            continue
+        existing_id = tracking_store.find_duplicate(acat_request)
+        if existing_id:
+            results[index] = {"index": index, "status": "duplicate", "existing_id": existing_id}
+            continue
+        fingerprint = request_fingerprint(acat_request)
+        if fingerprint in batch_fingerprints:
+            results[index] = {"index": index, "status": "duplicate", "duplicate_of_index": batch_fingerprints[fingerprint]}
+            continue
+        batch_fingerprints[fingerprint] = index
+        valid_requests.append(acat_request)
+        valid_indexes.append(index)
+
+    records = []
+    while valid_requests:
+        try:
+            records = tracking_store.create_many(valid_requests, reject_duplicates=True)
+            break
+        except DuplicateTransfer as duplicate:
+            # Another worker created this transfer since the check above; report it and insert the rest
+            index = valid_indexes.pop(duplicate.index)
+            del valid_requests[duplicate.index]
+            results[index] = {"index": index, "status": "duplicate", "existing_id": duplicate.existing_id}
+    for index, record in zip(valid_indexes, records):
+        results[index] = {"index": index, "status": "created", "id": record.id}
+
+    return {
+        "created": len(records),
+        "failed": len(items) - len(records),
+        "results": results
+    }
+
+
+def _etag(source, *qualifiers) -> str:
+    """Strong ETag for everything a store or service currently holds, from its version counter.
+
+    `qualifiers` distinguish representations that also depend on something else, such as the date.
+    """
+    return '"' + "-".join(str(part) for part in (source.instance_id, source.version, *qualifiers)) + '"'
+
+
+def _cache_headers(etag: str) -> dict:
+    # no-cache lets clients keep the body but revalidate it with If-None-Match on every use
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A bodyless 304 when the client's If-None-Match already names the current ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if "*" in tags or etag in tags:
+        return Response(status_code=304, headers=_cache_headers(etag))
+    return None
+
+
+def _record_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def _parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """The record version named by an If-Match header (`"3"`, `W/"3"` or `3`); None for `*` or no header."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match must name a single record version")
+
+
+def _version_conflict(conflict: VersionConflict) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"Record {conflict.record_id} was changed by someone else (now at version {conflict.actual}, expected {conflict.expected})",
+        headers={"ETag": _record_etag(conflict.actual)},
+    )
+
+
+def _encode_cursor(key) -> str:
+    """Turn a (created_at, id) store key into an opaque continuation token."""
+    created_at, record_id = key
+    raw = json.dumps([created_at.isoformat(), record_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, record_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), str(record_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _parse_fields(fields: str):
+    """Build a pydantic include spec from `id,status,acat_data.contra_firm` style projections."""
+    include = {}
+    for path in (part.strip() for part in fields.split(",")):
+        if not path:
+            continue
+        top, _, nested = path.partition(".")
+        if top not in ACATRecord.__fields__:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {path}")
+        if not nested:
+            include[top] = ...
+        elif top != "acat_data" or nested not in ACATRequest.__fields__:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {path}")
+        elif include.get(top) is not ...:
+            include.setdefault(top, {})[nested] = ...
+    return include or None
+
+
+# What stream events carry per record: the dashboard list columns plus what summaries key on
+STREAM_RECORD_FIELDS = _parse_fields(
+    "id,status,version,created_at,updated_at,acat_data.contra_firm,acat_data.delivering_account,acat_data.receiving_account"
+)
+STREAM_KEEPALIVE_SECONDS = 15
+
+
+def _stream_records(records: list) -> list:
+    """Changed records as streamed, each with its business-day age computed as for the aging report."""
+    ages = aging_service.business_day_ages([record.created_at for record in records], datetime.utcnow().date())
+    return [dict(record.dict(include=STREAM_RECORD_FIELDS), business_days=int(age)) for record, age in zip(records, ages)]
+
+
+def _publish_tracking_change(change_type: str, records: list, version: int) -> None:
+    if len(change_broadcaster):
+        change_broadcaster.publish(
+            change_type,
+            {"version": version, "records": _stream_records(records)},
+            event_id=version,
+        )
+
+
+async def _relay_shared_changes(interval: float):
+    """Shared-state mode: feed the stream from the store's change log, which sees writes from every worker."""
+    since = tracking_store.version
+    while True:
+        await asyncio.sleep(interval)
+        if not len(change_broadcaster):
+            since = tracking_store.version
+            continue
+        changes = await asyncio.to_thread(tracking_store.changes_since, since)
+        if changes["resync_required"]:
+            change_broadcaster.resync()
+            since = changes["version"]
+            continue
+        version = changes["next_since"]
+        saved = [change["record"] for change in changes["changes"] if not change["deleted"]]
+        deleted = [{"id": change["id"]} for change in changes["changes"] if change["deleted"]]
+        if saved:
+            _publish_tracking_change("saved", saved, version)
+        if deleted:
+            change_broadcaster.publish("deleted", {"version": version, "records": deleted}, event_id=version)
+        since = version
+
+
+# Listeners only hear writes made by this process, so shared state polls the change log instead
+if shared_state is None:
+    tracking_store.add_listener(_publish_tracking_change)
 
 
 @app.get("/api/tracking", response_model=list[ACATRecord])
-async def list_tracking_records():
-    return tracking_store.list()
+async def list_tracking_records(
+    request: Request,
+    response: Response,
+    status: Optional[ACATStatus] = None,
+    contra_firm: Optional[str] = None,
+    delivering_account: Optional[str] = None,
+    receiving_account: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """List tracking records, optionally filtered via the store's secondary indexes.
+
+    Passing `limit` (or a `cursor`) pages through records ordered by (created_at, id);
+    the token for the next page is returned in the X-Next-Cursor header. `fields`
+    restricts the serialized attributes, e.g. `id,status,acat_data.contra_firm`.
+    Responses carry an ETag; an unchanged store answers If-None-Match with 304.
+    """
+    etag = _etag(tracking_store)
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+
+    filters = {
+        "status": status,
+        "contra_firm": contra_firm,
+        "delivering_account": delivering_account,
+        "receiving_account": receiving_account,
+        "created_after": created_after,
+        "created_before": created_before,
+    }
+    include = _parse_fields(fields) if fields else None
+
+    if limit is None and cursor is None and include is None:
+        response.headers.update(_cache_headers(etag))
+        if all(value is None for value in filters.values()):
+            return tracking_store.list()
+        return tracking_store.query(**filters)
+
+    headers = _cache_headers(etag)
+    if limit is not None or cursor is not None:
+        after = _decode_cursor(cursor) if cursor else None
+        records, next_key = tracking_store.page(limit or 100, after=after, **filters)
+        if next_key is not None:
+            headers["X-Next-Cursor"] = _encode_cursor(next_key)
+    elif all(value is None for value in filters.values()):
+        records = tracking_store.list()
+    else:
+        records = tracking_store.query(**filters)
+
+    body = "[" + ",".join(record.json(include=include) for record in records) + "]"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+EXPORT_CSV_COLUMNS = [
+    "id", "status", "created_at", "updated_at", "contra_firm", "delivering_account", "receiving_account",
+    "transfer_type", "transfer_date", "customer_name", "securities", "status_changes"
+]
+
+
+def _export_csv_row(record: ACATRecord) -> list:
+    acat_data = record.acat_data
+    return [
+        record.id,
+        ACATStatus(record.status).value,
+        record.created_at.isoformat(),
+        record.updated_at.isoformat(),
+        acat_data.contra_firm,
+        acat_data.delivering_account,
+        acat_data.receiving_account,
+        acat_data.transfer_type.value,
+        acat_data.transfer_date.isoformat(),
+        f"{acat_data.customer.first_name} {acat_data.customer.last_name}",
+        ";".join(f"{security.cusip}:{security.quantity}" for security in acat_data.securities),
+        len(record.status_history),
+    ]
+
+
+@app.get("/api/tracking/export")
+async def export_tracking_records(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    status: Optional[ACATStatus] = None,
+    contra_firm: Optional[str] = None,
+    delivering_account: Optional[str] = None,
+    receiving_account: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+):
+    """Stream tracking records as NDJSON or CSV, one batch at a time, with the list endpoint's filters."""
+    batches = tracking_store.iter_query(
+        status=status,
+        contra_firm=contra_firm,
+        delivering_account=delivering_account,
+        receiving_account=receiving_account,
+        created_after=created_after,
+        created_before=created_before,
+    )
+
+    async def ndjson_chunks():
+        for batch in batches:
+            yield "".join(record.json() + "\n" for record in batch)
+
+    async def csv_chunks():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_CSV_COLUMNS)
+        for batch in batches:
+            for record in batch:
+                writer.writerow(_export_csv_row(record))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    if format == "csv":
+        chunks, media_type = csv_chunks(), "text/csv"
+    else:
+        chunks, media_type = ndjson_chunks(), "application/x-ndjson"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="acats.{format}"'}
+    )
+
+
+@app.get("/api/tracking/stream")
+async def stream_tracking_changes(request: Request):
+    """Server-Sent Events stream of record creations, saves, status changes and deletions."""
+    subscription = change_broadcaster.subscribe()
+
+    async def frames():
+        try:
+            # Clients reconnect after 3s; "ready" tells them which version the stream starts after
+            yield "retry: 3000\n" + format_sse("ready", {"version": tracking_store.version})
+            while not await request.is_disconnected():
+                frame = await subscription.next_frame(STREAM_KEEPALIVE_SECONDS)
+                if frame is None:
+                    return
+                yield frame
+                if frame is ChangeBroadcaster.RESYNC_FRAME:
+                    return
+        finally:
+            change_broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/tracking/changes")
+async def get_tracking_changes(since: int = Query(..., ge=0), limit: int = Query(1000, ge=1, le=10000)):
+    """Records created, updated or deleted after store version `since`; deletions come back as tombstones."""
+    return {"instance_id": tracking_store.instance_id, **tracking_store.changes_since(since, limit)}
+
+
+@app.get("/api/tracking/duplicates")
+async def get_tracking_duplicates(include_closed: bool = False):
+    """Groups of records describing the same transfer; only in-flight ones unless `include_closed` is set."""
+    groups = tracking_store.duplicate_groups(include_closed)
+    return {
+        "groups": len(groups),
+        "duplicate_records": sum(len(group["records"]) - 1 for group in groups),
+        "duplicates": groups,
+    }
+
+
+@app.get("/api/tracking/summary")
+async def get_tracking_summary(request: Request, response: Response):
+    """Status counts, in-progress total and success rate, overall and per contra firm."""
+    etag = _etag(tracking_store)
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    response.headers.update(_cache_headers(etag))
+    return tracking_store.summary()
+
+
+@app.get("/api/tracking/aging")
+async def get_tracking_aging(request: Request, response: Response, as_of: Optional[date] = None, include_records: bool = False):
+    """Business-day aging buckets per status and contra firm, optionally with each record's age."""
+    as_of = as_of or datetime.utcnow().date()
+    etag = _etag(tracking_store, as_of.isoformat())
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    response.headers.update(_cache_headers(etag))
+    return aging_service.report(tracking_store.aging_columns(), as_of=as_of, include_records=include_records)
+
+
+@app.get("/api/tracking/dwell-times")
+async def get_dwell_times(
+    request: Request,
+    response: Response,
+    status: Optional[ACATStatus] = None,
+    contra_firm: Optional[str] = None,
+    since: Optional[date] = None,
+    percentiles: str = "50,90,95",
+):
+    """Time-in-status percentiles (hours) per status, per status and contra firm, and per status and week."""
+    try:
+        levels = tuple(float(value) for value in percentiles.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles must be comma-separated numbers")
+    if not levels or not all(0 <= level <= 100 for level in levels):
+        raise HTTPException(status_code=400, detail="percentiles must be between 0 and 100")
+    parameters = json.dumps([status, contra_firm, since and since.isoformat(), levels])
+    etag = _etag(tracking_store, "dwell", hashlib.sha256(parameters.encode()).hexdigest()[:16])
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    response.headers.update(_cache_headers(etag))
+    # The first report, and the first after a change, reads the store; keep that off the event loop
+    return await asyncio.to_thread(dwell_analytics.report, status=status, contra_firm=contra_firm, since=since, percentiles=levels)
 
 
 @app.get("/api/tracking/{record_id}", response_model=ACATRecord)
-async def get_tracking_record(record_id: str):
+async def get_tracking_record(record_id: str, request: Request, response: Response):
+    """The ETag is the record's version, usable as If-Match when changing its status."""
     try:
-        return tracking_store.get(record_id)
+        etag = _record_etag(tracking_store.record_version(record_id))
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        record = tracking_store.get(record_id)
     except KeyError:
         raise HTTPException(status_code=404, detail="Tracking record not found")
+    response.headers.update(_cache_headers(_record_etag(record.version)))
+    return record
 
 
 @app.post("/api/auth/verify-password")
@@ -392,8 +1071,54 @@ async def verify_password(session_id: str, password: str):
     return {"verified": True}
 
 
+# Declared before /api/tracking/{record_id}/status so "bulk" is not taken for a record id
+@app.patch("/api/tracking/bulk/status")
+async def bulk_update_tracking_status(update_request: BulkStatusUpdateRequest):
+    """Apply many status transitions (e.g. after a DTCC cycle) with a single password check."""
+    user = auth_service.get_user_from_session(update_request.session_id)
+    if not user or not auth_service.verify_password(update_request.password, user.password_hash):
+        raise HTTPException(status_code=403, detail="Invalid password")
+    if user.role == UserRole.READ_ONLY:
+        raise HTTPException(status_code=403, detail="Read-only users cannot change statuses")
+
+    expected_versions = {
+        t.record_id: t.expected_version for t in update_request.transitions if t.expected_version is not None
+    }
+    try:
+        records = tracking_store.update_status_many(
+            [(t.record_id, t.status, t.reason) for t in update_request.transitions],
+            update_request.updated_by,
+            learning_service,
+            expected_versions
+        )
+    except VersionConflict as conflict:
+        raise _version_conflict(conflict)
+    results = []
+    for transition, record in zip(update_request.transitions, records):
+        if record is None:
+            results.append({"record_id": transition.record_id, "status": "not_found"})
+        else:
+            results.append({"record_id": transition.record_id, "status": "updated", "new_status": transition.status})
+
+    updated = sum(1 for record in records if record is not None)
+    return {
+        "updated": updated,
+        "failed": len(records) - updated,
+        "results": results
+    }
+
+
 @app.patch("/api/tracking/{record_id}/status", response_model=ACATRecord)
-async def update_tracking_status(record_id: str, update_request: StatusUpdateRequest):
+async def update_tracking_status(
+    record_id: str,
+    update_request: StatusUpdateRequest,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+):
+    """Change a record's status; `expected_version` (or If-Match) makes it fail with 409 if the record moved on."""
+    expected_version = update_request.expected_version
+    if expected_version is None:
+        expected_version = _parse_if_match(if_match)
     try:
         # Verify password for status changes
         if update_request.password:
@@ -401,9 +1126,15 @@ async def update_tracking_status(record_id: str, update_request: StatusUpdateReq
             if not user or not auth_service.verify_password(update_request.password, user.password_hash):
                 raise HTTPException(status_code=403, detail="Invalid password")
         
-        return tracking_store.update_status(record_id, update_request.status, update_request.reason, update_request.updated_by, learning_service)
+        record = tracking_store.update_status(
+            record_id, update_request.status, update_request.reason, update_request.updated_by, learning_service, expected_version
+        )
     except KeyError:
         raise HTTPException(status_code=404, detail="Tracking record not found")
+    except VersionConflict as conflict:
+        raise _version_conflict(conflict)
+    response.headers["ETag"] = _record_etag(record.version)
+    return record
 
 
 @app.delete("/api/tracking/{record_id}")
@@ -412,6 +1143,23 @@ async def delete_tracking_record(record_id: str):
     return {"status": "deleted"}
 
 
+@app.get("/api/securities/{cusip}/acats")
+async def get_security_acats(cusip: str, request: Request, response: Response, in_flight: bool = False):
+    """Transfers that include a CUSIP, with the quantity each moves; `in_flight=true` skips completed, rejected and cancelled ones."""
+    etag = _etag(tracking_store)
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    positions = tracking_store.security_positions(cusip, IN_FLIGHT_STATUSES if in_flight else None)
+    response.headers.update(_cache_headers(etag))
+    return {
+        "cusip": cusip.upper(),
+        "transfers": len(positions),
+        "total_quantity": sum(position["quantity"] for position in positions),
+        "acats": positions,
+    }
+
+
 # --- Authentication endpoints ---
 
 @app.post("/api/auth/login")
@@ -516,19 +1264,30 @@ async def get_contra_firms():
 # --- Learning and Analytics endpoints ---
 
 @app.get("/api/learning/firm/{contra_firm}")
-async def get_firm_learning(contra_firm: str):
+async def get_firm_learning(contra_firm: str, request: Request, response: Response):
     """Get learning data for a specific contra firm."""
-    return {
+    not_modified = _not_modified(request, _etag(learning_service))
+    if not_modified:
+        return not_modified
+    learning = {
         "contra_firm": contra_firm,
         "preferences": learning_service.get_firm_preferences(contra_firm),
         "common_issues": learning_service.get_common_issues_for_firm(contra_firm),
         "success_rate": learning_service.get_firm_success_rate(contra_firm)
     }
+    # Tagged after reading, since the first lookup of a firm adds it to the learning data
+    response.headers.update(_cache_headers(_etag(learning_service)))
+    return learning
 
 
 @app.get("/api/learning/insights")
-async def get_learning_insights():
+async def get_learning_insights(request: Request, response: Response):
     """Get overall learning insights across all firms."""
+    etag = _etag(learning_service)
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    response.headers.update(_cache_headers(etag))
     return learning_service.get_learning_insights()
 
 
@@ -608,30 +1367,117 @@ async def reject_user(user_id: str, session_id: str):
 
 # --- Audit Log endpoints ---
 
+def _audit_entry_response(entry) -> dict:
+    return {
+        "id": entry.id,
+        "action": entry.action,
+        "entity_type": entry.entity_type,
+        "entity_id": entry.entity_id,
+        "details": entry.details,
+        "performed_by": entry.performed_by,
+        "performed_at": entry.performed_at.isoformat(),
+        "chain_hash": entry.chain_hash
+    }
+
+
 @app.get("/api/audit/changes")
-async def get_audit_log(session_id: str):
-    """Get audit log of all system changes (admin/owner only)."""
+async def get_audit_log(
+    session_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, ge=0),
+    entity_type: Optional[str] = None,
+    action: Optional[str] = None,
+    performed_by: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Get audit log of all system changes, newest first (admin/owner only).
+
+    Returns one page of `limit` entries; the cursor for the next, older page
+    comes back in the X-Next-Cursor header. `since` is inclusive, `until` exclusive.
+    """
     user = auth_service.get_user_from_session(session_id)
     if not user or user.role == UserRole.READ_ONLY:
         raise HTTPException(status_code=403, detail="Admin or Owner access required")
     
-    # Get all audit entries from the audit log
-    entries = audit_log.get_entries()
+    entries, next_cursor = audit_log.page(
+        limit=limit,
+        cursor=cursor,
+        entity_type=entity_type,
+        action=action,
+        performed_by=performed_by,
+        since=since,
+        until=until,
+    )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
     
     # Convert to response format
-    audit_entries = []
-    for entry in entries:
-        audit_entries.append({
-            "id": entry.id,
-            "action": entry.action,
-            "entity_type": entry.entity_type,
-            "entity_id": entry.entity_id,
-            "details": entry.details,
-            "performed_by": entry.performed_by,
-            "performed_at": entry.performed_at.isoformat()
-        })
+    return [_audit_entry_response(entry) for entry in entries]
+
+@app.get("/api/audit/entity/{entity_id}")
+async def get_entity_audit_trail(
+    entity_id: str,
+    session_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, ge=0),
+):
+    """Everything that happened to one entity (e.g. an ACAT record), newest first (admin/owner only).
+
+    Read from the audit log's per-entity index and paged like /api/audit/changes.
+    """
+    user = auth_service.get_user_from_session(session_id)
+    if not user or user.role == UserRole.READ_ONLY:
+        raise HTTPException(status_code=403, detail="Admin or Owner access required")
+    
+    entries, next_cursor = audit_log.entity_entries(entity_id, limit=limit, cursor=cursor)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return [_audit_entry_response(entry) for entry in entries]
+
+@app.get("/api/audit/actor/{username}")
+async def get_actor_audit_trail(
+    username: str,
+    session_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, ge=0),
+):
+    """Everything one user did, newest first (admin/owner only).
+
+    Read from the audit log's per-user index and paged like /api/audit/changes.
+    """
+    user = auth_service.get_user_from_session(session_id)
+    if not user or user.role == UserRole.READ_ONLY:
+        raise HTTPException(status_code=403, detail="Admin or Owner access required")
     
-    return audit_entries
+    entries, next_cursor = audit_log.actor_entries(username, limit=limit, cursor=cursor)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return [_audit_entry_response(entry) for entry in entries]
+
+@app.get("/api/audit/verify")
+async def verify_audit_log(session_id: str, full: bool = False):
+    """Check the audit log's hash chain and checkpoints (admin/owner only).
+
+    Only entries after the last verified checkpoint are rehashed unless `full`.
+    Runs off the event loop; a full check of a segmented log uses a process pool.
+    """
+    user = auth_service.get_user_from_session(session_id)
+    if not user or user.role == UserRole.READ_ONLY:
+        raise HTTPException(status_code=403, detail="Admin or Owner access required")
+    return await asyncio.to_thread(audit_log.verify, full)
+
+@app.get("/api/audit/metrics")
+async def get_audit_metrics(session_id: str):
+    """Background audit writer: queue depth, batches written and flush latency (admin/owner only)."""
+    user = auth_service.get_user_from_session(session_id)
+    if not user or user.role == UserRole.READ_ONLY:
+        raise HTTPException(status_code=403, detail="Admin or Owner access required")
+    return audit_log.metrics()
+
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -107,6 +107,7 @@ class ACATRecord(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     status_history: List[dict] = Field(default_factory=list, description="History of status changes with reasons")
+    version: int = Field(default=1, ge=1, description="Incremented on every change, for optimistic concurrency control")
 
 
 class UserRole(str, Enum):
@@ -154,3 +155,18 @@ class StatusUpdateRequest(BaseModel):
     updated_by: str = Field(..., description="User who made the change")
     password: Optional[str] = Field(None, description="User password for verification")
     session_id: Optional[str] = Field(None, description="User session ID")
+    expected_version: Optional[int] = Field(None, ge=1, description="Reject the change unless the record is still at this version")
+
+
+class StatusTransition(BaseModel):
+    record_id: str = Field(..., description="Tracking record to update")
+    status: ACATStatus = Field(..., description="New status")
+    reason: str = Field(..., min_length=1, max_length=500, description="Reason for status change")
+    expected_version: Optional[int] = Field(None, ge=1, description="Reject the batch unless the record is still at this version")
+
+
+class BulkStatusUpdateRequest(BaseModel):
+    transitions: List[StatusTransition] = Field(..., min_items=1, max_items=10000, description="Status transitions to apply")
+    updated_by: str = Field(..., description="User who made the change")
+    password: str = Field(..., description="User password for verification")
+    session_id: str = Field(..., description="User session ID")
@@ -0,0 +1,135 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+def _easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def _last_weekday(year: int, month: int, weekday: int) -> date:
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: date) -> date:
+    """Saturday holidays are observed on Friday, Sunday holidays on Monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+class SettlementHolidayCalendar:
+    """US equity settlement holidays (the NYSE/NSCC schedule), generated from rules.
+
+    Dates that fall outside the rules (e.g. national days of mourning) can be
+    passed as `extra_holidays`.
+    """
+
+    def __init__(self, extra_holidays: Iterable[date] = ()):
+        self.extra_holidays = set(extra_holidays)
+        self._cache: Dict[int, List[date]] = {}
+
+    def holidays_for_year(self, year: int) -> List[date]:
+        if year not in self._cache:
+            days = [
+                _nth_weekday(year, 1, 0, 3),                 # Martin Luther King Jr. Day
+                _nth_weekday(year, 2, 0, 3),                 # Washington's Birthday
+                _easter(year) - timedelta(days=2),           # Good Friday
+                _last_weekday(year, 5, 0),                   # Memorial Day
+                _observed(date(year, 7, 4)),                 # Independence Day
+                _nth_weekday(year, 9, 0, 1),                 # Labor Day
+                _nth_weekday(year, 11, 3, 4),                # Thanksgiving
+                _observed(date(year, 12, 25)),               # Christmas
+            ]
+            # New Year's Day on a Saturday is not observed on the prior Friday
+            new_year = date(year, 1, 1)
+            if new_year.weekday() != 5:
+                days.append(_observed(new_year))
+            if year >= 2022:
+                days.append(_observed(date(year, 6, 19)))    # Juneteenth
+            days.extend(day for day in self.extra_holidays if day.year == year)
+            self._cache[year] = sorted(days)
+        return self._cache[year]
+
+    def busdaycalendar(self, first_year: int, last_year: int) -> np.busdaycalendar:
+        holidays = [day for year in range(first_year, last_year + 1) for day in self.holidays_for_year(year)]
+        return np.busdaycalendar(weekmask="1111100", holidays=np.array(holidays, dtype="datetime64[D]"))
+
+
+class AgingService:
+    """Business-day age of tracking records, bucketed per status and contra firm.
+
+    Ages are the number of settlement business days from the creation date
+    (inclusive) to `as_of` (exclusive), computed for the whole store at once with
+    numpy.busday_count. Dates are taken in UTC.
+    """
+
+    # Upper bound (inclusive) of each bucket; the last bucket is open-ended
+    BUCKET_LABELS = ("0-5", "6-10", ">10")
+    BUCKET_EDGES = (5, 10)
+
+    def __init__(self, calendar: Optional[SettlementHolidayCalendar] = None):
+        self.calendar = calendar or SettlementHolidayCalendar()
+
+    def business_day_ages(self, created_at: Sequence, as_of: date) -> np.ndarray:
+        """`created_at` holds epoch microseconds or ISO timestamps; returns an int array of ages."""
+        created_days = np.asarray(created_at, dtype="datetime64[us]").astype("datetime64[D]")
+        if created_days.size == 0:
+            return np.zeros(0, dtype=np.int64)
+        first_year = int(str(created_days.min())[:4])
+        calendar = self.calendar.busdaycalendar(min(first_year, as_of.year), as_of.year)
+        ages = np.busday_count(created_days, np.datetime64(as_of, "D"), busdaycal=calendar)
+        return np.clip(ages, 0, None)
+
+    def bucket_indexes(self, ages: np.ndarray) -> np.ndarray:
+        return np.searchsorted(np.array(self.BUCKET_EDGES), ages, side="left")
+
+    def _grouped_counts(self, keys: Sequence[str], buckets: np.ndarray) -> Dict[str, Dict[str, int]]:
+        if buckets.size == 0:
+            return {}
+        labels, inverse = np.unique(np.asarray(keys, dtype=object).astype(str), return_inverse=True)
+        counts = np.bincount(
+            inverse * len(self.BUCKET_LABELS) + buckets,
+            minlength=len(labels) * len(self.BUCKET_LABELS),
+        ).reshape(len(labels), len(self.BUCKET_LABELS))
+        return {
+            str(label): dict(zip(self.BUCKET_LABELS, (int(count) for count in row)))
+            for label, row in zip(labels, counts)
+        }
+
+    def report(self, columns: Dict[str, Sequence], as_of: Optional[date] = None, include_records: bool = False) -> Dict:
+        """Build the aging report from store columns (ids, statuses, contra_firms, created_at)."""
+        as_of = as_of or datetime.utcnow().date()
+        ages = self.business_day_ages(columns["created_at"], as_of)
+        buckets = self.bucket_indexes(ages)
+        overall = np.bincount(buckets, minlength=len(self.BUCKET_LABELS)) if buckets.size else np.zeros(len(self.BUCKET_LABELS), dtype=np.int64)
+        report = {
+            "as_of": as_of.isoformat(),
+            "buckets": list(self.BUCKET_LABELS),
+            "overall": dict(zip(self.BUCKET_LABELS, (int(count) for count in overall))),
+            "by_status": self._grouped_counts(columns["statuses"], buckets),
+            "by_contra_firm": self._grouped_counts(columns["contra_firms"], buckets),
+        }
+        if include_records:
+            report["records"] = dict(zip(columns["ids"], (int(age) for age in ages)))
+        return report
@@ -0,0 +1,662 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from services.audit_chain import GENESIS_HASH, audit_entry_bytes, chain_hash, leaf_hash, merkle_root, verify_run
+from services.compact_records import from_epoch_us, to_epoch_us
+from services.tracking_service import AuditEntry, AuditLog
+
+
+# Frame: body length, performed_at (epoch microseconds), then the JSON body
+_FRAME_HEADER = struct.Struct(">Iq")
+# Sealed segment index file: index interval, entry count, last performed_at, then (performed_at, offset) pairs
+_INDEX_HEADER = struct.Struct(">IQq")
+_INDEX_ENTRY = struct.Struct(">qq")
+# Sealed segment key file: magic and entry count, then per indexed field the postings of
+# every entry sorted by (key hash, position): hashes (u8), offsets (u8), positions (u4)
+_KEYS_HEADER = struct.Struct("<8sQ")
+_KEYS_MAGIC = b"AUDKEYS1"
+# Chain file: the 32-byte chained hash of every entry. Checkpoint file: one record per
+# block of entries: end (local position), byte offset of the end, chained hash, Merkle root
+_HASH_SIZE = 32
+_CHECKPOINT = struct.Struct(">QQ32s32s")
+_SEGMENT_NAME = re.compile(r"^audit-(\d{12})\.log$")
+
+
+class _Segment:
+    """One segment file and its sparse index: the time and byte offset of every `interval`-th entry."""
+
+    __slots__ = ("path", "first_position", "count", "size", "last_time", "times", "offsets", "keys")
+
+    def __init__(self, path: str, first_position: int):
+        self.path = path
+        self.first_position = first_position
+        self.count = 0
+        self.size = 0
+        self.last_time: Optional[int] = None
+        self.times = array("q")
+        self.offsets = array("q")
+        # Postings viewed from the key file, mapped on first lookup
+        self.keys: Optional[Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]] = None
+
+    @property
+    def index_path(self) -> str:
+        return self.path[:-len(".log")] + ".idx"
+
+    @property
+    def keys_path(self) -> str:
+        return self.path[:-len(".log")] + ".keys"
+
+    @property
+    def chain_path(self) -> str:
+        return self.path[:-len(".log")] + ".chain"
+
+    @property
+    def checkpoints_path(self) -> str:
+        return self.path[:-len(".log")] + ".chk"
+
+    def add(self, time_us: int, length: int, interval: int) -> None:
+        """Account for a frame of `length` bytes appended at the current end of the segment."""
+        if self.count % interval == 0:
+            self.times.append(time_us)
+            self.offsets.append(self.size)
+        self.count += 1
+        self.size += length
+        self.last_time = time_us
+
+    def write_index(self, interval: int) -> None:
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(_INDEX_HEADER.pack(interval, self.count, self.last_time if self.last_time is not None else 0))
+            f.write(b"".join(_INDEX_ENTRY.pack(time_us, offset) for time_us, offset in zip(self.times, self.offsets)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.index_path)
+
+    def read_index(self, interval: int) -> bool:
+        """Load the index written when the segment was sealed; False if it is missing, damaged or differently spaced."""
+        try:
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return False
+        if len(data) < _INDEX_HEADER.size or (len(data) - _INDEX_HEADER.size) % _INDEX_ENTRY.size:
+            return False
+        written_interval, count, last_time = _INDEX_HEADER.unpack_from(data)
+        if written_interval != interval:
+            return False
+        self.count = count
+        self.last_time = last_time if self.count else None
+        for time_us, offset in _INDEX_ENTRY.iter_unpack(data[_INDEX_HEADER.size:]):
+            self.times.append(time_us)
+            self.offsets.append(offset)
+        self.size = os.path.getsize(self.path)
+        return True
+
+
+def _key_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "little")
+
+
+def _field_block_size(count: int) -> int:
+    # Padded so the next field's hashes stay 8-byte aligned
+    return 16 * count + (4 * count + 7) // 8 * 8
+
+
+def _write_keys(segment: _Segment, postings: Dict[str, Dict[str, Tuple[array, array]]]) -> None:
+    """Write a sealed segment's key file from {field: {value: (positions, offsets)}}."""
+    temp_path = segment.keys_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(_KEYS_HEADER.pack(_KEYS_MAGIC, segment.count))
+        for field in AuditLog.INDEXED_FIELDS:
+            hashes = np.empty(segment.count, dtype="<u8")
+            offsets = np.empty(segment.count, dtype="<u8")
+            positions = np.empty(segment.count, dtype="<u4")
+            filled = 0
+            for value, (value_positions, value_offsets) in postings[field].items():
+                end = filled + len(value_positions)
+                hashes[filled:end] = _key_hash(value)
+                positions[filled:end] = value_positions
+                offsets[filled:end] = value_offsets
+                filled = end
+            order = np.lexsort((positions, hashes))
+            block = hashes[order].tobytes() + offsets[order].tobytes() + positions[order].tobytes()
+            f.write(block.ljust(_field_block_size(segment.count), b"\0"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, segment.keys_path)
+
+
+def _keys_match(segment: _Segment) -> bool:
+    """Whether the segment's key file exists and was written for all of its entries."""
+    try:
+        with open(segment.keys_path, "rb") as f:
+            header = f.read(_KEYS_HEADER.size)
+            size = os.fstat(f.fileno()).st_size
+    except OSError:
+        return False
+    if len(header) < _KEYS_HEADER.size:
+        return False
+    magic, count = _KEYS_HEADER.unpack(header)
+    return (
+        magic == _KEYS_MAGIC
+        and count == segment.count
+        and size == _KEYS_HEADER.size + len(AuditLog.INDEXED_FIELDS) * _field_block_size(count)
+    )
+
+
+def _map_keys(segment: _Segment) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """{field: (hashes, offsets, positions)} viewed straight from the mapped key file, kept mapped."""
+    if segment.keys is None:
+        with open(segment.keys_path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        count = segment.count
+        keys = {}
+        offset = _KEYS_HEADER.size
+        for field in AuditLog.INDEXED_FIELDS:
+            keys[field] = (
+                np.frombuffer(buf, dtype="<u8", count=count, offset=offset),
+                np.frombuffer(buf, dtype="<u8", count=count, offset=offset + 8 * count),
+                np.frombuffer(buf, dtype="<u4", count=count, offset=offset + 16 * count),
+            )
+            offset += _field_block_size(count)
+        # The arrays keep the mapping alive
+        segment.keys = keys
+    return segment.keys
+
+
+def _frame_headers(buf, offset: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """(offset, frame length, performed_at) of each complete frame in buf[offset:end]."""
+    while offset + _FRAME_HEADER.size <= end:
+        length, time_us = _FRAME_HEADER.unpack_from(buf, offset)
+        frame_length = _FRAME_HEADER.size + length
+        if offset + frame_length > end:
+            return
+        yield offset, frame_length, time_us
+        offset += frame_length
+
+
+def _encode(entry: AuditEntry, time_us: int) -> bytes:
+    # The frame minus its length prefix is exactly what the entry's hash covers
+    data = audit_entry_bytes(entry, time_us)
+    return struct.pack(">I", len(data) - 8) + data
+
+
+def _frame_data(buf, offset: int, frame_length: int) -> bytes:
+    return buf[offset + 4:offset + frame_length]
+
+
+def _decode(buf, offset: int, chain: Optional[bytes] = None) -> Tuple[AuditEntry, int]:
+    """The entry framed at `offset` and the offset of the next frame; `chain` is its recorded chained hash."""
+    length, time_us = _FRAME_HEADER.unpack_from(buf, offset)
+    start = offset + _FRAME_HEADER.size
+    entry_id, action, entity_type, entity_id, details, performed_by = json.loads(buf[start:start + length])
+    # Written by this class from validated entries, so construct() skips re-validation
+    entry = AuditEntry.construct(
+        id=entry_id,
+        action=action,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        details=details,
+        performed_by=performed_by,
+        performed_at=from_epoch_us(time_us),
+        chain_hash=chain.hex() if chain is not None else None,
+    )
+    return entry, start + length
+
+
+def _read_file(path: str) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return b""
+
+
+def _read_checkpoints(path: str) -> List[Tuple[int, int, bytes, bytes]]:
+    """(end, end offset, chained hash, Merkle root) of each whole record in a checkpoint file."""
+    data = _read_file(path)
+    return list(_CHECKPOINT.iter_unpack(data[:len(data) - len(data) % _CHECKPOINT.size]))
+
+
+def _verify_segment(path: str, chain_path: str, checkpoints_path: str, count: int, previous: bytes, start: int, sealed: bool) -> Dict:
+    """verify_run over one segment's first `count` entries from local position `start` (a checkpoint end).
+
+    Reads the files itself, so it runs as well in a worker process. A sealed
+    segment must also end at a checkpoint.
+    """
+    checkpoints = [checkpoint for checkpoint in _read_checkpoints(checkpoints_path) if checkpoint[0] <= count]
+    start_offset = next((checkpoint[1] for checkpoint in checkpoints if checkpoint[0] == start), 0 if start == 0 else None)
+    if start_offset is None:
+        return {"checked": 0, "through": start, "through_hash": previous, "error": {"position": start, "reason": "checkpoint missing"}}
+    chain = _read_file(chain_path)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def records():
+        local = start
+        for offset, frame_length, _ in _frame_headers(buf, start_offset, size):
+            if local >= count:
+                return
+            yield _frame_data(buf, offset, frame_length), chain[local * _HASH_SIZE:(local + 1) * _HASH_SIZE]
+            local += 1
+
+    try:
+        run = verify_run(records(), previous, start, [(end, chained, root) for end, _, chained, root in checkpoints if end > start])
+    finally:
+        if size:
+            buf.close()
+    if run["error"] is None and start + run["checked"] < count:
+        run["error"] = {"position": start + run["checked"], "reason": "entries missing from the segment"}
+    elif run["error"] is None and sealed and run["through"] != count:
+        run["error"] = {"position": run["through"], "reason": "sealed segment does not end at a checkpoint"}
+    return run
+
+
+class SegmentedAuditLog(AuditLog):
+    """AuditLog persisted in append-only segment files under `directory`.
+
+    Entries are length-prefixed JSON frames whose header also carries the
+    timestamp. Once a segment reaches `segment_bytes` it is sealed, and its
+    sparse index (the timestamp and offset of every `index_interval`-th entry)
+    is written next to it, so reopening the log reads indexes instead of
+    scanning years of segments; only the active segment is scanned, and a torn
+    frame at its end is cut off. Segments are named by the position of their
+    first entry, which keeps positions (the pagination cursors) stable across
+    restarts.
+
+    Nothing but the indexes is kept in memory. Reads map segment files with
+    mmap and decode just the index blocks they need: a page costs at most one
+    block beyond its own entries, and a time range bisects first the segments
+    and then their indexes, never touching segments outside it.
+
+    Each sealed segment also gets a key file with the postings of its entries
+    by entity and by user, sorted by a 64-bit hash of the key, so
+    entity_entries() and actor_entries() cost one binary search per segment
+    plus the frames of the entries returned; the active segment's postings
+    are kept in memory.
+
+    Entries are hash-chained across segments: each segment has a chain file
+    with every entry's chained hash and a checkpoint file with the chained
+    hash and Merkle root of every `checkpoint_interval` entries, closed with a
+    final checkpoint when the segment is sealed. Since a segment's checkpoints
+    carry the hash the next one starts from, segments are verified
+    independently, in a process pool for a full verification.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 << 20,
+        index_interval: int = 128,
+        fsync: bool = False,
+        checkpoint_interval: int = 1024,
+        verify_processes: Optional[int] = None,
+    ):
+        super().__init__(checkpoint_interval)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.index_interval = index_interval
+        self.fsync = fsync
+        self.verify_processes = verify_processes
+        os.makedirs(directory, exist_ok=True)
+        self._segments: List[_Segment] = []
+        # First position of each segment, for bisecting
+        self._firsts: List[int] = []
+        # Postings of the active segment: field -> value -> (local positions, frame offsets)
+        self._postings: Dict[str, Dict[str, Tuple[array, array]]] = {}
+        self._open_segments()
+        active = self._segments[-1]
+        if active.last_time is not None:
+            self._latest = from_epoch_us(active.last_time)
+        self._open_files(active)
+
+    def _total(self) -> int:
+        active = self._segments[-1]
+        return active.first_position + active.count
+
+    # --- opening and writing ---
+
+    def _segment_path(self, first_position: int) -> str:
+        return os.path.join(self.directory, f"audit-{first_position:012d}.log")
+
+    def _scan(self, segment: _Segment) -> None:
+        """Rebuild a segment's index from its frame headers; returns with `size` at the intact prefix."""
+        with open(segment.path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if not file_size:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                for _, frame_length, time_us in _frame_headers(buf, 0, file_size):
+                    segment.add(time_us, frame_length, self.index_interval)
+
+    def _scan_keys(self, segment: _Segment) -> Dict[str, Dict[str, Tuple[array, array]]]:
+        """Postings of a segment's entries, decoded from its frames (for segments without a key file)."""
+        postings = {field: {} for field in self.INDEXED_FIELDS}
+        if segment.size:
+            with self._mapped(segment) as buf:
+                offset = 0
+                for local in range(segment.count):
+                    entry, next_offset = _decode(buf, offset)
+                    self._post(postings, entry, local, offset)
+                    offset = next_offset
+        return postings
+
+    @staticmethod
+    def _post(postings: Dict[str, Dict[str, Tuple[array, array]]], entry: AuditEntry, local: int, offset: int) -> None:
+        for field, index in postings.items():
+            positions, offsets = index.setdefault(getattr(entry, field), (array("I"), array("q")))
+            positions.append(local)
+            offsets.append(offset)
+
+    def _recover_chain(self, segment: _Segment, previous: bytes) -> List[bytes]:
+        """Bring a segment's chain and checkpoint files up to its entries, hashing only what they lack.
+
+        `previous` is the chained hash the segment starts from. Sets the head of
+        the chain and returns the leaf hashes after the last checkpoint.
+        """
+        recorded = _read_file(segment.chain_path)
+        recorded = recorded[:min(len(recorded) // _HASH_SIZE, segment.count) * _HASH_SIZE]
+        checkpoints = [checkpoint for checkpoint in _read_checkpoints(segment.checkpoints_path) if checkpoint[0] * _HASH_SIZE <= len(recorded)]
+        start, offset, head = (checkpoints[-1][0], checkpoints[-1][1], checkpoints[-1][2]) if checkpoints else (0, 0, previous)
+        hashes, leaves = bytearray(recorded), []
+        if segment.size:
+            with self._mapped(segment) as buf:
+                for local in range(start, segment.count):
+                    length, _ = _FRAME_HEADER.unpack_from(buf, offset)
+                    frame_length = _FRAME_HEADER.size + length
+                    leaf = leaf_hash(_frame_data(buf, offset, frame_length))
+                    offset += frame_length
+                    if local * _HASH_SIZE < len(recorded):
+                        head = recorded[local * _HASH_SIZE:(local + 1) * _HASH_SIZE]
+                    else:
+                        head = chain_hash(head, leaf)
+                        hashes += head
+                    leaves.append(leaf)
+                    if (local + 1) % self.checkpoint_interval == 0:
+                        checkpoints.append((local + 1, offset, head, merkle_root(leaves)))
+                        leaves = []
+        for path, data in ((segment.chain_path, bytes(hashes)), (segment.checkpoints_path, b"".join(_CHECKPOINT.pack(*checkpoint) for checkpoint in checkpoints))):
+            if _read_file(path) != data:
+                with open(path, "wb") as f:
+                    f.write(data)
+        self._head = head
+        return leaves
+
+    def _chain_sealed(self, segment: _Segment) -> Optional[bytes]:
+        """The chained hash a sealed segment ends with, if its chain and final checkpoint are complete."""
+        checkpoints = _read_checkpoints(segment.checkpoints_path)
+        try:
+            complete = os.path.getsize(segment.chain_path) == segment.count * _HASH_SIZE
+        except OSError:
+            return None
+        return checkpoints[-1][2] if complete and checkpoints and checkpoints[-1][0] == segment.count else None
+
+    def _seal_chain(self, segment: _Segment, leaves: List[bytes], checkpoint_file=None) -> None:
+        """Close a segment's last (partial) block with a checkpoint."""
+        if not leaves:
+            return
+        record = _CHECKPOINT.pack(segment.count, segment.size, self._head, merkle_root(leaves))
+        if checkpoint_file is not None:
+            checkpoint_file.write(record)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        else:
+            with open(segment.checkpoints_path, "ab") as f:
+                f.write(record)
+
+    def _open_segments(self) -> None:
+        names = sorted(
+            (int(match.group(1)), name)
+            for name in os.listdir(self.directory)
+            if (match := _SEGMENT_NAME.match(name))
+        )
+        for n, (first_position, name) in enumerate(names):
+            segment = _Segment(os.path.join(self.directory, name), first_position)
+            sealed = n < len(names) - 1
+            if not (sealed and segment.read_index(self.index_interval)):
+                self._scan(segment)
+                if sealed:
+                    segment.write_index(self.index_interval)
+                elif segment.size != os.path.getsize(segment.path):
+                    # Torn frame from a crash mid-write
+                    with open(segment.path, "r+b") as f:
+                        f.truncate(segment.size)
+            if not sealed:
+                self._postings = self._scan_keys(segment)
+            elif not _keys_match(segment):
+                _write_keys(segment, self._scan_keys(segment))
+            # Segments written before entries were chained get their chain here
+            sealed_head = self._chain_sealed(segment) if sealed else None
+            if sealed_head is not None:
+                self._head = sealed_head
+            else:
+                self._block_leaves = self._recover_chain(segment, self._head)
+                if sealed:
+                    self._seal_chain(segment, self._block_leaves)
+                    self._block_leaves = []
+            self._segments.append(segment)
+            self._firsts.append(first_position)
+        if not self._segments:
+            self._segments.append(_Segment(self._segment_path(0), 0))
+            self._firsts.append(0)
+            self._postings = {field: {} for field in self.INDEXED_FIELDS}
+
+    def _open_files(self, active: _Segment) -> None:
+        self._file = open(active.path, "ab")
+        self._chain_file = open(active.chain_path, "ab")
+        self._checkpoint_file = open(active.checkpoints_path, "ab")
+
+    def _append(self, entries: List[AuditEntry]) -> None:
+        active = self._segments[-1]
+        frames, leaves, hashes = [], [], []
+        for entry in entries:
+            self._latest = max(entry.performed_at, self._latest) if self._latest is not None else entry.performed_at
+            frame = _encode(entry, to_epoch_us(self._latest))
+            frames.append(frame)
+            leaves.append(leaf_hash(frame[4:]))
+            self._head = chain_hash(self._head, leaves[-1])
+            hashes.append(self._head)
+            entry.chain_hash = self._head.hex()
+        # Frames before their hashes: a crash in between leaves hashes to recompute, never hashes without entries
+        for f, data in ((self._file, frames), (self._chain_file, hashes)):
+            f.write(b"".join(data))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        # Only count frames once they are in the file, so readers never map past its end
+        checkpoints = []
+        for entry, frame, leaf, head in zip(entries, frames, leaves, hashes):
+            self._post(self._postings, entry, active.count, active.size)
+            active.add(_FRAME_HEADER.unpack_from(frame)[1], len(frame), self.index_interval)
+            self._block_leaves.append(leaf)
+            if active.count % self.checkpoint_interval == 0:
+                checkpoints.append(_CHECKPOINT.pack(active.count, active.size, head, merkle_root(self._block_leaves)))
+                self._block_leaves = []
+        if checkpoints:
+            self._checkpoint_file.write(b"".join(checkpoints))
+            self._checkpoint_file.flush()
+        if active.size >= self.segment_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        sealed = self._segments[-1]
+        self._seal_chain(sealed, self._block_leaves, self._checkpoint_file)
+        self._block_leaves = []
+        for f in (self._file, self._chain_file, self._checkpoint_file):
+            f.close()
+        sealed.write_index(self.index_interval)
+        _write_keys(sealed, self._postings)
+        self._postings = {field: {} for field in self.INDEXED_FIELDS}
+        active = _Segment(self._segment_path(sealed.first_position + sealed.count), sealed.first_position + sealed.count)
+        self._open_files(active)
+        self._segments.append(active)
+        self._firsts.append(active.first_position)
+
+    def close(self) -> None:
+        with self._lock:
+            for f in (self._file, self._chain_file, self._checkpoint_file):
+                f.close()
+
+    # --- reads ---
+
+    def _first_at_or_after(self, segments: List[_Segment], total: int, time_us: int) -> int:
+        """Position of the first entry performed at or after `time_us` (`total` if none)."""
+        # Only the active segment can be empty; it sorts as if it ended at `time_us`,
+        # and there is nothing in it to map (mmap refuses empty files)
+        n = bisect_left(segments, time_us, key=lambda segment: segment.last_time if segment.count else time_us)
+        if n == len(segments) or not segments[n].count:
+            return total
+        segment = segments[n]
+        block = max(bisect_left(segment.times, time_us) - 1, 0)
+        position = segment.first_position + block * self.index_interval
+        end = segment.first_position + segment.count
+        with self._mapped(segment) as buf:
+            for _, _, frame_time in _frame_headers(buf, segment.offsets[block], segment.size):
+                if position >= end or frame_time >= time_us:
+                    break
+                position += 1
+        return min(position, end)
+
+    def _bounds(self, since: Optional[datetime], until: Optional[datetime]) -> Tuple[int, int]:
+        with self._lock:
+            segments = list(self._segments)
+            total = self._total()
+        start = self._first_at_or_after(segments, total, to_epoch_us(since)) if since is not None else 0
+        end = self._first_at_or_after(segments, total, to_epoch_us(until)) if until is not None else total
+        return start, max(start, end)
+
+    def _mapped(self, segment: _Segment):
+        with open(segment.path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _newest_first(self, start: int, end: int) -> Iterator[Tuple[int, AuditEntry]]:
+        if end <= start:
+            return
+        n = bisect_right(self._firsts, end - 1) - 1
+        while n >= 0:
+            segment = self._segments[n]
+            local_start = max(start - segment.first_position, 0)
+            local_end = min(end - segment.first_position, segment.count)
+            with self._mapped(segment) as buf, open(segment.chain_path, "rb") as chain:
+                block = (local_end - 1) // self.index_interval
+                while block >= 0 and (block + 1) * self.index_interval > local_start:
+                    # Decode the block forward, then hand its entries out newest first
+                    offset = segment.offsets[block]
+                    first = block * self.index_interval
+                    chain.seek(first * _HASH_SIZE)
+                    hashes = chain.read((min(first + self.index_interval, local_end) - first) * _HASH_SIZE)
+                    decoded = []
+                    for local in range(first, min(first + self.index_interval, local_end)):
+                        entry, offset = _decode(buf, offset, hashes[(local - first) * _HASH_SIZE:(local - first + 1) * _HASH_SIZE])
+                        if local >= local_start:
+                            decoded.append((segment.first_position + local, entry))
+                    yield from reversed(decoded)
+                    block -= 1
+            if segment.first_position <= start:
+                return
+            n -= 1
+
+    def _indexed(self, field: str, value: str, limit: int, cursor: Optional[int]) -> Tuple[List[AuditEntry], Optional[int]]:
+        with self._lock:
+            segments = list(self._segments)
+            firsts = list(self._firsts)
+            total = self._total()
+            # Copied so appends can carry on while the sealed segments are searched
+            active_positions, active_offsets = (array(kind, values) for kind, values in zip("Iq", self._postings[field].get(value, ((), ()))))
+        end = min(cursor, total) if cursor is not None else total
+        key_hash = np.uint64(_key_hash(value))
+        found: List[Tuple[int, AuditEntry]] = []
+        # One entry past the page tells whether there is another
+        for n in range(bisect_right(firsts, end - 1) - 1, -1, -1):
+            segment = segments[n]
+            local_end = end - segment.first_position
+            if n == len(segments) - 1:
+                cut = bisect_left(active_positions, local_end)
+                positions, offsets = active_positions[:cut], active_offsets[:cut]
+            else:
+                hashes, all_offsets, all_positions = _map_keys(segment)[field]
+                low, high = np.searchsorted(hashes, key_hash, "left"), np.searchsorted(hashes, key_hash, "right")
+                # Positions are sorted within a hash, so the cursor cuts the run in two
+                high = low + int(np.searchsorted(all_positions[low:high], local_end, "left"))
+                positions, offsets = all_positions[low:high].tolist(), all_offsets[low:high].tolist()
+            if not positions:
+                continue
+            with self._mapped(segment) as buf, open(segment.chain_path, "rb") as chain:
+                for local, offset in zip(reversed(positions), reversed(offsets)):
+                    entry, _ = _decode(buf, offset)
+                    # Another key can share the hash
+                    if getattr(entry, field) == value:
+                        chain.seek(local * _HASH_SIZE)
+                        entry.chain_hash = chain.read(_HASH_SIZE).hex()
+                        found.append((segment.first_position + local, entry))
+                        if len(found) > limit:
+                            return [entry for _, entry in found[:limit]], found[limit - 1][0]
+        return [entry for _, entry in found], None
+
+    # --- verification ---
+
+    def chain_head(self) -> Dict:
+        with self._lock:
+            return {"position": self._total(), "chain_hash": self._head.hex()}
+
+    def verify(self, full: bool = False, processes: Optional[int] = None) -> Dict:
+        """Verify the segments from the last verified checkpoint (from the start if `full`).
+
+        Each segment is checked on its own, starting from the chained hash the
+        segment before it ends with; with `processes` (default
+        `verify_processes`) above one they are checked in a process pool.
+        """
+        with self._lock:
+            segments = [(segment, segment.count) for segment in self._segments]
+            head = {"position": self._total(), "chain_hash": self._head.hex()}
+            start, previous = (0, GENESIS_HASH) if full else self._verified
+        n = bisect_right([segment.first_position for segment, _ in segments], start) - 1
+        tasks = []
+        for n, (segment, count) in enumerate(segments[n:], n):
+            local_start = max(start - segment.first_position, 0)
+            if local_start == count and n < len(segments) - 1:
+                continue
+            if local_start == 0 and n > 0:
+                # Where the segment before ends; a tampered final checkpoint fails that segment's check
+                checkpoints = _read_checkpoints(segments[n - 1][0].checkpoints_path)
+                previous = checkpoints[-1][2] if checkpoints else GENESIS_HASH
+            tasks.append((segment.first_position, (
+                segment.path, segment.chain_path, segment.checkpoints_path,
+                count, previous, local_start, n < len(segments) - 1,
+            )))
+        processes = processes or self.verify_processes
+        if processes and processes > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(min(processes, len(tasks))) as pool:
+                runs = list(pool.map(_verify_segment, *zip(*(arguments for _, arguments in tasks))))
+        else:
+            runs = []
+            for _, arguments in tasks:
+                runs.append(_verify_segment(*arguments))
+                if runs[-1]["error"] is not None:
+                    break
+        checked, error, through = 0, None, (start, previous)
+        for (first_position, _), run in zip(tasks, runs):
+            checked += run["checked"]
+            if run["error"] is not None:
+                error = dict(run["error"], position=first_position + run["error"]["position"])
+                break
+            through = (first_position + run["through"], run["through_hash"])
+        return self._verified_result(full, checked, error, through, head)
+
+    def get_entries(self) -> List[AuditEntry]:
+        """Get all audit entries, newest first; this reads the whole log into memory."""
+        with self._lock:
+            total = self._total()
+        return [entry for _, entry in self._newest_first(0, total)]
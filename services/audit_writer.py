@@ -0,0 +1,192 @@
+import asyncio
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from services.tracking_service import AuditEntry, AuditLog
+
+
+class AuditWriter:
+    """Writes audit entries to an AuditLog from a background task, off the request path.
+
+    log_action()/log_actions() only timestamp the actions and put them on a
+    bounded asyncio queue; a single writer task takes whatever has queued up and
+    commits it as one batch (building the AuditEntry models and doing the I/O in
+    a worker thread), so batches grow on their own while a previous one is
+    written. Everything else (page(), get_entries(), restore_entry(), ...) goes
+    straight to the wrapped log, which only shows entries once they are written.
+
+    Memory is bounded by `max_queued` waiting entries. When the queue is full,
+    the next caller writes it out inline before queuing its own actions, so
+    producers slow down to the speed of the log. Callers on other threads hand
+    their actions to the event loop and return without waiting for it: they may
+    hold locks a request on the loop is waiting for. Before start() and after
+    stop() entries are written synchronously.
+    """
+
+    def __init__(self, log: AuditLog, max_queued: int = 10000, max_batch: int = 1000):
+        self.log = log
+        self.max_queued = max_queued
+        self.max_batch = max_batch
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Held while a batch is written, so inline flushes cannot overtake the writer task
+        self._write_lock = threading.Lock()
+        self._latest: Optional[datetime] = None
+        self._metrics = {
+            "batches": 0,
+            "entries": 0,
+            "inline_flushes": 0,
+            "max_queue_depth": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    def __getattr__(self, name):
+        # Only called for attributes AuditWriter does not define itself
+        if name == "log":
+            raise AttributeError(name)
+        return getattr(self.log, name)
+
+    # --- lifecycle ---
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._queue = asyncio.Queue(self.max_queued)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Write out everything queued, then go back to writing synchronously."""
+        if self._task is None:
+            return
+        # Let actions handed over by other threads reach the queue first
+        await asyncio.sleep(0)
+        await self._queue.join()
+        self._task.cancel()
+        self._task = None
+
+    # --- producers ---
+
+    def log_action(self, action: str, entity_type: str, entity_id: str, details: Dict, performed_by: str) -> None:
+        self.log_actions([{
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "details": details,
+            "performed_by": performed_by
+        }])
+
+    def log_actions(self, actions: List[Dict]) -> None:
+        """Queue a batch of actions (log_action keyword arguments); they are written shortly after."""
+        if not actions:
+            return
+        if self._task is None:
+            self._write_now(actions)
+        elif threading.get_ident() == self._loop_thread:
+            self._enqueue(actions)
+        else:
+            try:
+                # Queued (or, when full, written inline) once the loop gets to it
+                self._loop.call_soon_threadsafe(self._enqueue, actions)
+            except RuntimeError:
+                # The loop has closed under us
+                self._write_now(actions)
+
+    def _write_now(self, actions: List[Dict]) -> None:
+        with self._write_lock:
+            self._write([self._stamp(action) for action in actions])
+
+    def _stamp(self, action: Dict) -> Tuple[datetime, Dict]:
+        # Only ever called on one thread at a time (the loop, or under the write lock when not running)
+        now = datetime.utcnow()
+        self._latest = now if self._latest is None or now > self._latest else self._latest
+        return self._latest, action
+
+    def _enqueue(self, actions: List[Dict]) -> None:
+        """On the event loop: queue the actions, or write the queue out inline if it is full."""
+        if self._task is None:
+            # Handed over by another thread just before stop()
+            self._write_now(actions)
+            return
+        for action in actions:
+            if self._queue.full():
+                self._flush_inline()
+            self._queue.put_nowait(self._stamp(action))
+        self._metrics["max_queue_depth"] = max(self._metrics["max_queue_depth"], self._queue.qsize())
+
+    def _flush_inline(self) -> None:
+        self._metrics["inline_flushes"] += 1
+        batch = self._drain(self._queue.qsize())
+        # Waits for a batch the writer task may have in flight, which was queued earlier
+        self._write_lock.acquire()
+        self._write_and_release(batch)
+        for _ in batch:
+            self._queue.task_done()
+
+    # --- writer ---
+
+    def _drain(self, limit: int) -> List[Tuple[datetime, Dict]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            batch.extend(self._drain(self.max_batch - 1))
+            # Taken on the loop and released by the worker thread once written, so an
+            # inline flush that starts in between waits for this (earlier) batch
+            self._write_lock.acquire()
+            try:
+                await asyncio.to_thread(self._write_and_release, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_and_release(self, batch: List[Tuple[datetime, Dict]]) -> None:
+        started = time.perf_counter()
+        try:
+            self._write(batch)
+        finally:
+            self._write_lock.release()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics = self._metrics
+        metrics["batches"] += 1
+        metrics["entries"] += len(batch)
+        metrics["last_flush_ms"] = elapsed_ms
+        metrics["max_flush_ms"] = max(metrics["max_flush_ms"], elapsed_ms)
+        metrics["total_flush_ms"] += elapsed_ms
+
+    def _write(self, batch: List[Tuple[datetime, Dict]]) -> None:
+        self.log.append_entries([
+            AuditEntry(id=str(uuid.uuid4()), performed_at=performed_at, **action)
+            for performed_at, action in batch
+        ])
+
+    def metrics(self) -> Dict:
+        """Queue depth and capacity, batch counts and flush latency (milliseconds)."""
+        metrics = self._metrics
+        return {
+            "running": self._task is not None,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_capacity": self.max_queued,
+            "max_queue_depth": metrics["max_queue_depth"],
+            "batches": metrics["batches"],
+            "entries": metrics["entries"],
+            "inline_flushes": metrics["inline_flushes"],
+            "flush_latency_ms": {
+                "last": round(metrics["last_flush_ms"], 3),
+                "avg": round(metrics["total_flush_ms"] / metrics["batches"], 3) if metrics["batches"] else 0.0,
+                "max": round(metrics["max_flush_ms"], 3),
+            },
+        }
@@ -40,7 +40,7 @@ class SimpleAuthService:
             role=UserRole.OWNER,
             is_approved=True
         )
-        self._users[owner_user.id] = owner_user
+        self._add_user(owner_user)
         
         # Full access user
         full_user = User(
@@ -54,7 +54,7 @@ class SimpleAuthService:
             role=UserRole.FULL,
             is_approved=True
         )
-        self._users[full_user.id] = full_user
+        self._add_user(full_user)
         
         # Read-only user
         read_user = User(
@@ -68,30 +68,45 @@ class SimpleAuthService:
             role=UserRole.READ_ONLY,
             is_approved=True
         )
-        self._users[read_user.id] = read_user
+        self._add_user(read_user)
     
-    def authenticate(self, username: str, password: str) -> Optional[User]:
-        """Authenticate user with username and password."""
+    def _add_user(self, user: User) -> bool:
+        """Store a new user; False if the username is already taken."""
+        if self._find_user(user.username):
+            return False
+        self._users[user.id] = user
+        return True
+    
+    def _find_user(self, username: str) -> Optional[User]:
         for user in self._users.values():
             if user.username == username:
-                # Verify password
-                if not self._verify_password(password, user.password_hash):
-                    return None
-                # Check if user is approved
-                if not user.is_approved:
-                    return None
-                # Update last login
-                user.last_login = datetime.utcnow()
                 return user
         return None
     
+    def _update_user(self, user_id: str, **changes) -> Optional[User]:
+        """Set fields on a stored user; None if there is no such user."""
+        user = self._users.get(user_id)
+        if user:
+            for field, value in changes.items():
+                setattr(user, field, value)
+        return user
+    
+    def authenticate(self, username: str, password: str) -> Optional[User]:
+        """Authenticate user with username and password."""
+        user = self._find_user(username)
+        if user:
+            # Verify password
+            if not self._verify_password(password, user.password_hash):
+                return None
+            # Check if user is approved
+            if not user.is_approved:
+                return None
+            # Update last login
+            return self._update_user(user.id, last_login=datetime.utcnow())
+        return None
+    
     def create_user(self, username: str, password: str, first_name: str, last_name: str, email: str, phone_number: str = None, role: UserRole = UserRole.READ_ONLY) -> Optional[User]:
         """Create a new user."""
-        # Check if username already exists
-        for user in self._users.values():
-            if user.username == username:
-                return None
-        
         # Owner accounts are auto-approved, others need approval
         is_approved = (role == UserRole.OWNER)
         
@@ -107,15 +122,14 @@ class SimpleAuthService:
             is_approved=is_approved,
             is_onboarded=False
         )
-        self._users[new_user.id] = new_user
+        # Fails if the username already exists
+        if not self._add_user(new_user):
+            return None
         return new_user
     
     def update_user_onboarding(self, user_id: str, is_onboarded: bool = True) -> bool:
         """Update user onboarding status."""
-        if user_id in self._users:
-            self._users[user_id].is_onboarded = is_onboarded
-            return True
-        return False
+        return self._update_user(user_id, is_onboarded=is_onboarded) is not None
     
     def create_session(self, user: User) -> str:
         """Create a session for the user."""
@@ -144,15 +158,11 @@ class SimpleAuthService:
     
     def get_pending_users(self) -> list[User]:
         """Get all users pending approval."""
-        return [user for user in self._users.values() if not user.is_approved and user.role != UserRole.OWNER]
+        return [user for user in self.get_all_users() if not user.is_approved and user.role != UserRole.OWNER]
     
     def approve_user(self, user_id: str, approver_username: str) -> bool:
         """Approve a user account (owner only)."""
-        if user_id in self._users:
-            self._users[user_id].is_approved = True
-            self._users[user_id].approved_by = approver_username
-            return True
-        return False
+        return self._update_user(user_id, is_approved=True, approved_by=approver_username) is not None
     
     def reject_user(self, user_id: str) -> bool:
         """Reject and delete a user account (owner only)."""
@@ -0,0 +1,102 @@
+import asyncio
+import json
+from typing import Dict, Optional, Set
+
+from pydantic.json import pydantic_encoder
+
+
+def format_sse(event_type: str, data: Dict, event_id: Optional[int] = None) -> str:
+    """One Server-Sent Events frame."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append("data: " + json.dumps(data, default=pydantic_encoder, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """A subscriber's bounded queue of pre-formatted SSE frames."""
+
+    def __init__(self, max_queued: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self.closed = False
+
+    async def next_frame(self, timeout: float) -> Optional[str]:
+        """The next frame; a keepalive comment if nothing arrived within `timeout` seconds.
+
+        Returns None once the broadcaster has closed the stream.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return ": keepalive\n\n"
+
+
+class ChangeBroadcaster:
+    """Fans tracking store changes out to stream subscribers.
+
+    Each change is serialized once and the same frame is queued for every
+    subscriber. Queues are bounded: a subscriber that falls `max_queued` frames
+    behind has its backlog dropped and receives a single `resync` frame, after
+    which its stream ends, so one slow client can never hold memory for everyone
+    else. Clients reload the full list on resync and reconnect.
+    """
+
+    RESYNC_FRAME = format_sse("resync", {"reason": "slow consumer"})
+
+    def __init__(self, max_queued: int = 256):
+        self.max_queued = max_queued
+        self._subscribers: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(self.max_queued)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.closed = True
+        self._subscribers.discard(subscription)
+
+    def publish(self, event_type: str, data: Dict, event_id: Optional[int] = None) -> None:
+        """Queue a change for every subscriber; safe to call from any thread."""
+        if not self._subscribers or self._loop is None:
+            return
+        frame = format_sse(event_type, data, event_id)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(frame)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, frame)
+
+    def _deliver(self, frame: str) -> None:
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription, final_frame: Optional[str] = RESYNC_FRAME) -> None:
+        """Replace a subscriber's backlog with a final frame and stop feeding it."""
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(final_frame)
+        self.unsubscribe(subscription)
+
+    def resync(self) -> None:
+        """Tell every subscriber to reload (e.g. changes were missed); each gets a resync frame and its stream ends."""
+        for subscription in list(self._subscribers):
+            self._drop(subscription)
+
+    def close(self) -> None:
+        """End every stream (e.g. on shutdown); subscribers receive None as their last frame."""
+        for subscription in list(self._subscribers):
+            self._drop(subscription, None)
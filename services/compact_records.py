@@ -0,0 +1,199 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from models.acat import (
+    ACATRecord,
+    ACATRequest,
+    ACATStatus,
+    AssetType,
+    CustomerInfo,
+    Security,
+    TransferType,
+)
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_epoch_us(value: datetime) -> int:
+    """Microseconds since the Unix epoch; aware datetimes are converted to UTC first."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def from_epoch_us(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+def _history_timestamp(value):
+    """History timestamps are ISO strings in the API; keep them as integers when they round-trip exactly."""
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+        if parsed.tzinfo is None and parsed.isoformat() == value:
+            return to_epoch_us(parsed)
+        return value
+    if isinstance(value, datetime):
+        return to_epoch_us(value)
+    return value
+
+
+def _history_entry(row: Tuple) -> Dict:
+    from_status, to_status, reason, updated_by, updated_at = row
+    return {
+        "from_status": from_status,
+        "to_status": to_status,
+        "reason": reason,
+        "updated_by": updated_by,
+        "updated_at": from_epoch_us(updated_at).isoformat() if isinstance(updated_at, int) else updated_at,
+    }
+
+
+def compact_history_entry(entry: Dict) -> Tuple:
+    return (
+        ACATStatus(entry["from_status"]),
+        ACATStatus(entry["to_status"]),
+        _intern(entry["reason"]),
+        _intern(entry["updated_by"]),
+        _history_timestamp(entry["updated_at"]),
+    )
+
+
+class CompactRecord:
+    """Memory-lean internal form of an ACATRecord.
+
+    Enum values are stored as their (shared) members, repeated strings such as
+    contra firms, symbols and reasons are interned, timestamps are integer
+    microseconds since the epoch (naive UTC), and the nested request, securities,
+    customer and status history are plain tuples. Pydantic models are only built
+    again by to_record(), at the API boundary.
+    """
+
+    __slots__ = (
+        "id",
+        "status",
+        "contra_firm",
+        "delivering_account",
+        "receiving_account",
+        "created_at",
+        "updated_at",
+        "version",
+        "request",
+        "history",
+    )
+
+    def __init__(self, record_id, status, contra_firm, delivering_account, receiving_account, created_at, updated_at, version, request, history):
+        self.id = record_id
+        self.status = status
+        self.contra_firm = contra_firm
+        self.delivering_account = delivering_account
+        self.receiving_account = receiving_account
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.version = version
+        # (transfer_type, transfer_date, securities, customer, special_instructions, account_type)
+        self.request = request
+        # Tuple of (from_status, to_status, reason, updated_by, updated_at) tuples
+        self.history = history
+
+    @classmethod
+    def from_record(cls, record: ACATRecord) -> "CompactRecord":
+        acat_data = record.acat_data
+        customer = acat_data.customer
+        securities = tuple(
+            (
+                _intern(security.cusip),
+                _intern(security.symbol),
+                _intern(security.description),
+                security.quantity,
+                AssetType(security.asset_type),
+            )
+            for security in acat_data.securities
+        )
+        request = (
+            TransferType(acat_data.transfer_type),
+            to_epoch_us(acat_data.transfer_date),
+            securities,
+            (
+                customer.first_name,
+                customer.last_name,
+                customer.ssn,
+                customer.tax_id,
+                to_epoch_us(customer.date_of_birth) if customer.date_of_birth is not None else None,
+            ),
+            _intern(acat_data.special_instructions),
+            _intern(acat_data.account_type),
+        )
+        return cls(
+            record.id,
+            ACATStatus(record.status),
+            _intern(acat_data.contra_firm),
+            acat_data.delivering_account,
+            acat_data.receiving_account,
+            to_epoch_us(record.created_at),
+            to_epoch_us(record.updated_at),
+            record.version,
+            request,
+            tuple(compact_history_entry(entry) for entry in record.status_history),
+        )
+
+    def quantities_by_cusip(self) -> Dict[str, int]:
+        """Total quantity transferred per CUSIP (a CUSIP may be listed more than once)."""
+        quantities: Dict[str, int] = {}
+        for cusip, _, _, quantity, _ in self.request[2]:
+            quantities[cusip] = quantities.get(cusip, 0) + quantity
+        return quantities
+
+    def to_record(self) -> ACATRecord:
+        transfer_type, transfer_date, securities, customer, special_instructions, account_type = self.request
+        first_name, last_name, ssn, tax_id, date_of_birth = customer
+        # Everything was validated when the record came in, so construct() skips re-validation
+        acat_data = ACATRequest.construct(
+            delivering_account=self.delivering_account,
+            receiving_account=self.receiving_account,
+            contra_firm=self.contra_firm,
+            transfer_type=transfer_type,
+            transfer_date=from_epoch_us(transfer_date),
+            securities=[
+                Security.construct(cusip=cusip, symbol=symbol, description=description, quantity=quantity, asset_type=asset_type)
+                for cusip, symbol, description, quantity, asset_type in securities
+            ],
+            customer=CustomerInfo.construct(
+                first_name=first_name,
+                last_name=last_name,
+                ssn=ssn,
+                tax_id=tax_id,
+                date_of_birth=from_epoch_us(date_of_birth) if date_of_birth is not None else None,
+            ),
+            special_instructions=special_instructions,
+            account_type=account_type,
+        )
+        return ACATRecord.construct(
+            id=self.id,
+            status=self.status,
+            acat_data=acat_data,
+            created_at=from_epoch_us(self.created_at),
+            updated_at=from_epoch_us(self.updated_at),
+            status_history=[_history_entry(row) for row in self.history],
+            version=self.version,
+        )
+
+    def replace(self, **changes) -> "CompactRecord":
+        """A copy with some fields changed; stored records are replaced rather than mutated."""
+        return CompactRecord(*(changes[name] if name in changes else getattr(self, name) for name in self.__slots__))
+
+    def as_tuple(self) -> Tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    @classmethod
+    def from_tuple(cls, values: Tuple) -> "CompactRecord":
+        return cls(*values)
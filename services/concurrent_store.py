@@ -0,0 +1,122 @@
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models.acat import ACATRecord, ACATRequest, ACATStatus
+from services.compact_records import CompactRecord
+from services.tracking_service import AuditLog, InMemoryACATStore
+
+
+class ConcurrentACATStore(InMemoryACATStore):
+    """InMemoryACATStore that can be shared by threads (threadpool endpoints, background jobs).
+
+    Writers lock only the records they touch: record ids are striped over a fixed
+    set of locks, so the read-modify-write of one record (version check, history
+    append) never waits on updates to unrelated records. The shared indexes,
+    counters and change log are updated under one short structure lock.
+
+    Stored records are immutable copies, so reads that only need records take no
+    lock at all: list() copies the id -> record mapping (a single atomic step
+    under the GIL) and builds from that snapshot while writers carry on.
+
+    Audit entries, learning updates and listeners run after the locks are
+    released, so none of them can stall writers of the same records.
+
+    Under the GIL this is no faster than InMemoryACATStore used from one thread
+    (benchmarks/concurrent_store.py), so the app does not offer it as a
+    TRACKING_STORE backend; it is for code that shares a store between threads.
+    """
+
+    def __init__(self, audit_log: Optional[AuditLog] = None, change_log_size: int = 10000, stripes: int = 64) -> None:
+        super().__init__(audit_log, change_log_size)
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._structure_lock = threading.Lock()
+        # Makes the duplicate check and the insert of duplicate-checked creates one step
+        self._create_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self, record_ids: Iterable[str]):
+        """Hold the stripe locks covering these record ids, taken in stripe order so batches cannot deadlock."""
+        stripes = sorted({hash(record_id) % len(self._stripes) for record_id in record_ids})
+        with ExitStack() as stack:
+            for stripe in stripes:
+                stack.enter_context(self._stripes[stripe])
+            yield
+
+    # --- index maintenance ---
+
+    def _store(self, compact: CompactRecord) -> None:
+        with self._structure_lock:
+            super()._store(compact)
+
+    def _replace(self, previous: CompactRecord, compact: CompactRecord) -> None:
+        with self._structure_lock:
+            super()._replace(previous, compact)
+
+    def _remove(self, record_id: str) -> Optional[CompactRecord]:
+        with self._structure_lock:
+            return super()._remove(record_id)
+
+    def _load_compact(self, compacts: List[CompactRecord]) -> None:
+        with self._structure_lock:
+            super()._load_compact(compacts)
+
+    # --- writes ---
+
+    def _create_records(self, acat_requests: List[ACATRequest], reject_duplicates: bool) -> List[ACATRecord]:
+        if not reject_duplicates:
+            return super()._create_records(acat_requests, reject_duplicates)
+        with self._create_lock:
+            return super()._create_records(acat_requests, reject_duplicates)
+
+    def save(self, record: ACATRecord) -> ACATRecord:
+        with self._locked([record.id]):
+            record.version += 1
+            self._put(record)
+        self._notify("saved", [record])
+        return record
+
+    def _apply_transitions(
+        self,
+        transitions: List[Tuple[str, ACATStatus, str]],
+        updated_by: str,
+        expected_versions: Optional[Dict[str, int]],
+    ) -> Tuple[List[Optional[ACATRecord]], List[Tuple[ACATRecord, ACATStatus, ACATStatus, str]]]:
+        with self._locked([transition[0] for transition in transitions]):
+            return super()._apply_transitions(transitions, updated_by, expected_versions)
+
+    def delete(self, record_id: str) -> None:
+        with self._locked([record_id]):
+            compact = self._remove(record_id)
+        if compact is not None and self._listeners:
+            self._notify("deleted", [compact.to_record()])
+
+    # --- reads ---
+
+    def list(self) -> List[ACATRecord]:
+        snapshot = self._records.copy()
+        return [compact.to_record() for compact in snapshot.values()]
+
+    def _query_ids(self, *args, **kwargs) -> List[str]:
+        with self._structure_lock:
+            return super()._query_ids(*args, **kwargs)
+
+    def summary(self) -> Dict:
+        with self._structure_lock:
+            return super().summary()
+
+    def changes_since(self, since: int, limit: int = 1000) -> Dict:
+        with self._structure_lock:
+            return super().changes_since(since, limit)
+
+    def find_duplicate(self, acat_request: ACATRequest) -> Optional[str]:
+        with self._structure_lock:
+            return super().find_duplicate(acat_request)
+
+    def duplicate_groups(self, include_closed: bool = False) -> List[Dict]:
+        with self._structure_lock:
+            return super().duplicate_groups(include_closed)
+
+    def security_positions(self, cusip: str, statuses: Optional[Iterable[ACATStatus]] = None) -> List[Dict]:
+        with self._structure_lock:
+            return super().security_positions(cusip, statuses)
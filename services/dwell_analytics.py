@@ -0,0 +1,302 @@
+import threading
+import warnings
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from models.acat import ACATRecord, ACATStatus
+from services.compact_records import to_epoch_us
+
+
+STATUSES = list(ACATStatus)
+_STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+_US_PER_HOUR = 3_600_000_000
+_US_PER_DAY = 86_400_000_000
+_EPOCH_DAY = date(1970, 1, 1)
+
+# One row per completed stay: the record, the status it sat in, its contra firm,
+# when it entered the status and how long it stayed (epoch microseconds)
+_COLUMNS = {"record": np.int32, "status": np.int8, "firm": np.int32, "entered": np.int64, "dwell": np.int64}
+
+
+def parse_timestamps(values: Sequence) -> np.ndarray:
+    """Epoch microseconds (naive UTC) of ISO strings or datetimes, parsed in one numpy call.
+
+    Values numpy cannot take exactly (UTC offsets, aware datetimes) fall back to
+    datetime.fromisoformat one at a time.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        try:
+            return np.asarray(values, dtype="datetime64[us]").astype(np.int64)
+        except (ValueError, UserWarning, DeprecationWarning):
+            pass
+    return np.array(
+        [to_epoch_us(value if isinstance(value, datetime) else datetime.fromisoformat(value)) for value in values],
+        dtype=np.int64,
+    )
+
+
+def grouped_percentiles(keys: np.ndarray, values: np.ndarray, percentiles: Sequence[float]) -> Tuple[np.ndarray, ...]:
+    """(group keys, counts, means, groups x percentiles) of `values` grouped by integer `keys`.
+
+    One lexsort orders every group at once; percentiles interpolate linearly
+    between neighbouring values, as numpy.percentile does by default.
+    """
+    if keys.size == 0:
+        return keys, np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros((0, len(percentiles)))
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, keys.size])
+    means = np.add.reduceat(values, starts) / counts
+    positions = starts[:, None] + (counts[:, None] - 1) * (np.asarray(percentiles, dtype=float) / 100)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    quantiles = values[lower] + (values[upper] - values[lower]) * (positions - lower)
+    return keys[starts], counts, means, quantiles
+
+
+class _RecordState:
+    __slots__ = ("code", "firm", "consumed", "last_stamp", "open_since")
+
+    def __init__(self, code: int, firm: int):
+        self.code = code
+        self.firm = firm
+        # History entries already turned into stays, and the raw timestamp of the last one
+        self.consumed = 0
+        self.last_stamp = None
+        # When the record entered its current status (epoch microseconds)
+        self.open_since: Optional[int] = None
+
+
+class DwellTimeAnalytics:
+    """Time-in-status of tracking records: dwell percentiles per status, contra firm and week.
+
+    Status histories are turned once into typed columns of completed stays (the
+    status, contra firm, entry time and length of each stay), so reports never
+    re-parse history timestamps. The columns follow the store incrementally:
+    refresh() reads only the records changed since the last store version it saw
+    (changes_since), adds the stays their new history entries closed, and drops
+    and rebuilds the stays of deleted or rewritten records. A full rebuild only
+    happens on first use or when the store's change log no longer reaches back.
+
+    Reports group the columns with vectorized numpy operations and are cached per
+    store version and report parameters. A stay counts towards the week (starting
+    Monday, UTC) in which the record entered the status; stays still open are not
+    included.
+    """
+
+    DEFAULT_PERCENTILES = (50, 90, 95)
+
+    def __init__(self, store, batch_size: int = 1000):
+        self.store = store
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._seen: Tuple[Optional[str], int] = (None, 0)
+        self._reports: Dict[Tuple, Dict] = {}
+        self._reset()
+
+    def _reset(self) -> None:
+        self._size = 0
+        self._columns = {name: np.empty(1024, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self._records: Dict[str, _RecordState] = {}
+        self._next_code = 0
+        self._firm_codes: Dict[str, int] = {}
+        self._firms: List[str] = []
+
+    def __len__(self) -> int:
+        """Completed stays currently held."""
+        return self._size
+
+    # --- column maintenance ---
+
+    def _firm_code(self, contra_firm: str) -> int:
+        code = self._firm_codes.get(contra_firm)
+        if code is None:
+            code = self._firm_codes[contra_firm] = len(self._firms)
+            self._firms.append(contra_firm)
+        return code
+
+    def _append(self, rows: Dict[str, List]) -> None:
+        count = len(rows["record"])
+        if not count:
+            return
+        needed = self._size + count
+        capacity = len(self._columns["record"])
+        if needed > capacity:
+            capacity = max(needed, capacity * 2)
+            for name, column in self._columns.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self._size] = column[:self._size]
+                self._columns[name] = grown
+        for name, values in rows.items():
+            self._columns[name][self._size:needed] = values
+        self._size = needed
+
+    def _drop(self, codes: List[int]) -> None:
+        """Remove every stay of these record codes, in one pass over the columns."""
+        if not codes or not self._size:
+            return
+        keep = ~np.isin(self._columns["record"][:self._size], codes)
+        kept = int(keep.sum())
+        for name, column in self._columns.items():
+            column[:kept] = column[:self._size][keep]
+        self._size = kept
+
+    def _extends(self, state: _RecordState, record: ACATRecord) -> bool:
+        """Whether `record` only adds history to what was already ingested (the usual status change)."""
+        history = record.status_history
+        return (
+            self._firms[state.firm] == record.acat_data.contra_firm
+            and len(history) >= state.consumed
+            and (state.consumed == 0 or history[state.consumed - 1]["updated_at"] == state.last_stamp)
+        )
+
+    def _apply(self, records: Iterable[ACATRecord], deleted_ids: Iterable[str] = ()) -> None:
+        dropped = []
+        for record_id in deleted_ids:
+            state = self._records.pop(record_id, None)
+            if state is not None:
+                dropped.append(state.code)
+
+        # First pass: find the history entries not seen yet and collect their raw timestamps
+        pending, raw = [], []
+        for record in records:
+            state = self._records.get(record.id)
+            if state is not None and not self._extends(state, record):
+                dropped.append(state.code)
+                state = None
+            if state is None:
+                state = self._records[record.id] = _RecordState(self._next_code, self._firm_code(record.acat_data.contra_firm))
+                self._next_code += 1
+                raw.append(record.created_at)
+            new_entries = record.status_history[state.consumed:]
+            raw.extend(entry["updated_at"] for entry in new_entries)
+            pending.append((state, new_entries))
+        self._drop(dropped)
+        if not raw:
+            return
+
+        # Second pass: each new entry closes the stay in its from_status
+        stamps = parse_timestamps(raw).tolist()
+        position = 0
+        rows: Dict[str, List] = {name: [] for name in _COLUMNS}
+        for state, new_entries in pending:
+            if state.open_since is None:
+                state.open_since = stamps[position]
+                position += 1
+            for entry in new_entries:
+                left_at = stamps[position]
+                position += 1
+                rows["record"].append(state.code)
+                rows["status"].append(_STATUS_CODES[ACATStatus(entry["from_status"])])
+                rows["firm"].append(state.firm)
+                rows["entered"].append(state.open_since)
+                # Hand-edited histories can go backwards in time; such stays count as zero
+                rows["dwell"].append(max(left_at - state.open_since, 0))
+                state.open_since = left_at
+            if new_entries:
+                state.consumed += len(new_entries)
+                state.last_stamp = new_entries[-1]["updated_at"]
+        self._append(rows)
+
+    def _rebuild(self) -> None:
+        self._reset()
+        # Records written while this runs are applied again by the next refresh, which is harmless
+        version = self.store.version
+        for batch in self.store.iter_query(batch_size=self.batch_size):
+            self._apply(batch)
+        self._seen = (self.store.instance_id, version)
+
+    def refresh(self) -> bool:
+        """Bring the stay columns up to the store's current version; True if anything had changed."""
+        with self._lock:
+            if self._seen == (self.store.instance_id, self.store.version):
+                return False
+            self._reports.clear()
+            if self._seen[0] != self.store.instance_id:
+                self._rebuild()
+                return True
+            since = self._seen[1]
+            while True:
+                changes = self.store.changes_since(since, limit=self.batch_size)
+                if changes["resync_required"]:
+                    self._rebuild()
+                    return True
+                self._apply(
+                    [change["record"] for change in changes["changes"] if not change["deleted"]],
+                    [change["id"] for change in changes["changes"] if change["deleted"]],
+                )
+                since = changes["next_since"]
+                if not changes["has_more"]:
+                    break
+            self._seen = (self.store.instance_id, since)
+            return True
+
+    # --- reports ---
+
+    def report(
+        self,
+        status: Optional[ACATStatus] = None,
+        contra_firm: Optional[str] = None,
+        since: Optional[date] = None,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    ) -> Dict:
+        """Dwell-time statistics in hours, per status, per status and contra firm, and per status and week.
+
+        `since` keeps only stays entered on or after that date.
+        """
+        self.refresh()
+        key = (status, contra_firm, since, tuple(percentiles))
+        with self._lock:
+            cached = self._reports.get(key)
+            if cached is None:
+                cached = self._reports[key] = self._build_report(status, contra_firm, since, percentiles)
+            return cached
+
+    def _build_report(self, status, contra_firm, since, percentiles) -> Dict:
+        columns = {name: column[:self._size] for name, column in self._columns.items()}
+        mask = np.ones(self._size, dtype=bool)
+        if status is not None:
+            mask &= columns["status"] == _STATUS_CODES[ACATStatus(status)]
+        if contra_firm is not None:
+            mask &= columns["firm"] == self._firm_codes.get(contra_firm, -1)
+        if since is not None:
+            mask &= columns["entered"] >= (since - _EPOCH_DAY).days * _US_PER_DAY
+        statuses = columns["status"][mask].astype(np.int64)
+        firms = columns["firm"][mask].astype(np.int64)
+        hours = columns["dwell"][mask] / _US_PER_HOUR
+        # Monday of each entry week, as days since the epoch (1970-01-01 was a Thursday)
+        days = columns["entered"][mask] // _US_PER_DAY
+        weeks, week_index = np.unique(days - (days + 3) % 7, return_inverse=True)
+        week_labels = [(_EPOCH_DAY + timedelta(days=int(day))).isoformat() for day in weeks]
+
+        labels = [f"p{percentile:g}" for percentile in percentiles]
+
+        def stats(count, mean, quantiles) -> Dict:
+            return {"count": int(count), "mean": round(float(mean), 2), **{
+                label: round(float(value), 2) for label, value in zip(labels, quantiles)
+            }}
+
+        def nested(group_keys: np.ndarray, width: int, names: List[str]) -> Dict[str, Dict]:
+            result: Dict[str, Dict] = {}
+            for group, count, mean, quantiles in zip(*grouped_percentiles(group_keys, hours, percentiles)):
+                outer, inner = divmod(int(group), width)
+                result.setdefault(STATUSES[outer].value, {})[names[inner]] = stats(count, mean, quantiles)
+            return result
+
+        by_status = {
+            STATUSES[int(group)].value: stats(count, mean, quantiles)
+            for group, count, mean, quantiles in zip(*grouped_percentiles(statuses, hours, percentiles))
+        }
+        return {
+            "version": self._seen[1],
+            "unit": "hours",
+            "percentiles": list(percentiles),
+            "stays": int(mask.sum()),
+            "by_status": by_status,
+            "by_status_and_contra_firm": nested(statuses * max(len(self._firms), 1) + firms, max(len(self._firms), 1), self._firms),
+            "by_status_and_week": nested(statuses * max(len(weeks), 1) + week_index, max(len(weeks), 1), week_labels),
+        }
@@ -0,0 +1,275 @@
+import json
+import os
+import pickle
+import struct
+import threading
+from collections import Counter
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pydantic.json import pydantic_encoder
+
+from models.acat import ACATRecord, ACATRequest, ACATStatus
+from services.compact_records import CompactRecord, compact_history_entry, to_epoch_us
+from services.tracking_service import AuditEntry, AuditLog, InMemoryACATStore
+
+
+_FRAME_HEADER = struct.Struct(">I")
+# Bumped whenever the pickled layout changes; older snapshots are ignored and
+# the store is rebuilt from the full event log instead
+_SNAPSHOT_MAGIC = b"VSNP3\n"
+
+
+class EventLog:
+    """Append-only log of tracking and audit events.
+
+    Each event is a length-prefixed JSON frame `[seq, type, data]`. Frames are
+    flushed to the OS on every append; set `fsync=True` to also force them to
+    disk. A torn frame at the end of the file (crash mid-write) is dropped when
+    the log is opened.
+    """
+
+    def __init__(self, path: str, fsync: bool = False) -> None:
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.last_seq, valid_length = self._scan_tail()
+        self._file = open(path, "ab")
+        if self._file.tell() != valid_length:
+            self._file.truncate(valid_length)
+            self._file.seek(valid_length)
+
+    def _scan_tail(self) -> Tuple[int, int]:
+        """Find the last sequence number and the length of the intact prefix of the file."""
+        last_seq, offset = 0, 0
+        for seq, _, _, end in self._frames(0):
+            last_seq, offset = seq, end
+        return last_seq, offset
+
+    @property
+    def offset(self) -> int:
+        with self._lock:
+            return self._file.tell()
+
+    def append(self, event_type: str, data: Dict) -> int:
+        return self.append_many([(event_type, data)])
+
+    def append_many(self, events: List[Tuple[str, Dict]]) -> int:
+        """Write a batch of (type, data) events with a single flush; returns the last sequence number."""
+        with self._lock:
+            frames = []
+            for event_type, data in events:
+                self.last_seq += 1
+                body = json.dumps([self.last_seq, event_type, data], default=pydantic_encoder, separators=(",", ":")).encode()
+                frames.append(_FRAME_HEADER.pack(len(body)) + body)
+            self._file.write(b"".join(frames))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            return self.last_seq
+
+    def replay(self, offset: int = 0) -> Iterator[Tuple[int, str, Dict]]:
+        """Yield (seq, type, data) for every intact event starting at byte `offset`."""
+        for seq, event_type, data, _ in self._frames(offset):
+            yield seq, event_type, data
+
+    def _frames(self, offset: int) -> Iterator[Tuple[int, str, Dict, int]]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while True:
+                header = f.read(_FRAME_HEADER.size)
+                if len(header) < _FRAME_HEADER.size:
+                    return
+                (length,) = _FRAME_HEADER.unpack(header)
+                body = f.read(length)
+                if len(body) < length:
+                    return
+                try:
+                    seq, event_type, data = json.loads(body)
+                except ValueError:
+                    return
+                offset += _FRAME_HEADER.size + length
+                yield seq, event_type, data, offset
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class EventSourcedAuditLog(AuditLog):
+    """Audit log that also writes every entry to the shared event log."""
+
+    def __init__(self, event_log: EventLog):
+        super().__init__()
+        self.event_log = event_log
+
+    def _append(self, entries: List[AuditEntry], restored: bool = False) -> None:
+        super()._append(entries, restored)
+        if entries and not restored:
+            # Still under the append lock, so the event log holds entries in chain order
+            self.event_log.append_many([("audit", entry.dict()) for entry in entries])
+
+    def restore_entry(self, entry: AuditEntry) -> None:
+        """Append a recovered entry, with its recorded chained hash, without writing it to the event log again."""
+        with self._lock:
+            self._append([entry], restored=True)
+
+
+class EventSourcedACATStore(InMemoryACATStore):
+    """In-memory tracking store whose writes are recorded in an append-only event log.
+
+    On startup, recover() loads the latest snapshot and replays only the events
+    appended after it, so restart time depends on the events since the last
+    snapshot rather than on the size of the whole history. Replaying is
+    idempotent: every event carries the absolute state it produced.
+    """
+
+    def __init__(self, event_log: EventLog, snapshot_path: str, audit_log: Optional[EventSourcedAuditLog] = None, change_log_size: int = 10000) -> None:
+        super().__init__(audit_log, change_log_size)
+        self.event_log = event_log
+        self.snapshot_path = snapshot_path
+        self._snapshot_lock = threading.Lock()
+        self.last_snapshot_seq = 0
+
+    # --- writes ---
+
+    def create_many(
+        self, acat_requests: List[ACATRequest], created_by: str = "system", reject_duplicates: bool = False
+    ) -> List[ACATRecord]:
+        records = super().create_many(acat_requests, created_by, reject_duplicates)
+        if records:
+            self.event_log.append_many([("save", record.dict()) for record in records])
+        return records
+
+    def save(self, record: ACATRecord) -> ACATRecord:
+        super().save(record)
+        self.event_log.append("save", record.dict())
+        return record
+
+    def update_status_many(
+        self,
+        transitions: List[Tuple[str, ACATStatus, str]],
+        updated_by: str,
+        learning_service=None,
+        expected_versions: Optional[Dict[str, int]] = None,
+    ) -> List[Optional[ACATRecord]]:
+        results = super().update_status_many(transitions, updated_by, learning_service, expected_versions)
+        # A record may appear more than once in a batch; its transitions are then
+        # the last few history entries, in order.
+        remaining = Counter(record.id for record in results if record is not None)
+        events = []
+        for record in results:
+            if record is None:
+                continue
+            history_length = len(record.status_history) - remaining[record.id] + 1
+            version = record.version - remaining[record.id] + 1
+            remaining[record.id] -= 1
+            history_entry = record.status_history[history_length - 1]
+            events.append(("status_change", {
+                "id": record.id,
+                "status": history_entry["to_status"],
+                "updated_at": record.updated_at,
+                "history_length": history_length,
+                "history_entry": history_entry,
+                "version": version,
+            }))
+        if events:
+            self.event_log.append_many(events)
+        return results
+
+    def delete(self, record_id: str) -> None:
+        if record_id in self._records:
+            super().delete(record_id)
+            self.event_log.append("delete", {"id": record_id})
+
+    # --- recovery ---
+
+    def recover(self) -> int:
+        """Rebuild the store and audit log from the latest snapshot plus newer events.
+
+        Returns the number of events replayed.
+        """
+        offset = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                if f.read(len(_SNAPSHOT_MAGIC)) == _SNAPSHOT_MAGIC:
+                    snapshot = pickle.load(f)
+                    self._load_compact([CompactRecord.from_tuple(values) for values in snapshot["records"]])
+                    if self.audit_log:
+                        for entry in snapshot["audit_entries"]:
+                            self.audit_log.restore_entry(entry)
+                    offset = snapshot["offset"]
+                    self.last_snapshot_seq = snapshot["seq"]
+
+        replayed = 0
+        for _, event_type, data in self.event_log.replay(offset):
+            self._apply_event(event_type, data)
+            replayed += 1
+        return replayed
+
+    def _apply_event(self, event_type: str, data: Dict) -> None:
+        if event_type == "save":
+            self._put(ACATRecord.parse_obj(data))
+        elif event_type == "status_change":
+            compact = self._records.get(data["id"])
+            if compact is None:
+                return
+            self._replace(compact, compact.replace(
+                status=ACATStatus(data["status"]),
+                updated_at=to_epoch_us(datetime.fromisoformat(data["updated_at"])),
+                history=compact.history[:data["history_length"] - 1] + (compact_history_entry(data["history_entry"]),),
+                # Logs written before records carried versions: one version per status change
+                version=data.get("version", data["history_length"] + 1),
+            ))
+        elif event_type == "delete":
+            self._remove(data["id"])
+        elif event_type == "audit" and self.audit_log:
+            self.audit_log.restore_entry(AuditEntry.parse_obj(data))
+
+    # --- snapshots ---
+
+    def capture_snapshot(self) -> Dict:
+        """Grab references to the current state; cheap enough to run on the event loop.
+
+        The heavy serialization happens in write_snapshot(), which may run in a
+        worker thread. Record writes that land in between are also in the event log
+        after the captured offset, and replaying them on top of the snapshot is
+        harmless, since each carries the state it produced. Audit entries are
+        appended instead, so the offset and the entries are read together under the
+        audit log's lock, which its writes to the event log are made under too:
+        every entry is either in the snapshot or after the offset, never both.
+        """
+        with self.audit_log._lock if self.audit_log else nullcontext():
+            seq, offset = self.event_log.last_seq, self.event_log.offset
+            audit_entries = list(self.audit_log._entries) if self.audit_log else []
+        return {
+            "seq": seq,
+            "offset": offset,
+            "records": list(self._records.values()),
+            "audit_entries": audit_entries,
+        }
+
+    def write_snapshot(self, snapshot: Dict) -> None:
+        """Serialize a captured snapshot and atomically replace the previous one."""
+        # Compact records pickle as flat tuples, which is far smaller and faster
+        # to load than pickling the slotted objects themselves
+        payload = {**snapshot, "records": [compact.as_tuple() for compact in snapshot["records"]]}
+        with self._snapshot_lock:
+            temp_path = f"{self.snapshot_path}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(_SNAPSHOT_MAGIC)
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.snapshot_path)
+            self.last_snapshot_seq = snapshot["seq"]
+
+    def snapshot(self) -> None:
+        if self.event_log.last_seq != self.last_snapshot_seq:
+            self.write_snapshot(self.capture_snapshot())
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, Optional
+
+
+# Status of the placeholder a request holds its key with while it runs (HTTP 102 Processing)
+IN_PROGRESS = 102
+
+
+class StoredResponse(NamedTuple):
+    """What an idempotent request returned, and a hash of the request it answered."""
+    request_hash: str
+    status_code: int
+    body: Any
+
+    @property
+    def in_progress(self) -> bool:
+        return self.status_code == IN_PROGRESS
+
+
+class IdempotencyCache:
+    """Responses of completed requests by Idempotency-Key, for replaying client retries.
+
+    A request reserves its key before running, so a concurrent request with the
+    same key finds it in progress instead of running too. The reservation
+    becomes the stored response with put(), or is dropped with release() if the
+    request fails; one left behind by a crashed process lapses after
+    `reservation_seconds`.
+
+    Bounded two ways: entries expire `ttl_seconds` after the request that created
+    them, and once `max_entries` are held the least recently used is evicted. An
+    evicted or expired key simply runs again, so clients should retry within the TTL.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: float = 86400,
+        clock: Callable[[], float] = time.monotonic,
+        reservation_seconds: float = 300,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.reservation_seconds = reservation_seconds
+        self._clock = clock
+        # key -> (expires_at, response), least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def reserve(self, key: str, request_hash: str) -> Optional[StoredResponse]:
+        """Hold `key` for a request about to run: None if it is now held, else what already holds it.
+
+        That is the response of a completed request, or a placeholder that is
+        `in_progress` while another request with the key runs.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+            self._store(key, StoredResponse(request_hash, IN_PROGRESS, None), now, now + self.reservation_seconds)
+            return None
+
+    def release(self, key: str) -> None:
+        """Drop the reservation of a request that did not complete, so a retry runs it again."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1].in_progress:
+                del self._entries[key]
+
+    def put(self, key: str, response: StoredResponse) -> None:
+        now = self._clock()
+        with self._lock:
+            self._store(key, response, now, now + self.ttl_seconds)
+
+    def _store(self, key: str, response: StoredResponse, now: float, expires_at: float) -> None:
+        """Add or replace an entry; the caller holds the lock."""
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        # Drop expired entries that have drifted to the cold end, then enforce the bound
+        while self._entries:
+            expires_at, _ = next(iter(self._entries.values()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
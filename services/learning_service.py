@@ -1,67 +1,98 @@
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from collections import defaultdict
 import json
+import uuid
+
+
+def new_firm_data() -> Dict:
+    """Empty learning data for one contra firm."""
+    return {
+        "common_rejections": defaultdict(int),
+        "accepted_suggestions": defaultdict(int),
+        "field_patterns": defaultdict(lambda: defaultdict(int)),
+        "success_rate": 0.0,
+        "total_submissions": 0,
+        "successful_submissions": 0,
+        "last_updated": None
+    }
+
+
+def apply_validation_result(firm_data: Dict, validation_result: dict, was_accepted: bool = None) -> None:
+    """Fold one validation result into a firm's learning data."""
+    # Update submission counts
+    firm_data["total_submissions"] += 1
+    if was_accepted is True:
+        firm_data["successful_submissions"] += 1
+    elif was_accepted is False:
+        # Record specific rejection reasons
+        for suggestion in validation_result.get("suggestions", []):
+            if suggestion.get("severity") == "high":
+                firm_data["common_rejections"][suggestion.get("field", "unknown")] += 1
+    
+    # Record accepted suggestions
+    if validation_result.get("accepted_suggestions"):
+        for field in validation_result["accepted_suggestions"]:
+            firm_data["accepted_suggestions"][field] += 1
+    
+    # Update success rate
+    if firm_data["total_submissions"] > 0:
+        firm_data["success_rate"] = firm_data["successful_submissions"] / firm_data["total_submissions"]
+    
+    firm_data["last_updated"] = datetime.utcnow().isoformat()
+
+
+def apply_status_change(firm_data: Dict, old_status: str, new_status: str, reason: str) -> None:
+    """Fold one status change into a firm's learning data."""
+    # Track patterns in status changes
+    status_key = f"{old_status}_to_{new_status}"
+    firm_data["field_patterns"]["status_changes"][status_key] += 1
+    
+    # Analyze reason for patterns
+    reason_lower = reason.lower()
+    if "reject" in reason_lower or "invalid" in reason_lower:
+        firm_data["common_rejections"]["status_change"] += 1
+
 
 class ContraFirmLearningService:
     """Service to learn contra firm preferences from past rejections and corrections."""
     
     def __init__(self):
-        self._firm_preferences: Dict[str, Dict] = defaultdict(lambda: {
-            "common_rejections": defaultdict(int),
-            "accepted_suggestions": defaultdict(int),
-            "field_patterns": defaultdict(lambda: defaultdict(int)),
-            "success_rate": 0.0,
-            "total_submissions": 0,
-            "successful_submissions": 0,
-            "last_updated": None
-        })
+        self._firm_preferences: Dict[str, Dict] = defaultdict(new_firm_data)
+        # Bumped on every change so callers can tell whether learned data moved (e.g. for ETags)
+        self.instance_id = uuid.uuid4().hex[:12]
+        self.version = 0
+    
+    def _firm(self, contra_firm: str) -> Dict:
+        """Learning data for a firm; first access adds the firm, which counts as a change."""
+        if contra_firm not in self._firm_preferences:
+            self.version += 1
+        return self._firm_preferences[contra_firm]
     
     def record_validation_result(self, contra_firm: str, validation_result: dict, was_accepted: bool = None):
         """Record a validation result for learning purposes."""
-        firm_data = self._firm_preferences[contra_firm]
-        
-        # Update submission counts
-        firm_data["total_submissions"] += 1
-        if was_accepted is True:
-            firm_data["successful_submissions"] += 1
-        elif was_accepted is False:
-            # Record specific rejection reasons
-            for suggestion in validation_result.get("suggestions", []):
-                if suggestion.get("severity") == "high":
-                    firm_data["common_rejections"][suggestion.get("field", "unknown")] += 1
-        
-        # Record accepted suggestions
-        if validation_result.get("accepted_suggestions"):
-            for field in validation_result["accepted_suggestions"]:
-                firm_data["accepted_suggestions"][field] += 1
-        
-        # Update success rate
-        if firm_data["total_submissions"] > 0:
-            firm_data["success_rate"] = firm_data["successful_submissions"] / firm_data["total_submissions"]
-        
-        firm_data["last_updated"] = datetime.utcnow().isoformat()
+        firm_data = self._firm(contra_firm)
+        self.version += 1
+        apply_validation_result(firm_data, validation_result, was_accepted)
     
     def record_status_change(self, contra_firm: str, old_status: str, new_status: str, reason: str):
         """Record status changes that might indicate firm preferences."""
-        firm_data = self._firm_preferences[contra_firm]
-        
-        # Track patterns in status changes
-        status_key = f"{old_status}_to_{new_status}"
-        firm_data["field_patterns"]["status_changes"][status_key] += 1
-        
-        # Analyze reason for patterns
-        reason_lower = reason.lower()
-        if "reject" in reason_lower or "invalid" in reason_lower:
-            firm_data["common_rejections"]["status_change"] += 1
+        self.record_status_changes([(contra_firm, old_status, new_status, reason)])
+    
+    def record_status_changes(self, changes: List[Tuple[str, str, str, str]]):
+        """Record a batch of (contra_firm, old_status, new_status, reason) status changes."""
+        if changes:
+            self.version += 1
+        for contra_firm, old_status, new_status, reason in changes:
+            apply_status_change(self._firm_preferences[contra_firm], old_status, new_status, reason)
     
     def get_firm_preferences(self, contra_firm: str) -> Dict:
         """Get learned preferences for a specific contra firm."""
-        return dict(self._firm_preferences[contra_firm])
+        return dict(self._firm(contra_firm))
     
     def get_common_issues_for_firm(self, contra_firm: str) -> List[Dict]:
         """Get the most common issues for a specific firm."""
-        firm_data = self._firm_preferences[contra_firm]
+        firm_data = self._firm(contra_firm)
         
         # Combine rejections and field patterns
         all_issues = []
@@ -81,7 +112,7 @@ class ContraFirmLearningService:
     
     def get_firm_success_rate(self, contra_firm: str) -> float:
         """Get success rate for a specific firm."""
-        return self._firm_preferences[contra_firm]["success_rate"]
+        return self._firm(contra_firm)["success_rate"]
     
     def get_learning_insights(self) -> Dict:
         """Get overall learning insights across all firms."""
@@ -0,0 +1,326 @@
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models.acat import User
+from services.auth_service import SimpleAuthService
+from services.idempotency import IN_PROGRESS, IdempotencyCache, StoredResponse
+from services.learning_service import (
+    ContraFirmLearningService,
+    apply_status_change,
+    apply_validation_result,
+    new_firm_data,
+)
+from services.sqlite_store import open_database
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_meta (
+    key TEXT PRIMARY KEY,
+    value NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO shared_meta (key, value) VALUES ('learning_version', 0);
+
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    user_data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    created_at TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    request_hash TEXT NOT NULL,
+    status_code INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_last_used ON idempotency_keys (last_used);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires ON idempotency_keys (expires_at);
+
+CREATE TABLE IF NOT EXISTS learning_firms (
+    contra_firm TEXT PRIMARY KEY,
+    firm_data TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class SharedStateDB:
+    """SQLite file holding the state every uvicorn worker has to agree on.
+
+    Users, sessions and contra firm learning data live here, next to the tracking
+    records of a SQLiteACATStore opened on the same file, so a session created by
+    one worker is valid on all of them and learned data never diverges. Each
+    process opens its own connection; WAL mode lets readers carry on while one
+    process writes.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = open_database(path)
+        self._conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def transaction(self):
+        """Serialize writers in this process and take the database write lock up front."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @contextmanager
+    def snapshot(self):
+        """Read transaction: every query inside sees the same committed state."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            finally:
+                self._conn.execute("COMMIT")
+
+    def fetchall(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def meta(self, key: str):
+        rows = self.fetchall("SELECT value FROM shared_meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def set_meta_default(self, key: str, value) -> None:
+        """Store `value` under `key` unless some process already stored one."""
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO shared_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def claim(self, name: str) -> bool:
+        """True for exactly one caller across all processes, e.g. so only one worker seeds demo data."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO shared_meta (key, value) VALUES (?, ?)",
+                (f"claimed:{name}", datetime.utcnow().isoformat()),
+            )
+            return cursor.rowcount == 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SQLiteAuthService(SimpleAuthService):
+    """SimpleAuthService with users and sessions in the shared database."""
+
+    def __init__(self, db: SharedStateDB):
+        self._db = db
+        # Every worker tries; the UNIQUE username means only the first one's accounts are kept
+        self._create_default_users()
+
+    def _add_user(self, user: User) -> bool:
+        with self._db.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO users (id, username, user_data) VALUES (?, ?, ?)",
+                (user.id, user.username, user.json()),
+            )
+            return cursor.rowcount == 1
+
+    def _find_user(self, username: str) -> Optional[User]:
+        rows = self._db.fetchall("SELECT user_data FROM users WHERE username = ?", (username,))
+        return User.parse_raw(rows[0][0]) if rows else None
+
+    def _update_user(self, user_id: str, **changes) -> Optional[User]:
+        with self._db.transaction() as conn:
+            row = conn.execute("SELECT user_data FROM users WHERE id = ?", (user_id,)).fetchone()
+            if row is None:
+                return None
+            user = User.parse_raw(row[0]).copy(update=changes)
+            conn.execute("UPDATE users SET user_data = ? WHERE id = ?", (user.json(), user_id))
+        return user
+
+    def create_session(self, user: User) -> str:
+        session_id = str(uuid.uuid4())
+        with self._db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, user_id, created_at) VALUES (?, ?, ?)",
+                (session_id, user.id, datetime.utcnow().isoformat()),
+            )
+        return session_id
+
+    def get_user_from_session(self, session_id: str) -> Optional[User]:
+        rows = self._db.fetchall(
+            "SELECT u.user_data FROM sessions s JOIN users u ON u.id = s.user_id WHERE s.session_id = ?",
+            (session_id,),
+        )
+        return User.parse_raw(rows[0][0]) if rows else None
+
+    def get_all_users(self) -> list[User]:
+        return [User.parse_raw(user_data) for (user_data,) in self._db.fetchall("SELECT user_data FROM users")]
+
+    def reject_user(self, user_id: str) -> bool:
+        # The user's sessions go with it (ON DELETE CASCADE)
+        with self._db.transaction() as conn:
+            return conn.execute("DELETE FROM users WHERE id = ?", (user_id,)).rowcount == 1
+
+
+class SQLiteIdempotencyCache(IdempotencyCache):
+    """IdempotencyCache in the shared database, so a retry is replayed whichever worker it reaches.
+
+    Uses wall-clock time, since expiry times are compared across processes.
+    Reservations are rows too, taken inside a write transaction, so only one
+    worker can hold a key.
+    """
+
+    def __init__(self, db: SharedStateDB, max_entries: int = 10000, ttl_seconds: float = 86400, reservation_seconds: float = 300):
+        super().__init__(max_entries, ttl_seconds, clock=time.time, reservation_seconds=reservation_seconds)
+        self._db = db
+
+    def __len__(self) -> int:
+        return self._db.fetchall("SELECT COUNT(*) FROM idempotency_keys")[0][0]
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        now = self._clock()
+        with self._db.transaction() as conn:
+            row = conn.execute(
+                "SELECT request_hash, status_code, body FROM idempotency_keys WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE idempotency_keys SET last_used = ? WHERE key = ?", (now, key))
+        request_hash, status_code, body = row
+        return StoredResponse(request_hash, status_code, json.loads(body))
+
+    def reserve(self, key: str, request_hash: str) -> Optional[StoredResponse]:
+        now = self._clock()
+        with self._db.transaction() as conn:
+            row = conn.execute(
+                "SELECT request_hash, status_code, body FROM idempotency_keys WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO idempotency_keys (key, request_hash, status_code, body, expires_at, last_used) VALUES (?, ?, ?, 'null', ?, ?)",
+                    (key, request_hash, IN_PROGRESS, now + self.reservation_seconds, now),
+                )
+                return None
+            conn.execute("UPDATE idempotency_keys SET last_used = ? WHERE key = ?", (now, key))
+        request_hash, status_code, body = row
+        return StoredResponse(request_hash, status_code, json.loads(body))
+
+    def release(self, key: str) -> None:
+        with self._db.transaction() as conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND status_code = ?", (key, IN_PROGRESS))
+
+    def put(self, key: str, response: StoredResponse) -> None:
+        now = self._clock()
+        with self._db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO idempotency_keys (key, request_hash, status_code, body, expires_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response.request_hash, response.status_code, json.dumps(response.body), now + self.ttl_seconds, now),
+            )
+            conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM idempotency_keys WHERE key IN (SELECT key FROM idempotency_keys ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+def _load_firm_data(text: str) -> Dict:
+    """Rebuild a firm's learning data, with its counting defaultdicts, from stored JSON."""
+    stored = json.loads(text)
+    firm_data = new_firm_data()
+    firm_data["common_rejections"].update(stored["common_rejections"])
+    firm_data["accepted_suggestions"].update(stored["accepted_suggestions"])
+    for pattern, counts in stored["field_patterns"].items():
+        firm_data["field_patterns"][pattern].update(counts)
+    for key in ("success_rate", "total_submissions", "successful_submissions", "last_updated"):
+        firm_data[key] = stored[key]
+    return firm_data
+
+
+class SQLiteLearningService(ContraFirmLearningService):
+    """ContraFirmLearningService with its learning data in the shared database.
+
+    Each write is one transaction that reloads the firms it touches, applies the
+    change and bumps the shared learning version. Reads use an in-process copy of
+    all firms that is reloaded only when that version has moved, so repeated reads
+    between changes cost a single lookup.
+    """
+
+    def __init__(self, db: SharedStateDB):
+        self._db = db
+        self._firm_preferences: Dict[str, Dict] = defaultdict(new_firm_data)
+        self._loaded_version: Optional[int] = None
+        db.set_meta_default("learning_instance_id", uuid.uuid4().hex[:12])
+        self.instance_id = db.meta("learning_instance_id")
+
+    @property
+    def version(self) -> int:
+        """Shared by all processes using the database."""
+        return self._db.meta("learning_version")
+
+    def _sync(self) -> None:
+        """Reload the firms if any process changed learning data since the last load."""
+        with self._db.snapshot() as conn:
+            version = conn.execute("SELECT value FROM shared_meta WHERE key = 'learning_version'").fetchone()[0]
+            if version == self._loaded_version:
+                return
+            rows = conn.execute("SELECT contra_firm, firm_data FROM learning_firms").fetchall()
+        firms = defaultdict(new_firm_data)
+        for contra_firm, firm_data in rows:
+            firms[contra_firm] = _load_firm_data(firm_data)
+        self._firm_preferences = firms
+        self._loaded_version = version
+
+    def _update_firms(self, updates: List[Tuple[str, Callable, Tuple]]) -> None:
+        """Apply (contra_firm, apply, args) updates as apply(firm_data, *args), in one transaction."""
+        with self._db.transaction() as conn:
+            touched: Dict[str, Dict] = {}
+            for contra_firm, apply, args in updates:
+                if contra_firm not in touched:
+                    row = conn.execute(
+                        "SELECT firm_data FROM learning_firms WHERE contra_firm = ?", (contra_firm,)
+                    ).fetchone()
+                    touched[contra_firm] = _load_firm_data(row[0]) if row else new_firm_data()
+                apply(touched[contra_firm], *args)
+            conn.executemany(
+                "INSERT OR REPLACE INTO learning_firms (contra_firm, firm_data) VALUES (?, ?)",
+                [(contra_firm, json.dumps(firm_data)) for contra_firm, firm_data in touched.items()],
+            )
+            conn.execute("UPDATE shared_meta SET value = value + 1 WHERE key = 'learning_version'")
+
+    def _firm(self, contra_firm: str) -> Dict:
+        self._sync()
+        if contra_firm not in self._firm_preferences:
+            self._update_firms([(contra_firm, lambda firm_data: None, ())])
+            self._sync()
+        return self._firm_preferences[contra_firm]
+
+    def record_validation_result(self, contra_firm: str, validation_result: dict, was_accepted: bool = None):
+        self._update_firms([(contra_firm, apply_validation_result, (validation_result, was_accepted))])
+
+    def record_status_changes(self, changes: List[Tuple[str, str, str, str]]):
+        if changes:
+            self._update_firms([
+                (contra_firm, apply_status_change, (old_status, new_status, reason))
+                for contra_firm, old_status, new_status, reason in changes
+            ])
+
+    def get_learning_insights(self) -> Dict:
+        self._sync()
+        return super().get_learning_insights()
+
+    def export_learning_data(self) -> Dict:
+        self._sync()
+        return super().export_learning_data()
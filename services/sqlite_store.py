@@ -0,0 +1,674 @@
+import sqlite3
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models.acat import ACATRecord, ACATRequest, ACATStatus
+from services.tracking_service import (
+    IN_FLIGHT_STATUSES,
+    AuditLog,
+    DuplicateTransfer,
+    VersionConflict,
+    _as_naive_utc,
+    change_entry,
+    collate_changes,
+    creation_audit_action,
+    cusip_quantities,
+    group_duplicates,
+    position_entry,
+    request_fingerprint,
+    status_change_audit_action,
+    summarize_status_counts,
+    transfer_fingerprint,
+)
+
+
+# Fixed-width so that text ordering in SQLite matches chronological ordering
+_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS acat_records (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    contra_firm TEXT NOT NULL,
+    delivering_account TEXT NOT NULL,
+    receiving_account TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    acat_data TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_acat_records_created ON acat_records (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_acat_records_status ON acat_records (status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_acat_records_contra_firm ON acat_records (contra_firm, status);
+CREATE INDEX IF NOT EXISTS idx_acat_records_delivering ON acat_records (delivering_account);
+CREATE INDEX IF NOT EXISTS idx_acat_records_receiving ON acat_records (receiving_account);
+CREATE INDEX IF NOT EXISTS idx_acat_records_updated ON acat_records (updated_at);
+
+CREATE TABLE IF NOT EXISTS acat_status_history (
+    record_id TEXT NOT NULL REFERENCES acat_records (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    from_status TEXT NOT NULL,
+    to_status TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    updated_by TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (record_id, seq)
+) WITHOUT ROWID;
+
+-- Inverted index for security_positions(): each CUSIP a record transfers, with its total quantity
+CREATE TABLE IF NOT EXISTS acat_positions (
+    cusip TEXT NOT NULL,
+    record_id TEXT NOT NULL REFERENCES acat_records (id) ON DELETE CASCADE,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (cusip, record_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_acat_positions_record ON acat_positions (record_id);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO store_meta (key, value) VALUES ('version', 0);
+INSERT OR IGNORE INTO store_meta (key, value) VALUES ('change_floor', 0);
+
+-- Bounded change log for changes_since(); rows are stamped with the version their transaction commits as
+CREATE TABLE IF NOT EXISTS acat_changes (
+    version INTEGER NOT NULL,
+    record_id TEXT NOT NULL,
+    deleted INTEGER NOT NULL,
+    PRIMARY KEY (version, record_id)
+) WITHOUT ROWID;
+"""
+
+# Statuses whose records take part in duplicate detection; also the predicate of the partial fingerprint index
+_IN_FLIGHT = "status IN (" + ", ".join(f"'{status.value}'" for status in IN_FLIGHT_STATUSES) + ")"
+
+_RECORD_COLUMNS = "id, status, created_at, updated_at, acat_data, version"
+
+_UPSERT_RECORD = """
+INSERT INTO acat_records
+    (id, status, contra_firm, delivering_account, receiving_account, created_at, updated_at, acat_data, version, fingerprint)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    status = excluded.status,
+    contra_firm = excluded.contra_firm,
+    delivering_account = excluded.delivering_account,
+    receiving_account = excluded.receiving_account,
+    created_at = excluded.created_at,
+    updated_at = excluded.updated_at,
+    acat_data = excluded.acat_data,
+    version = excluded.version,
+    fingerprint = excluded.fingerprint
+"""
+_INSERT_HISTORY = """
+INSERT INTO acat_status_history (record_id, seq, from_status, to_status, reason, updated_by, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+_INSERT_POSITION = "INSERT INTO acat_positions (cusip, record_id, quantity) VALUES (?, ?, ?)"
+_BACKFILL_POSITIONS = """
+INSERT INTO acat_positions (cusip, record_id, quantity)
+SELECT json_extract(security.value, '$.cusip'), acat_records.id, SUM(json_extract(security.value, '$.quantity'))
+FROM acat_records, json_each(acat_records.acat_data, '$.securities') AS security
+GROUP BY 1, 2
+"""
+_SELECT_RECORD = f"SELECT {_RECORD_COLUMNS} FROM acat_records WHERE id = ?"
+_SELECT_HISTORY = """
+SELECT from_status, to_status, reason, updated_by, updated_at
+FROM acat_status_history WHERE record_id = ? ORDER BY seq
+"""
+_BUMP_VERSION = "UPDATE store_meta SET value = value + 1 WHERE key = 'version' RETURNING value"
+_LOG_CHANGE = """
+INSERT OR REPLACE INTO acat_changes (version, record_id, deleted)
+SELECT value + 1, ?, ? FROM store_meta WHERE key = 'version'
+"""
+# The change log is trimmed back to change_log_size rows every this many versions
+_TRIM_CHANGES_EVERY = 64
+_NEXT_HISTORY_SEQ = "SELECT COALESCE(MAX(seq), 0) + 1 FROM acat_status_history WHERE record_id = ?"
+
+# Filter name -> SQL predicate, in the order query()/page() accept them
+_FILTER_PREDICATES = {
+    "status": "status = ?",
+    "contra_firm": "contra_firm = ?",
+    "delivering_account": "delivering_account = ?",
+    "receiving_account": "receiving_account = ?",
+    "created_after": "created_at >= ?",
+    "created_before": "created_at < ?",
+}
+
+
+def _format_timestamp(value: datetime) -> str:
+    return _as_naive_utc(value).strftime(_TIMESTAMP_FORMAT)
+
+
+def _status_value(status) -> str:
+    return ACATStatus(status).value
+
+
+def open_database(path: str) -> sqlite3.Connection:
+    """Autocommit connection in WAL mode, so several processes can share the file.
+
+    Transactions are opened explicitly; a writer that finds the database locked
+    waits up to five seconds for the other process instead of failing at once.
+    """
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, cached_statements=256)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+class SQLiteACATStore:
+    """ACAT tracking store persisted to a SQLite database.
+
+    Drop-in replacement for InMemoryACATStore. The database runs in WAL mode so
+    several uvicorn workers can share one file: readers never block the single
+    writer, and each write is one short transaction.
+    """
+
+    def __init__(self, path: str, audit_log: Optional[AuditLog] = None, change_log_size: int = 10000) -> None:
+        self.path = path
+        self.audit_log = audit_log
+        self.change_log_size = change_log_size
+        self._lock = threading.RLock()
+        self._conn = open_database(path)
+        had_positions = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'acat_positions'"
+        ).fetchone() is not None
+        self._conn.executescript(_SCHEMA)
+        # Databases created before records carried versions
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(acat_records)")}
+        if "version" not in columns:
+            self._conn.execute("ALTER TABLE acat_records ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        # ... or before the CUSIP index existed
+        if not had_positions:
+            self._conn.execute(_BACKFILL_POSITIONS)
+        # ... or before duplicate detection
+        if "fingerprint" not in columns:
+            self._conn.execute("ALTER TABLE acat_records ADD COLUMN fingerprint TEXT")
+            self._backfill_fingerprints()
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_acat_records_fingerprint ON acat_records (fingerprint) WHERE {_IN_FLIGHT}")
+        # Identifies this database, so versions from a recreated file are never mistaken for these
+        self._conn.execute("INSERT OR IGNORE INTO store_meta (key, value) VALUES ('instance_id', ?)", (uuid.uuid4().hex[:12],))
+        self.instance_id = self._conn.execute("SELECT value FROM store_meta WHERE key = 'instance_id'").fetchone()[0]
+        # Called as listener(change_type, records, version) after writes made through this process
+        self._listeners: List[Callable] = []
+
+    @property
+    def version(self) -> int:
+        """Bumped in every write transaction, so it is shared by all processes using the file."""
+        with self._lock:
+            return self._conn.execute("SELECT value FROM store_meta WHERE key = 'version'").fetchone()[0]
+
+    def add_listener(self, listener: Callable) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable) -> None:
+        self._listeners.remove(listener)
+
+    def _notify(self, change_type: str, records: List[ACATRecord]) -> None:
+        if not self._listeners:
+            return
+        version = self.version
+        for listener in self._listeners:
+            listener(change_type, records, version)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Serialize writers in this process and take the database write lock up front."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                (version,) = self._conn.execute(_BUMP_VERSION).fetchone()
+                if version % _TRIM_CHANGES_EVERY == 0:
+                    self._trim_change_log(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # --- row mapping ---
+
+    def _trim_change_log(self, conn: sqlite3.Connection) -> None:
+        """Drop all but the newest change_log_size rows, always cutting between versions."""
+        cutoff = conn.execute(
+            "SELECT version FROM acat_changes ORDER BY version DESC LIMIT 1 OFFSET ?", (self.change_log_size,)
+        ).fetchone()
+        if cutoff is not None:
+            conn.execute("DELETE FROM acat_changes WHERE version <= ?", cutoff)
+            conn.execute("UPDATE store_meta SET value = MAX(value, ?) WHERE key = 'change_floor'", cutoff)
+
+    def _backfill_fingerprints(self) -> None:
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT id, acat_data FROM acat_records").fetchall()
+            conn.executemany("UPDATE acat_records SET fingerprint = ? WHERE id = ?", [
+                (request_fingerprint(ACATRequest.parse_raw(acat_data)), record_id) for record_id, acat_data in rows
+            ])
+
+    def _write_record(self, conn: sqlite3.Connection, record: ACATRecord) -> None:
+        quantities = cusip_quantities(record.acat_data)
+        conn.execute(_UPSERT_RECORD, (
+            record.id,
+            _status_value(record.status),
+            record.acat_data.contra_firm,
+            record.acat_data.delivering_account,
+            record.acat_data.receiving_account,
+            _format_timestamp(record.created_at),
+            _format_timestamp(record.updated_at),
+            record.acat_data.json(),
+            record.version,
+            transfer_fingerprint(
+                record.acat_data.delivering_account, record.acat_data.receiving_account, record.acat_data.contra_firm, quantities
+            ),
+        ))
+        conn.execute("DELETE FROM acat_positions WHERE record_id = ?", (record.id,))
+        conn.executemany(_INSERT_POSITION, [(cusip, record.id, quantity) for cusip, quantity in quantities.items()])
+        conn.execute(_LOG_CHANGE, (record.id, 0))
+
+    @staticmethod
+    def _history_row(record_id: str, seq: int, entry: Dict) -> Tuple:
+        return (
+            record_id,
+            seq,
+            _status_value(entry["from_status"]),
+            _status_value(entry["to_status"]),
+            entry["reason"],
+            entry["updated_by"],
+            entry["updated_at"],
+        )
+
+    @staticmethod
+    def _history_entry(row: Tuple) -> Dict:
+        from_status, to_status, reason, updated_by, updated_at = row
+        return {
+            "from_status": ACATStatus(from_status),
+            "to_status": ACATStatus(to_status),
+            "reason": reason,
+            "updated_by": updated_by,
+            "updated_at": updated_at,
+        }
+
+    @staticmethod
+    def _build_record(row: Tuple, history: List[Dict]) -> ACATRecord:
+        record_id, status, created_at, updated_at, acat_data, version = row
+        # Columns were validated on the way in, so skip re-validating the outer model
+        return ACATRecord.construct(
+            id=record_id,
+            status=ACATStatus(status),
+            acat_data=ACATRequest.parse_raw(acat_data),
+            created_at=datetime.strptime(created_at, _TIMESTAMP_FORMAT),
+            updated_at=datetime.strptime(updated_at, _TIMESTAMP_FORMAT),
+            status_history=history,
+            version=version,
+        )
+
+    def _build_records(self, rows: List[Tuple]) -> List[ACATRecord]:
+        """Load histories for a batch of records with one query instead of one per record."""
+        if not rows:
+            return []
+        histories: Dict[str, List[Dict]] = defaultdict(list)
+        record_ids = [row[0] for row in rows]
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(record_ids), 500):
+            chunk = record_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for history_row in self._conn.execute(
+                f"SELECT record_id, from_status, to_status, reason, updated_by, updated_at "
+                f"FROM acat_status_history WHERE record_id IN ({placeholders}) ORDER BY record_id, seq",
+                chunk,
+            ):
+                histories[history_row[0]].append(self._history_entry(history_row[1:]))
+        return [self._build_record(row, histories.get(row[0], [])) for row in rows]
+
+    # --- CRUD ---
+
+    def create(self, acat_request: ACATRequest, created_by: str = "system", reject_duplicates: bool = False) -> ACATRecord:
+        return self.create_many([acat_request], created_by, reject_duplicates)[0]
+
+    def create_many(
+        self, acat_requests: List[ACATRequest], created_by: str = "system", reject_duplicates: bool = False
+    ) -> List[ACATRecord]:
+        """Insert several records in one transaction with a single batched audit write.
+
+        `reject_duplicates` works as in InMemoryACATStore; the check runs inside the
+        write transaction, so two workers cannot both create the same transfer.
+        """
+        records = [ACATRecord(id=str(uuid.uuid4()), acat_data=acat_request) for acat_request in acat_requests]
+        with self._transaction() as conn:
+            if reject_duplicates:
+                for index, acat_request in enumerate(acat_requests):
+                    existing_id = self._find_duplicate(conn, request_fingerprint(acat_request))
+                    if existing_id is not None:
+                        raise DuplicateTransfer(existing_id, index)
+            for record in records:
+                self._write_record(conn, record)
+
+        # Log audit entries
+        if self.audit_log:
+            self.audit_log.log_actions([creation_audit_action(record, created_by) for record in records])
+
+        self._notify("created", records)
+        return records
+
+    def save(self, record: ACATRecord) -> ACATRecord:
+        """Store a record as-is (e.g. after backfilling its timestamps), replacing its history.
+
+        Saving counts as a change, so the record's version is incremented first.
+        """
+        record.version += 1
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM acat_status_history WHERE record_id = ?", (record.id,))
+            self._write_record(conn, record)
+            conn.executemany(_INSERT_HISTORY, [
+                self._history_row(record.id, seq, entry)
+                for seq, entry in enumerate(record.status_history, start=1)
+            ])
+        self._notify("saved", [record])
+        return record
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM acat_records").fetchone()[0]
+
+    def list(self) -> List[ACATRecord]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {_RECORD_COLUMNS} FROM acat_records ORDER BY created_at, id").fetchall()
+            return self._build_records(rows)
+
+    def list_all(self) -> List[ACATRecord]:
+        """Alias for list() for consistency with audit log."""
+        return self.list()
+
+    def _where(self, filters: Dict) -> Tuple[List[str], List]:
+        clauses, params = [], []
+        for name, predicate in _FILTER_PREDICATES.items():
+            value = filters.get(name)
+            if value is None:
+                continue
+            if name == "status":
+                value = _status_value(value)
+            elif name.startswith("created_"):
+                value = _format_timestamp(value)
+            clauses.append(predicate)
+            params.append(value)
+        return clauses, params
+
+    def query(self, **filters) -> List[ACATRecord]:
+        """Find records matching all given filters, ordered by (created_at, id).
+
+        Same filters as InMemoryACATStore.query(); each maps onto an indexed column.
+        """
+        clauses, params = self._where(filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_RECORD_COLUMNS} FROM acat_records {where} ORDER BY created_at, id", params
+            ).fetchall()
+            return self._build_records(rows)
+
+    def page(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, str]] = None,
+        **filters,
+    ) -> Tuple[List[ACATRecord], Optional[Tuple[datetime, str]]]:
+        """Return up to `limit` records ordered by (created_at, id), strictly after the `after` key."""
+        clauses, params = self._where(filters)
+        if after is not None:
+            clauses.append("(created_at, id) > (?, ?)")
+            params.extend([_format_timestamp(after[0]), after[1]])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_RECORD_COLUMNS} FROM acat_records {where} ORDER BY created_at, id LIMIT ?",
+                params + [limit + 1],
+            ).fetchall()
+            records = self._build_records(rows[:limit])
+        next_key = None
+        if len(rows) > limit and records:
+            next_key = (_as_naive_utc(records[-1].created_at), records[-1].id)
+        return records, next_key
+
+    def iter_query(self, batch_size: int = 500, **filters) -> Iterator[List[ACATRecord]]:
+        """Yield the records query() would return in batches, one keyset page at a time."""
+        after = None
+        while True:
+            records, after = self.page(batch_size, after=after, **filters)
+            if records:
+                yield records
+            if after is None:
+                return
+
+    def summary(self) -> Dict:
+        """Status totals overall and per contra firm, aggregated from the (contra_firm, status) index."""
+        overall: Dict[ACATStatus, int] = defaultdict(int)
+        per_firm: Dict[str, Dict[ACATStatus, int]] = defaultdict(lambda: defaultdict(int))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT contra_firm, status, COUNT(*) FROM acat_records GROUP BY contra_firm, status"
+            ).fetchall()
+        for contra_firm, status, count in rows:
+            overall[ACATStatus(status)] += count
+            per_firm[contra_firm][ACATStatus(status)] += count
+        by_contra_firm = {
+            contra_firm: summarize_status_counts(counts)
+            for contra_firm, counts in sorted(per_firm.items())
+        }
+        return {**summarize_status_counts(overall), "by_contra_firm": by_contra_firm}
+
+    def changes_since(self, since: int, limit: int = 1000) -> Dict:
+        """Records created, updated or deleted after version `since`; same contract as InMemoryACATStore."""
+        with self._lock:
+            # One read transaction, so the version, the log and the records come from the same snapshot
+            self._conn.execute("BEGIN")
+            try:
+                meta = dict(self._conn.execute(
+                    "SELECT key, value FROM store_meta WHERE key IN ('version', 'change_floor')"
+                ).fetchall())
+                version = meta["version"]
+                if since < meta["change_floor"] or since > version:
+                    return {"version": version, "resync_required": True, "changes": [], "next_since": None, "has_more": False}
+                entries = self._conn.execute(
+                    "SELECT version, record_id, deleted FROM acat_changes WHERE version > ? ORDER BY version", (since,)
+                )
+                latest, resume_after = collate_changes(((v, record_id, bool(deleted)) for v, record_id, deleted in entries), limit)
+                records = {record.id: record for record in self._get_many([
+                    record_id for record_id, (_, deleted) in latest.items() if not deleted
+                ])}
+            finally:
+                self._conn.execute("COMMIT")
+        return {
+            "version": version,
+            "resync_required": False,
+            "changes": [change_entry(record_id, v, records.get(record_id)) for record_id, (v, _) in latest.items()],
+            "next_since": resume_after if resume_after is not None else version,
+            "has_more": resume_after is not None,
+        }
+
+    def aging_columns(self) -> Dict[str, List]:
+        """Column-wise id, status, contra firm and creation time (ISO text) of every record."""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, status, contra_firm, created_at FROM acat_records").fetchall()
+        ids, statuses, contra_firms, created_at = (list(column) for column in zip(*rows)) if rows else ([], [], [], [])
+        return {"ids": ids, "statuses": statuses, "contra_firms": contra_firms, "created_at": created_at}
+
+    @staticmethod
+    def _find_duplicate(conn: sqlite3.Connection, fingerprint: str) -> Optional[str]:
+        row = conn.execute(
+            f"SELECT id FROM acat_records WHERE fingerprint = ? AND {_IN_FLIGHT} ORDER BY created_at, id LIMIT 1",
+            (fingerprint,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def find_duplicate(self, acat_request: ACATRequest) -> Optional[str]:
+        """Id of the earliest in-flight record with the same transfer fingerprint, if any."""
+        with self._lock:
+            return self._find_duplicate(self._conn, request_fingerprint(acat_request))
+
+    def duplicate_groups(self, include_closed: bool = False) -> List[Dict]:
+        """Sets of records sharing a transfer fingerprint; same contract as InMemoryACATStore."""
+        scope = "1" if include_closed else _IN_FLIGHT
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT fingerprint, id, status, created_at FROM acat_records
+                WHERE {scope} AND fingerprint IN (
+                    SELECT fingerprint FROM acat_records WHERE {scope} GROUP BY fingerprint HAVING COUNT(*) > 1
+                )
+                ORDER BY created_at, id
+            """).fetchall()
+        return group_duplicates(
+            (fingerprint, record_id, ACATStatus(status), datetime.strptime(created_at, _TIMESTAMP_FORMAT))
+            for fingerprint, record_id, status, created_at in rows
+        )
+
+    def security_positions(self, cusip: str, statuses: Optional[Iterable[ACATStatus]] = None) -> List[Dict]:
+        """Records transferring `cusip` with their quantity; same contract as InMemoryACATStore."""
+        sql = """
+            SELECT r.id, r.status, r.contra_firm, r.delivering_account, r.receiving_account, r.created_at, p.quantity
+            FROM acat_positions p JOIN acat_records r ON r.id = p.record_id
+            WHERE p.cusip = ?
+        """
+        params: List = [cusip.upper()]
+        if statuses is not None:
+            statuses = [_status_value(status) for status in statuses]
+            sql += f" AND r.status IN ({','.join('?' * len(statuses))})"
+            params.extend(statuses)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY r.created_at, r.id", params).fetchall()
+        return [
+            position_entry(
+                record_id, ACATStatus(status), contra_firm, delivering_account, receiving_account,
+                datetime.strptime(created_at, _TIMESTAMP_FORMAT), quantity,
+            )
+            for record_id, status, contra_firm, delivering_account, receiving_account, created_at, quantity in rows
+        ]
+
+    def get(self, record_id: str) -> ACATRecord:
+        with self._lock:
+            row = self._conn.execute(_SELECT_RECORD, (record_id,)).fetchone()
+            if row is None:
+                raise KeyError(record_id)
+            history = [self._history_entry(history_row) for history_row in self._conn.execute(_SELECT_HISTORY, (record_id,))]
+        return self._build_record(row, history)
+
+    def record_version(self, record_id: str) -> int:
+        """Current version of a record without loading it; KeyError if it does not exist."""
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM acat_records WHERE id = ?", (record_id,)).fetchone()
+        if row is None:
+            raise KeyError(record_id)
+        return row[0]
+
+    def update_status(
+        self,
+        record_id: str,
+        new_status: ACATStatus,
+        reason: str,
+        updated_by: str,
+        learning_service=None,
+        expected_version: Optional[int] = None,
+    ) -> ACATRecord:
+        expected_versions = {record_id: expected_version} if expected_version is not None else None
+        record = self.update_status_many([(record_id, new_status, reason)], updated_by, learning_service, expected_versions)[0]
+        if record is None:
+            raise KeyError(record_id)
+        return record
+
+    def update_status_many(
+        self,
+        transitions: List[Tuple[str, ACATStatus, str]],
+        updated_by: str,
+        learning_service=None,
+        expected_versions: Optional[Dict[str, int]] = None,
+    ) -> List[Optional[ACATRecord]]:
+        """Apply (record_id, new_status, reason) transitions in one transaction.
+
+        Returns the updated record for each transition, or None where the record
+        does not exist. Audit entries and learning updates are sent as one batch.
+        `expected_versions` maps record ids to the version the caller last saw; if
+        any of them has moved on, VersionConflict is raised and nothing is applied.
+        The check runs under the database write lock, so it also holds across workers.
+        """
+        now = datetime.utcnow()
+        applied = []
+        with self._transaction() as conn:
+            for record_id, expected in (expected_versions or {}).items():
+                row = conn.execute("SELECT version FROM acat_records WHERE id = ?", (record_id,)).fetchone()
+                if row is not None and row[0] != expected:
+                    raise VersionConflict(record_id, expected, row[0])
+            for record_id, new_status, reason in transitions:
+                row = conn.execute("SELECT status FROM acat_records WHERE id = ?", (record_id,)).fetchone()
+                if row is None:
+                    applied.append(None)
+                    continue
+                old_status = ACATStatus(row[0])
+                conn.execute(
+                    "UPDATE acat_records SET status = ?, updated_at = ?, version = version + 1 WHERE id = ?",
+                    (_status_value(new_status), _format_timestamp(now), record_id),
+                )
+                conn.execute(_LOG_CHANGE, (record_id, 0))
+                seq = conn.execute(_NEXT_HISTORY_SEQ, (record_id,)).fetchone()[0]
+                conn.execute(_INSERT_HISTORY, self._history_row(record_id, seq, {
+                    "from_status": old_status,
+                    "to_status": new_status,
+                    "reason": reason,
+                    "updated_by": updated_by,
+                    "updated_at": now.isoformat(),
+                }))
+                applied.append((record_id, old_status, new_status, reason))
+
+        records_by_id = {
+            record.id: record
+            for record in self._get_many([item[0] for item in applied if item is not None])
+        }
+        results: List[Optional[ACATRecord]] = []
+        audit_actions, learning_changes = [], []
+        for item in applied:
+            if item is None:
+                results.append(None)
+                continue
+            record_id, old_status, new_status, reason = item
+            record = records_by_id[record_id]
+            results.append(record)
+            audit_actions.append(status_change_audit_action(record, old_status, new_status, reason, updated_by))
+            learning_changes.append((record.acat_data.contra_firm, old_status, new_status, reason))
+
+        # Log audit entries
+        if self.audit_log and audit_actions:
+            self.audit_log.log_actions(audit_actions)
+
+        # Record status changes for learning
+        if learning_service and learning_changes:
+            learning_service.record_status_changes(learning_changes)
+
+        self._notify("status_changed", [records_by_id[record_id] for record_id in dict.fromkeys(item[0] for item in applied if item is not None)])
+        return results
+
+    def _get_many(self, record_ids: List[str]) -> List[ACATRecord]:
+        rows = []
+        with self._lock:
+            for start in range(0, len(record_ids), 500):
+                chunk = record_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(self._conn.execute(
+                    f"SELECT {_RECORD_COLUMNS} FROM acat_records WHERE id IN ({placeholders})", chunk
+                ).fetchall())
+            return self._build_records(rows)
+
+    def delete(self, record_id: str) -> None:
+        removed = self._get_many([record_id]) if self._listeners else []
+        with self._transaction() as conn:
+            if conn.execute("DELETE FROM acat_records WHERE id = ?", (record_id,)).rowcount:
+                conn.execute(_LOG_CHANGE, (record_id, 1))
+        if removed:
+            self._notify("deleted", removed)
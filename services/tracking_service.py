@@ -1,9 +1,19 @@
+import hashlib
+import heapq
+import json
+import threading
 import uuid
-from datetime import datetime
-from typing import Dict, List, Optional
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from pydantic import BaseModel
 
 from models.acat import ACATRecord, ACATRequest, ACATStatus
+from services.audit_chain import GENESIS_HASH, audit_entry_bytes, chain_hash, leaf_hash, merkle_root, verify_run
+from services.compact_records import CompactRecord, compact_history_entry, from_epoch_us, to_epoch_us
 
 
 class AuditEntry(BaseModel):
@@ -14,111 +24,926 @@ class AuditEntry(BaseModel):
     details: Dict
     performed_by: str
     performed_at: datetime
+    # SHA-256 (hex) of the previous entry's chain_hash and this entry, set when the entry is appended
+    chain_hash: Optional[str] = None
 
 
 class AuditLog:
-    """Simple in-memory audit log for tracking all system changes."""
+    """Simple in-memory audit log for tracking all system changes.
+
+    Entries are only ever appended, in time order: timestamps are taken under
+    the append lock and never step back, even if the wall clock does. So the
+    log reads newest-first by walking it backwards, an entry's position is a
+    stable pagination cursor, and time ranges are found by binary search.
+
+    The positions of each entity's and each user's entries are also indexed as
+    they are appended (INDEXED_FIELDS), so their history is read without a scan.
+
+    Every entry is hash-chained to the one before it, and every
+    `checkpoint_interval` entries a checkpoint records the chained hash and the
+    Merkle root of the block's entries. verify() rehashes only the entries after
+    the last checkpoint it verified; publishing chain_head() elsewhere makes
+    rewriting the whole tail detectable too.
+    """
+    
+    INDEXED_FIELDS = ("entity_id", "performed_by")
     
-    def __init__(self):
+    def __init__(self, checkpoint_interval: int = 1024):
+        self.checkpoint_interval = checkpoint_interval
         self._entries: List[AuditEntry] = []
+        # performed_at of each entry, kept non-decreasing for bisecting
+        self._times: List[datetime] = []
+        self._latest: Optional[datetime] = None
+        # field -> value -> ascending positions of the entries with that value
+        self._indexes: Dict[str, Dict[str, array]] = {field: {} for field in self.INDEXED_FIELDS}
+        self._head = GENESIS_HASH
+        # Leaf hashes since the last checkpoint, and (end position, chained hash, Merkle root) checkpoints
+        self._block_leaves: List[bytes] = []
+        self._checkpoints: List[Tuple[int, bytes, bytes]] = []
+        # End of the last checkpoint verify() passed, and the chained hash there
+        self._verified: Tuple[int, bytes] = (0, GENESIS_HASH)
+        self._lock = threading.Lock()
     
     def log_action(self, action: str, entity_type: str, entity_id: str, details: Dict, performed_by: str):
         """Log an action to the audit trail."""
-        entry = AuditEntry(
-            id=str(uuid.uuid4()),
-            action=action,
-            entity_type=entity_type,
-            entity_id=entity_id,
-            details=details,
-            performed_by=performed_by,
-            performed_at=datetime.utcnow()
-        )
-        self._entries.append(entry)
+        self.log_actions([{
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "details": details,
+            "performed_by": performed_by
+        }])
+    
+    def log_actions(self, actions: List[Dict]) -> List[AuditEntry]:
+        """Log a batch of actions (log_action keyword arguments) with one timestamp and one append."""
+        with self._lock:
+            performed_at = datetime.utcnow()
+            if self._latest is not None and performed_at < self._latest:
+                performed_at = self._latest
+            entries = [
+                AuditEntry(id=str(uuid.uuid4()), performed_at=performed_at, **action)
+                for action in actions
+            ]
+            self._append(entries)
+        return entries
+    
+    def append_entries(self, entries: List[AuditEntry]) -> None:
+        """Append entries built elsewhere, e.g. by a background writer, in the order given."""
+        with self._lock:
+            self._append(entries)
+    
+    def _append(self, entries: List[AuditEntry], restored: bool = False) -> None:
+        """Add entries at the end of the log; the caller holds the lock.
+
+        Restored entries keep the chained hash they were first written with, so
+        verify() shows whether they changed since.
+        """
+        for entry in entries:
+            # Entries restored from older logs may not be in order; the search key still must be
+            self._latest = max(entry.performed_at, self._latest) if self._latest is not None else entry.performed_at
+            self._times.append(self._latest)
+            leaf = leaf_hash(audit_entry_bytes(entry, to_epoch_us(entry.performed_at)))
+            # Entries from snapshots taken before hashes were chained have no chain_hash attribute
+            recorded = getattr(entry, "chain_hash", None) if restored else None
+            if recorded is not None:
+                self._head = bytes.fromhex(recorded)
+            else:
+                self._head = chain_hash(self._head, leaf)
+                entry.chain_hash = self._head.hex()
+            self._block_leaves.append(leaf)
+            self._entries.append(entry)
+            if len(self._block_leaves) == self.checkpoint_interval:
+                self._checkpoints.append((len(self._entries), self._head, merkle_root(self._block_leaves)))
+                self._block_leaves = []
+            # Indexed only once the entry is in the list, since readers do not take the lock
+            for field, index in self._indexes.items():
+                index.setdefault(getattr(entry, field), array("q")).append(len(self._entries) - 1)
     
     def get_entries(self) -> List[AuditEntry]:
-        """Get all audit entries sorted by timestamp (newest first)."""
-        return sorted(self._entries, key=lambda x: x.performed_at, reverse=True)
+        """Get all audit entries, newest first."""
+        with self._lock:
+            return self._entries[::-1]
+    
+    def page(
+        self,
+        limit: int = 100,
+        cursor: Optional[int] = None,
+        entity_type: Optional[str] = None,
+        action: Optional[str] = None,
+        performed_by: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Tuple[List[AuditEntry], Optional[int]]:
+        """Up to `limit` matching entries, newest first, and the cursor for the next (older) page.
+
+        `cursor` is the position returned by the previous page; None starts at the
+        newest entry. `since` is inclusive and `until` exclusive. The time range is
+        found by bisecting the timestamps, so the cost is that of the entries
+        walked from the cursor, not the size of the log.
+        """
+        start, end = self._bounds(_as_naive_utc(since), _as_naive_utc(until))
+        if cursor is not None:
+            end = min(end, cursor)
+        entries: List[AuditEntry] = []
+        for position, entry in self._newest_first(start, end):
+            if (
+                (entity_type is None or entry.entity_type == entity_type)
+                and (action is None or entry.action == action)
+                and (performed_by is None or entry.performed_by == performed_by)
+            ):
+                entries.append(entry)
+                if len(entries) == limit:
+                    return entries, (position if position > start else None)
+        return entries, None
+    
+    def _bounds(self, since: Optional[datetime], until: Optional[datetime]) -> Tuple[int, int]:
+        """Positions [start, end) of the entries performed in [since, until)."""
+        with self._lock:
+            end = len(self._entries)
+        start = bisect_left(self._times, since, 0, end) if since is not None else 0
+        if until is not None:
+            end = bisect_left(self._times, until, start, end)
+        return start, end
+    
+    def entity_entries(self, entity_id: str, limit: int = 100, cursor: Optional[int] = None) -> Tuple[List[AuditEntry], Optional[int]]:
+        """Everything that happened to one entity, newest first, paged like page()."""
+        return self._indexed("entity_id", entity_id, limit, cursor)
+    
+    def actor_entries(self, performed_by: str, limit: int = 100, cursor: Optional[int] = None) -> Tuple[List[AuditEntry], Optional[int]]:
+        """Everything one user did, newest first, paged like page()."""
+        return self._indexed("performed_by", performed_by, limit, cursor)
+    
+    def _indexed(self, field: str, value: str, limit: int, cursor: Optional[int]) -> Tuple[List[AuditEntry], Optional[int]]:
+        """Page through the positions indexed under `value`; the cost is that of the page alone."""
+        positions = self._indexes[field].get(value)
+        if positions is None:
+            return [], None
+        end = bisect_left(positions, cursor) if cursor is not None else len(positions)
+        start = max(end - limit, 0)
+        selected = positions[start:end]
+        return [self._entries[position] for position in reversed(selected)], (selected[0] if start > 0 else None)
+    
+    def chain_head(self) -> Dict:
+        """Number of entries and the chained hash of the newest one, to be recorded outside the log."""
+        with self._lock:
+            return {"position": len(self._entries), "chain_hash": self._head.hex()}
+    
+    def verify(self, full: bool = False) -> Dict:
+        """Recompute the hash chain and checkpoints, from the last verified checkpoint unless `full`.
+
+        Returns whether the log is intact, the entries checked, the position
+        verified through (the last checkpoint passed) and the first mismatch.
+        """
+        with self._lock:
+            end = len(self._entries)
+            start, previous = (0, GENESIS_HASH) if full else self._verified
+            checkpoints = self._checkpoints[bisect_right(self._checkpoints, start, key=lambda checkpoint: checkpoint[0]):]
+            head = {"position": end, "chain_hash": self._head.hex()}
+        records = (
+            (audit_entry_bytes(entry, to_epoch_us(entry.performed_at)), bytes.fromhex(entry.chain_hash or ""))
+            for entry in map(self._entries.__getitem__, range(start, end))
+        )
+        run = verify_run(records, previous, start, checkpoints)
+        return self._verified_result(full, run["checked"], run["error"], (run["through"], run["through_hash"]), head)
+    
+    def _verified_result(self, full: bool, checked: int, error: Optional[Dict], through: Tuple[int, bytes], head: Dict) -> Dict:
+        if error is None:
+            with self._lock:
+                if through[0] > self._verified[0]:
+                    self._verified = through
+        return {
+            "ok": error is None,
+            "full": full,
+            "checked": checked,
+            "verified_through": through[0],
+            "head": head,
+            "error": error,
+        }
+    
+    def _newest_first(self, start: int, end: int) -> Iterator[Tuple[int, AuditEntry]]:
+        """(position, entry) from end - 1 down to start."""
+        # Appends never move existing entries, so positions below `end` can be read without the lock
+        for position in range(end - 1, start - 1, -1):
+            yield position, self._entries[position]
+
+
+def _as_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalize a datetime so it can be compared with the naive UTC timestamps on records."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+COMPLETED_STATUSES = (ACATStatus.COMPLETED,)
+FAILED_STATUSES = (ACATStatus.REJECTED, ACATStatus.CANCELLED)
+IN_FLIGHT_STATUSES = tuple(status for status in ACATStatus if status not in COMPLETED_STATUSES + FAILED_STATUSES)
+
+
+class VersionConflict(Exception):
+    """Raised when an update names an expected record version that is no longer current."""
+
+    def __init__(self, record_id: str, expected: int, actual: int):
+        super().__init__(f"Record {record_id} is at version {actual}, not {expected}")
+        self.record_id = record_id
+        self.expected = expected
+        self.actual = actual
+
+
+class DuplicateTransfer(Exception):
+    """Raised when a new transfer matches one that is still in flight.
+
+    `index` is the position of the offending request in a create_many() batch.
+    """
+
+    def __init__(self, existing_id: str, index: int = 0):
+        super().__init__(f"Transfer duplicates in-flight record {existing_id}")
+        self.existing_id = existing_id
+        self.index = index
+
+
+def cusip_quantities(acat_request: ACATRequest) -> Dict[str, int]:
+    """Total quantity transferred per CUSIP (a CUSIP may be listed more than once)."""
+    quantities: Dict[str, int] = defaultdict(int)
+    for security in acat_request.securities:
+        quantities[security.cusip] += security.quantity
+    return quantities
+
+
+def transfer_fingerprint(delivering_account: str, receiving_account: str, contra_firm: str, quantities: Dict[str, int]) -> str:
+    """Identity of a transfer for duplicate detection: who it moves between and exactly what it moves.
+
+    The CUSIP/quantity pairs are sorted, so the order securities are listed in does not matter.
+    """
+    canonical = json.dumps([delivering_account, receiving_account, contra_firm, sorted(quantities.items())], separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def request_fingerprint(acat_request: ACATRequest) -> str:
+    return transfer_fingerprint(
+        acat_request.delivering_account, acat_request.receiving_account, acat_request.contra_firm, cusip_quantities(acat_request)
+    )
+
+
+def group_duplicates(rows: Iterable[Tuple[str, str, ACATStatus, datetime]]) -> List[Dict]:
+    """Group (fingerprint, id, status, created_at) rows, given in creation order, into sets of duplicates.
+
+    Fingerprints seen only once are dropped; groups are ordered by their earliest record.
+    """
+    groups: Dict[str, List[Dict]] = defaultdict(list)
+    for fingerprint, record_id, status, created_at in rows:
+        groups[fingerprint].append({"id": record_id, "status": status, "created_at": created_at})
+    return [
+        {"fingerprint": fingerprint, "records": records}
+        for fingerprint, records in groups.items()
+        if len(records) > 1
+    ]
+
+
+def summarize_status_counts(counts: Dict[ACATStatus, int]) -> Dict:
+    """Turn per-status counts into the totals and success rate shown on the dashboard."""
+    by_status = {status.value: counts.get(status, 0) for status in ACATStatus}
+    total = sum(by_status.values())
+    completed = sum(counts.get(status, 0) for status in COMPLETED_STATUSES)
+    failed = sum(counts.get(status, 0) for status in FAILED_STATUSES)
+    return {
+        "total": total,
+        "by_status": by_status,
+        "completed": completed,
+        "failed": failed,
+        "in_progress": total - completed - failed,
+        "success_rate": completed / total if total else 0.0,
+    }
+
+
+def creation_audit_action(record: ACATRecord, created_by: str) -> Dict:
+    """Audit log arguments describing the creation of a tracking record."""
+    acat_request = record.acat_data
+    return {
+        "action": "create",
+        "entity_type": "acat",
+        "entity_id": record.id,
+        "details": {
+            "delivering_account": acat_request.delivering_account,
+            "receiving_account": acat_request.receiving_account,
+            "contra_firm": acat_request.contra_firm,
+            "transfer_type": acat_request.transfer_type
+        },
+        "performed_by": created_by
+    }
+
+
+def status_change_audit_action(record: ACATRecord, old_status: ACATStatus, new_status: ACATStatus, reason: str, updated_by: str) -> Dict:
+    """Audit log arguments describing a status change of `record`."""
+    return {
+        "action": "status_change",
+        "entity_type": "acat",
+        "entity_id": record.id,
+        "details": {
+            "from_status": old_status,
+            "to_status": new_status,
+            "reason": reason,
+            "delivering_account": record.acat_data.delivering_account,
+            "receiving_account": record.acat_data.receiving_account
+        },
+        "performed_by": updated_by
+    }
+
+
+def collate_changes(entries: Iterable[Tuple[int, str, bool]], limit: int) -> Tuple[Dict[str, Tuple[int, bool]], Optional[int]]:
+    """Reduce (version, record_id, deleted) change-log entries, in version order, to the latest change per record.
+
+    Stops once `limit` records are collected, but never part-way through a
+    version. Returns the changes, ordered by version, and the version to resume
+    after, or None if the entries ran out first.
+    """
+    latest: Dict[str, Tuple[int, bool]] = {}
+    last_version = None
+    for version, record_id, deleted in entries:
+        if len(latest) >= limit and record_id not in latest and version != last_version:
+            return latest, last_version
+        # Re-inserting moves the record to the position of its latest change
+        latest.pop(record_id, None)
+        latest[record_id] = (version, deleted)
+        last_version = version
+    return latest, None
+
+
+def change_entry(record_id: str, version: int, record: Optional[ACATRecord]) -> Dict:
+    """One item of a changes_since() response; a missing record is a tombstone."""
+    if record is None:
+        return {"id": record_id, "version": version, "deleted": True}
+    return {"id": record_id, "version": version, "deleted": False, "record": record}
+
+
+def position_entry(record_id: str, status: ACATStatus, contra_firm: str, delivering_account: str,
+                   receiving_account: str, created_at: datetime, quantity: int) -> Dict:
+    """One item of a security_positions() response: a transfer and how much of the security it moves."""
+    return {
+        "id": record_id,
+        "status": status,
+        "contra_firm": contra_firm,
+        "delivering_account": delivering_account,
+        "receiving_account": receiving_account,
+        "created_at": created_at,
+        "quantity": quantity,
+    }
+
+
+def _bucket_add(index: Dict, value, record_id: str) -> None:
+    # Most account numbers map to a single record, so a lone id is stored bare
+    # and only promoted to a set once a second record shares the value.
+    bucket = index.get(value)
+    if bucket is None:
+        index[value] = record_id
+    elif isinstance(bucket, str):
+        index[value] = {bucket, record_id}
+    else:
+        bucket.add(record_id)
+
+
+def _bucket_discard(index: Dict, value, record_id: str) -> None:
+    bucket = index.get(value)
+    if bucket is None:
+        return
+    if isinstance(bucket, str):
+        if bucket == record_id:
+            del index[value]
+        return
+    bucket.discard(record_id)
+    if len(bucket) == 1:
+        index[value] = next(iter(bucket))
+    elif not bucket:
+        del index[value]
+
+
+def _bucket_ids(bucket) -> Set[str]:
+    if bucket is None:
+        return set()
+    return {bucket} if isinstance(bucket, str) else bucket
+
+
+def _compact_fingerprint(compact: CompactRecord) -> str:
+    return transfer_fingerprint(
+        compact.delivering_account, compact.receiving_account, compact.contra_firm, compact.quantities_by_cusip()
+    )
 
 
 class InMemoryACATStore:
-    """A simple in-memory store to track ACATs and their DTCC-related statuses."""
+    """A simple in-memory store to track ACATs and their DTCC-related statuses.
+
+    Records are held as CompactRecord objects and turned back into ACATRecord
+    models only when returned to callers, so mutating a returned record does not
+    change the store until it is passed to save().
+    """
+
+    # Fields with an equality index, as named on CompactRecord
+    INDEXED_FIELDS = ("status", "contra_firm", "delivering_account", "receiving_account")
 
-    def __init__(self, audit_log: Optional[AuditLog] = None) -> None:
-        self._records: Dict[str, ACATRecord] = {}
+    def __init__(self, audit_log: Optional[AuditLog] = None, change_log_size: int = 10000) -> None:
+        self._records: Dict[str, CompactRecord] = {}
         self.audit_log = audit_log
+        # Secondary indexes: field -> value -> record id, or set of ids when shared
+        self._indexes: Dict[str, Dict] = {field: {} for field in self.INDEXED_FIELDS}
+        # Transfer fingerprint -> id(s) of the in-flight records with it, bucketed like _indexes
+        self._fingerprint_index: Dict[str, object] = {}
+        # Inverted index: CUSIP -> record id -> total quantity of it the record transfers
+        self._cusip_index: Dict[str, Dict[str, int]] = {}
+        # (created_at epoch microseconds, id) pairs kept sorted for range queries
+        self._created_index: List[Tuple[int, str]] = []
+        # Running aggregates for summary(): status -> count, contra firm -> status -> count
+        self._status_counts: Counter = Counter()
+        self._firm_status_counts: Dict[str, Counter] = defaultdict(Counter)
+        # Bumped on every mutation; with instance_id it identifies a state of the store (e.g. for ETags)
+        self.instance_id = uuid.uuid4().hex[:12]
+        self.version = 0
+        # Ring buffer of (version, record id, deleted) for changes_since(); changes at
+        # or before _change_floor have been evicted (or predate a bulk load)
+        self._change_log: Deque[Tuple[int, str, bool]] = deque(maxlen=change_log_size)
+        self._change_floor = 0
+        # Called as listener(change_type, records, version) after every write through the public API
+        self._listeners: List[Callable] = []
+
+    # --- change listeners ---
+
+    def add_listener(self, listener: Callable) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable) -> None:
+        self._listeners.remove(listener)
+
+    def _notify(self, change_type: str, records: List[ACATRecord]) -> None:
+        for listener in self._listeners:
+            listener(change_type, records, self.version)
+
+    # --- index maintenance ---
+
+    def _count(self, compact: CompactRecord, delta: int) -> None:
+        self._status_counts[compact.status] += delta
+        firm_counts = self._firm_status_counts[compact.contra_firm]
+        firm_counts[compact.status] += delta
+        if delta < 0 and not any(firm_counts.values()):
+            del self._firm_status_counts[compact.contra_firm]
+
+    def _index(self, compact: CompactRecord, keep_sorted: bool = True) -> None:
+        for field in self.INDEXED_FIELDS:
+            _bucket_add(self._indexes[field], getattr(compact, field), compact.id)
+        for cusip, quantity in compact.quantities_by_cusip().items():
+            self._cusip_index.setdefault(cusip, {})[compact.id] = quantity
+        if compact.status in IN_FLIGHT_STATUSES:
+            _bucket_add(self._fingerprint_index, _compact_fingerprint(compact), compact.id)
+        created_key = (compact.created_at, compact.id)
+        if keep_sorted:
+            self._created_index.insert(bisect_left(self._created_index, created_key), created_key)
+        else:
+            self._created_index.append(created_key)
+        self._count(compact, 1)
+
+    def _unindex(self, compact: CompactRecord) -> None:
+        for field in self.INDEXED_FIELDS:
+            _bucket_discard(self._indexes[field], getattr(compact, field), compact.id)
+        for cusip in compact.quantities_by_cusip():
+            holders = self._cusip_index.get(cusip)
+            if holders is not None:
+                holders.pop(compact.id, None)
+                if not holders:
+                    del self._cusip_index[cusip]
+        if compact.status in IN_FLIGHT_STATUSES:
+            _bucket_discard(self._fingerprint_index, _compact_fingerprint(compact), compact.id)
+        created_key = (compact.created_at, compact.id)
+        position = bisect_left(self._created_index, created_key)
+        if position < len(self._created_index) and self._created_index[position] == created_key:
+            del self._created_index[position]
+        self._count(compact, -1)
+
+    def _replace(self, previous: CompactRecord, compact: CompactRecord) -> None:
+        """Swap in an updated copy of a stored record whose securities and indexed fields other than status are unchanged.
+
+        Touches only the status index and counters. Stored records are never
+        mutated, so a reader holding the previous copy still sees a consistent record.
+        """
+        _bucket_discard(self._indexes["status"], previous.status, previous.id)
+        self._count(previous, -1)
+        self._records[compact.id] = compact
+        _bucket_add(self._indexes["status"], compact.status, compact.id)
+        self._count(compact, 1)
+        # Records leave the duplicate index once they complete, fail or are cancelled (and rejoin if reopened)
+        was_in_flight, is_in_flight = previous.status in IN_FLIGHT_STATUSES, compact.status in IN_FLIGHT_STATUSES
+        if was_in_flight != is_in_flight:
+            fingerprint = _compact_fingerprint(compact)
+            if is_in_flight:
+                _bucket_add(self._fingerprint_index, fingerprint, compact.id)
+            else:
+                _bucket_discard(self._fingerprint_index, fingerprint, compact.id)
+        self._log_change(compact.id)
+
+    def _log_change(self, record_id: str, deleted: bool = False) -> None:
+        self.version += 1
+        if len(self._change_log) == self._change_log.maxlen:
+            self._change_floor = self._change_log[0][0]
+        self._change_log.append((self.version, record_id, deleted))
+
+    # --- CRUD ---
 
-    def create(self, acat_request: ACATRequest, created_by: str = "system") -> ACATRecord:
-        record_id = str(uuid.uuid4())
-        record = ACATRecord(id=record_id, acat_data=acat_request)
-        self._records[record_id] = record
+    def create(self, acat_request: ACATRequest, created_by: str = "system", reject_duplicates: bool = False) -> ACATRecord:
+        return self.create_many([acat_request], created_by, reject_duplicates)[0]
+
+    def create_many(
+        self, acat_requests: List[ACATRequest], created_by: str = "system", reject_duplicates: bool = False
+    ) -> List[ACATRecord]:
+        """Create several records in one store operation with a single batched audit write.
+
+        With `reject_duplicates`, DuplicateTransfer is raised and nothing is created
+        if any request matches a record already in flight.
+        """
+        records = self._create_records(acat_requests, reject_duplicates)
         
-        # Log audit entry
+        # Log audit entries
         if self.audit_log:
-            self.audit_log.log_action(
-                action="create",
-                entity_type="acat",
-                entity_id=record_id,
-                details={
-                    "delivering_account": acat_request.delivering_account,
-                    "receiving_account": acat_request.receiving_account,
-                    "contra_firm": acat_request.contra_firm,
-                    "transfer_type": acat_request.transfer_type
-                },
-                performed_by=created_by
-            )
+            self.audit_log.log_actions([creation_audit_action(record, created_by) for record in records])
         
+        self._notify("created", records)
+        return records
+
+    def _create_records(self, acat_requests: List[ACATRequest], reject_duplicates: bool) -> List[ACATRecord]:
+        """Store the new records; create_many() then logs and announces them."""
+        if reject_duplicates:
+            for index, acat_request in enumerate(acat_requests):
+                existing_id = self.find_duplicate(acat_request)
+                if existing_id is not None:
+                    raise DuplicateTransfer(existing_id, index)
+        records = [ACATRecord(id=str(uuid.uuid4()), acat_data=acat_request) for acat_request in acat_requests]
+        for record in records:
+            self._put(record)
+        return records
+
+    def save(self, record: ACATRecord) -> ACATRecord:
+        """Store a record as-is (e.g. after backfilling its timestamps) and refresh its index entries.
+
+        Saving counts as a change, so the record's version is incremented first.
+        """
+        record.version += 1
+        self._put(record)
+        self._notify("saved", [record])
         return record
 
+    def _put(self, record: ACATRecord) -> None:
+        self._store(CompactRecord.from_record(record))
+
+    def _store(self, compact: CompactRecord) -> None:
+        previous = self._records.get(compact.id)
+        if previous is not None:
+            self._unindex(previous)
+        self._records[compact.id] = compact
+        self._index(compact)
+        self._log_change(compact.id)
+
+    def load(self, records: List[ACATRecord]) -> None:
+        """Bulk-load records into an empty store, sorting the creation index once."""
+        self._load_compact([CompactRecord.from_record(record) for record in records])
+
+    def _load_compact(self, compacts: List[CompactRecord]) -> None:
+        if self._records:
+            raise ValueError("load() requires an empty store")
+        for compact in compacts:
+            self._records[compact.id] = compact
+            self._index(compact, keep_sorted=False)
+        self._created_index.sort()
+        # Bulk loads are not logged record by record, so earlier versions cannot be diffed
+        self.version += 1
+        self._change_floor = self.version
+
+    def __len__(self) -> int:
+        return len(self._records)
+
     def list(self) -> List[ACATRecord]:
-        return list(self._records.values())
+        return [compact.to_record() for compact in self._records.values()]
     
     def list_all(self) -> List[ACATRecord]:
         """Alias for list() for consistency with audit log."""
         return self.list()
 
+    def query(
+        self,
+        status: Optional[ACATStatus] = None,
+        contra_firm: Optional[str] = None,
+        delivering_account: Optional[str] = None,
+        receiving_account: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+    ) -> List[ACATRecord]:
+        """Find records matching all given filters, ordered by (created_at, id).
+
+        Equality filters are answered by intersecting the secondary indexes, smallest
+        first; the created_at range (after inclusive, before exclusive) is a bisect
+        on the sorted creation index. No filters returns every record.
+        """
+        compacts = [self._records.get(record_id) for record_id in self._query_ids(
+            status, contra_firm, delivering_account, receiving_account, created_after, created_before
+        )]
+        return [compact.to_record() for compact in compacts if compact is not None]
+
+    def page(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, str]] = None,
+        **filters,
+    ) -> Tuple[List[ACATRecord], Optional[Tuple[datetime, str]]]:
+        """Return up to `limit` records ordered by (created_at, id), strictly after the `after` key.
+
+        Accepts the same filters as query(). The second element is the key to pass as
+        `after` for the next page, or None when there are no more records.
+        """
+        record_ids = self._query_ids(after=after, limit=limit + 1, **filters)
+        has_more = len(record_ids) > limit
+        compacts = [compact for compact in map(self._records.get, record_ids[:limit]) if compact is not None]
+        next_key = None
+        if has_more and compacts:
+            next_key = (from_epoch_us(compacts[-1].created_at), compacts[-1].id)
+        return [compact.to_record() for compact in compacts], next_key
+
+    def iter_query(self, batch_size: int = 500, **filters) -> Iterator[List[ACATRecord]]:
+        """Yield the records query() would return in batches, for streaming exports.
+
+        The matching ids are fixed up front; records deleted while the caller is
+        still consuming batches are skipped.
+        """
+        record_ids = self._query_ids(**filters)
+        for start in range(0, len(record_ids), batch_size):
+            batch = [self._records.get(record_id) for record_id in record_ids[start:start + batch_size]]
+            yield [compact.to_record() for compact in batch if compact is not None]
+
+    def _query_ids(
+        self,
+        status: Optional[ACATStatus] = None,
+        contra_firm: Optional[str] = None,
+        delivering_account: Optional[str] = None,
+        receiving_account: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        after: Optional[Tuple[datetime, str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        filters = dict(zip(self.INDEXED_FIELDS, (
+            ACATStatus(status) if status is not None else None,
+            contra_firm,
+            delivering_account,
+            receiving_account,
+        )))
+        candidate_sets = []
+        for field, value in filters.items():
+            if value is None:
+                continue
+            bucket = _bucket_ids(self._indexes[field].get(value))
+            if not bucket:
+                return []
+            candidate_sets.append(bucket)
+        candidate_sets.sort(key=len)
+
+        lo = bisect_left(self._created_index, (to_epoch_us(created_after),)) if created_after is not None else 0
+        if after is not None:
+            lo = max(lo, bisect_right(self._created_index, (to_epoch_us(after[0]), after[1])))
+        hi = bisect_left(self._created_index, (to_epoch_us(created_before),)) if created_before is not None else len(self._created_index)
+        if lo >= hi:
+            return []
+
+        # Walk the created_at range when it is narrower than the best equality index
+        if not candidate_sets or hi - lo <= len(candidate_sets[0]):
+            if not candidate_sets:
+                stop = hi if limit is None else min(hi, lo + limit)
+                return [record_id for _, record_id in self._created_index[lo:stop]]
+            matches = []
+            for position in range(lo, hi):
+                record_id = self._created_index[position][1]
+                if all(record_id in bucket for bucket in candidate_sets):
+                    matches.append(record_id)
+                    if limit is not None and len(matches) >= limit:
+                        break
+            return matches
+
+        matches = set(candidate_sets[0]).intersection(*candidate_sets[1:])
+        range_start = self._created_index[lo]
+        range_end = self._created_index[hi - 1]
+        keyed = []
+        for record_id in matches:
+            created_key = (self._records[record_id].created_at, record_id)
+            if range_start <= created_key <= range_end:
+                keyed.append(created_key)
+        keyed = heapq.nsmallest(limit, keyed) if limit is not None else sorted(keyed)
+        return [record_id for _, record_id in keyed]
+
+    def summary(self) -> Dict:
+        """Status totals overall and per contra firm, read from counters kept up to date on every write."""
+        by_contra_firm = {
+            contra_firm: summarize_status_counts(counts)
+            for contra_firm, counts in sorted(self._firm_status_counts.items())
+        }
+        return {**summarize_status_counts(self._status_counts), "by_contra_firm": by_contra_firm}
+
+    def changes_since(self, since: int, limit: int = 1000) -> Dict:
+        """Records created, updated or deleted after version `since`, latest state only.
+
+        Served from the change-log ring buffer: if it no longer reaches back to
+        `since` (or `since` is from the future, e.g. another store instance), the
+        response only says `resync_required`. Otherwise pass `next_since` back to
+        continue; `has_more` says whether another call is needed right away.
+        """
+        if since < self._change_floor or since > self.version:
+            return {"version": self.version, "resync_required": True, "changes": [], "next_since": None, "has_more": False}
+        start = bisect_left(self._change_log, (since + 1,))
+        latest, resume_after = collate_changes(islice(self._change_log, start, None), limit)
+        changes = []
+        for record_id, (version, deleted) in latest.items():
+            compact = None if deleted else self._records.get(record_id)
+            changes.append(change_entry(record_id, version, compact.to_record() if compact is not None else None))
+        return {
+            "version": self.version,
+            "resync_required": False,
+            "changes": changes,
+            "next_since": resume_after if resume_after is not None else self.version,
+            "has_more": resume_after is not None,
+        }
+
+    def aging_columns(self) -> Dict[str, List]:
+        """Column-wise id, status, contra firm and creation time (epoch microseconds) of every record."""
+        compacts = list(self._records.values())
+        return {
+            "ids": [compact.id for compact in compacts],
+            "statuses": [compact.status.value for compact in compacts],
+            "contra_firms": [compact.contra_firm for compact in compacts],
+            "created_at": [compact.created_at for compact in compacts],
+        }
+
+    def find_duplicate(self, acat_request: ACATRequest) -> Optional[str]:
+        """Id of the earliest in-flight record with the same transfer fingerprint, if any; a single index lookup."""
+        bucket = self._fingerprint_index.get(request_fingerprint(acat_request))
+        if bucket is None or isinstance(bucket, str):
+            return bucket
+        return min(bucket, key=lambda record_id: (self._records[record_id].created_at, record_id))
+
+    def duplicate_groups(self, include_closed: bool = False) -> List[Dict]:
+        """Sets of records sharing a transfer fingerprint, for a dedupe report.
+
+        In-flight duplicates come straight from the fingerprint index;
+        `include_closed` fingerprints every record instead, so completed, rejected
+        and cancelled transfers are grouped too.
+        """
+        if include_closed:
+            compacts = list(self._records.values())
+        else:
+            compacts = [
+                self._records[record_id]
+                for bucket in self._fingerprint_index.values() if not isinstance(bucket, str)
+                for record_id in bucket
+            ]
+        compacts.sort(key=lambda compact: (compact.created_at, compact.id))
+        return group_duplicates(
+            (_compact_fingerprint(compact), compact.id, compact.status, from_epoch_us(compact.created_at))
+            for compact in compacts
+        )
+
+    def security_positions(self, cusip: str, statuses: Optional[Iterable[ACATStatus]] = None) -> List[Dict]:
+        """Records transferring `cusip` with the quantity each one moves, ordered by (created_at, id).
+
+        Answered from the CUSIP index without building full records, so the cost
+        depends on how many transfers hold the security, not on the size of the
+        book. `statuses` keeps only records in those statuses (e.g. IN_FLIGHT_STATUSES).
+        """
+        wanted = {ACATStatus(status) for status in statuses} if statuses is not None else None
+        keyed = []
+        for record_id, quantity in self._cusip_index.get(cusip.upper(), {}).items():
+            compact = self._records[record_id]
+            if wanted is None or compact.status in wanted:
+                keyed.append((compact.created_at, record_id, compact, quantity))
+        keyed.sort(key=lambda item: item[:2])
+        return [
+            position_entry(
+                record_id,
+                compact.status,
+                compact.contra_firm,
+                compact.delivering_account,
+                compact.receiving_account,
+                from_epoch_us(created_at),
+                quantity,
+            )
+            for created_at, record_id, compact, quantity in keyed
+        ]
+
     def get(self, record_id: str) -> ACATRecord:
-        return self._records[record_id]
+        return self._records[record_id].to_record()
 
-    def update_status(self, record_id: str, new_status: ACATStatus, reason: str, updated_by: str, learning_service=None) -> ACATRecord:
-        record = self._records[record_id]
-        old_status = record.status
-        record.status = new_status
-        record.updated_at = datetime.utcnow()
+    def record_version(self, record_id: str) -> int:
+        """Current version of a record without building it; KeyError if it does not exist."""
+        return self._records[record_id].version
+
+    def update_status(
+        self,
+        record_id: str,
+        new_status: ACATStatus,
+        reason: str,
+        updated_by: str,
+        learning_service=None,
+        expected_version: Optional[int] = None,
+    ) -> ACATRecord:
+        expected_versions = {record_id: expected_version} if expected_version is not None else None
+        record = self.update_status_many([(record_id, new_status, reason)], updated_by, learning_service, expected_versions)[0]
+        if record is None:
+            raise KeyError(record_id)
+        return record
+
+    def update_status_many(
+        self,
+        transitions: List[Tuple[str, ACATStatus, str]],
+        updated_by: str,
+        learning_service=None,
+        expected_versions: Optional[Dict[str, int]] = None,
+    ) -> List[Optional[ACATRecord]]:
+        """Apply (record_id, new_status, reason) transitions in one store operation.
+
+        Returns the updated record for each transition, or None where the record
+        does not exist. Audit entries and learning updates are sent as one batch.
+        `expected_versions` maps record ids to the version the caller last saw; if
+        any of them has moved on, VersionConflict is raised and nothing is applied.
+        """
+        results, changes = self._apply_transitions(transitions, updated_by, expected_versions)
         
-        # Add to status history
-        record.status_history.append({
-            "from_status": old_status,
-            "to_status": new_status,
-            "reason": reason,
-            "updated_by": updated_by,
-            "updated_at": datetime.utcnow().isoformat()
-        })
+        # Log audit entries
+        if self.audit_log and changes:
+            self.audit_log.log_actions([
+                status_change_audit_action(record, old_status, new_status, reason, updated_by)
+                for record, old_status, new_status, reason in changes
+            ])
         
-        # Log audit entry
-        if self.audit_log:
-            self.audit_log.log_action(
-                action="status_change",
-                entity_type="acat",
-                entity_id=record_id,
-                details={
+        # Record status changes for learning
+        if learning_service and changes:
+            learning_service.record_status_changes([
+                (record.acat_data.contra_firm, old_status, new_status, reason)
+                for record, old_status, new_status, reason in changes
+            ])
+        
+        self._notify("status_changed", list({record.id: record for record, *_ in changes}.values()))
+        return results
+
+    def _apply_transitions(
+        self,
+        transitions: List[Tuple[str, ACATStatus, str]],
+        updated_by: str,
+        expected_versions: Optional[Dict[str, int]],
+    ) -> Tuple[List[Optional[ACATRecord]], List[Tuple[ACATRecord, ACATStatus, ACATStatus, str]]]:
+        """Store the transitions; returns the results and (record, old status, new status, reason) per change."""
+        for record_id, expected in (expected_versions or {}).items():
+            compact = self._records.get(record_id)
+            if compact is not None and compact.version != expected:
+                raise VersionConflict(record_id, expected, compact.version)
+
+        now = datetime.utcnow()
+        changed = []
+        for record_id, new_status, reason in transitions:
+            compact = self._records.get(record_id)
+            if compact is None:
+                changed.append(None)
+                continue
+            new_status = ACATStatus(new_status)
+            old_status = compact.status
+            updated = compact.replace(
+                status=new_status,
+                updated_at=to_epoch_us(now),
+                version=compact.version + 1,
+                # Add to status history
+                history=compact.history + (compact_history_entry({
                     "from_status": old_status,
                     "to_status": new_status,
                     "reason": reason,
-                    "delivering_account": record.acat_data.delivering_account,
-                    "receiving_account": record.acat_data.receiving_account
-                },
-                performed_by=updated_by
+                    "updated_by": updated_by,
+                    "updated_at": now.isoformat()
+                }),),
             )
-        
-        # Record status change for learning
-        if learning_service:
-            learning_service.record_status_change(record.acat_data.contra_firm, old_status, new_status, reason)
-        
-        self._records[record_id] = record
-        return record
+            self._replace(compact, updated)
+            changed.append((updated, old_status, new_status, reason))
 
-    def delete(self, record_id: str) -> None:
-        if record_id in self._records:
-            del self._records[record_id]
+        # Build each returned record once, from its final state after the whole batch
+        final = {item[0].id: item[0] for item in changed if item is not None}
+        built = {}
+        results: List[Optional[ACATRecord]] = []
+        changes = []
+        for item in changed:
+            if item is None:
+                results.append(None)
+                continue
+            compact, old_status, new_status, reason = item
+            if compact.id not in built:
+                built[compact.id] = final[compact.id].to_record()
+            results.append(built[compact.id])
+            changes.append((built[compact.id], old_status, new_status, reason))
+        return results, changes
 
+    def delete(self, record_id: str) -> None:
+        compact = self._remove(record_id)
+        if compact is not None and self._listeners:
+            self._notify("deleted", [compact.to_record()])
 
+    def _remove(self, record_id: str) -> Optional[CompactRecord]:
+        compact = self._records.pop(record_id, None)
+        if compact is not None:
+            self._unindex(compact)
+            self._log_change(record_id, deleted=True)
+        return compact
@@ -19,6 +19,7 @@ document.addEventListener('DOMContentLoaded', function() {
     loadContraFirms();
     setupEventListeners();
     refreshACATList();
+    connectACATStream();
     checkAuth();
 });
 
@@ -232,13 +233,18 @@ async function submitACAT() {
             body: JSON.stringify(submissionData)
         });
         
+        if (response.status === 409) {
+            // Same accounts, contra firm and securities as a transfer still in flight
+            const error = await response.json();
+            throw new Error(error.detail);
+        }
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         
         const result = await response.json();
         alert(`ACAT submitted successfully!\nSubmission ID: ${result.submission_id}`);
-        refreshACATList();
+        if (!isACATStreamLive()) refreshACATList();
         
         // Reset form
         form.reset();
@@ -502,41 +508,41 @@ function showLoading(show) {
 }
 
 // --- Ongoing ACATs List ---
+// Only the columns the list view renders; skips securities, customer and history
+const ACAT_LIST_FIELDS = 'id,status,version,created_at,acat_data.delivering_account,acat_data.receiving_account';
+// ETags of the responses (plus the user's role) behind the current render; the
+// server revalidates them with 304s and identical tags mean nothing to redraw
+let lastACATListTags = null;
+
 async function refreshACATList() {
     try {
-        const res = await fetch('/api/tracking');
+        const [res, summaryRes, agingRes] = await Promise.all([
+            fetch(`/api/tracking?fields=${encodeURIComponent(ACAT_LIST_FIELDS)}`),
+            fetch('/api/tracking/summary'),
+            fetch('/api/tracking/aging?include_records=true')
+        ]);
         if (!res.ok) return;
+        const tags = [currentUser && currentUser.role, ...[res, summaryRes, agingRes].map(r => r.headers.get('ETag'))].join(',');
+        if (tags === lastACATListTags) return;
+        lastACATListTags = tags;
         const acats = await res.json();
-        renderStatusSummary(acats);
-        renderACATList(acats);
+        if (summaryRes.ok) {
+            renderStatusSummary(await summaryRes.json());
+        }
+        // Business-day ages come from the server's settlement holiday calendar
+        const aging = agingRes.ok ? await agingRes.json() : { records: {} };
+        renderACATList(acats, aging.records || {});
     } catch (e) {
         console.error('Failed to load ACAT list', e);
     }
 }
 
-// Calculate business days between two dates
-function calculateBusinessDays(startDate, endDate) {
-    const start = new Date(startDate);
-    const end = new Date(endDate);
-    let count = 0;
-    let current = new Date(start);
-    
-    while (current <= end) {
-        const dayOfWeek = current.getDay();
-        if (dayOfWeek !== 0 && dayOfWeek !== 6) { // Not weekend
-            count++;
-        }
-        current.setDate(current.getDate() + 1);
-    }
-    return count;
-}
-
-// Render status summary dashboard
-function renderStatusSummary(acats) {
+// Render status summary dashboard from the server-side aggregates
+function renderStatusSummary(summary) {
     const container = document.getElementById('statusSummary');
     if (!container) return;
     
-    const total = acats.length;
+    const total = summary.total;
     if (total === 0) {
         container.innerHTML = '<p>No ACATs to display</p>';
         return;
@@ -572,17 +578,9 @@ function renderStatusSummary(acats) {
         'cancelled': '#ef4444'
     };
     
-    // Count by status
-    const statusCounts = {};
-    acats.forEach(acat => {
-        statusCounts[acat.status] = (statusCounts[acat.status] || 0) + 1;
-    });
-    
-    // Calculate metrics
-    const completed = statusCounts['completed'] || 0;
-    const failed = (statusCounts['rejected'] || 0) + (statusCounts['cancelled'] || 0);
-    const inProgress = total - completed - failed;
-    const successRate = total > 0 ? Math.round((completed / total) * 100) : 0;
+    const statusCounts = summary.by_status;
+    const inProgress = summary.in_progress;
+    const successRate = Math.round(summary.success_rate * 100);
     
     // Overview cards
     const overview = `
@@ -653,24 +651,15 @@ function renderStatusSummary(acats) {
     `;
 }
 
-function renderACATList(acats) {
-    const container = document.getElementById('acatList');
-    if (!container) return;
-    if (!acats || acats.length === 0) {
-        container.innerHTML = '<p>No ongoing ACATs yet.</p>';
-        return;
-    }
-    const now = new Date();
-    const rows = acats.map(a => {
-        const createdDate = new Date(a.created_at);
-        const formattedDate = createdDate.toLocaleDateString();
-        const businessDays = calculateBusinessDays(createdDate, now);
-        let daysClass = 'days-normal';
-        if (businessDays > 10) daysClass = 'days-critical';
-        else if (businessDays > 5) daysClass = 'days-warning';
-        
-        return `
-        <tr>
+function renderACATRow(a, ages) {
+    const formattedDate = new Date(a.created_at).toLocaleDateString();
+    const businessDays = ages[a.id] ?? 0;
+    let daysClass = 'days-normal';
+    if (businessDays > 10) daysClass = 'days-critical';
+    else if (businessDays > 5) daysClass = 'days-warning';
+    
+    return `
+        <tr data-id="${a.id}">
             <td>${a.id.substring(0, 8)}...</td>
             <td>${a.acat_data.delivering_account}</td>
             <td>${a.acat_data.receiving_account}</td>
@@ -680,7 +669,17 @@ function renderACATList(acats) {
             </td>
         </tr>
         `;
-    }).join('');
+}
+
+function renderACATList(acats, ages = {}) {
+    const container = document.getElementById('acatList');
+    if (!container) return;
+    renderedACATAges = ages;
+    if (!acats || acats.length === 0) {
+        container.innerHTML = '<p>No ongoing ACATs yet.</p>';
+        return;
+    }
+    const rows = acats.map(a => renderACATRow(a, ages)).join('');
     container.innerHTML = `
         <table class="table">
             <thead>
@@ -699,6 +698,64 @@ function renderACATList(acats) {
     `;
 }
 
+// --- Live updates ---
+// Changes pushed over /api/tracking/stream are applied to the rendered rows in
+// place, so the full list is only fetched on (re)connect or after a resync
+let acatStream = null;
+let renderedACATAges = {};
+let summaryRefreshTimer = null;
+
+function connectACATStream() {
+    if (!window.EventSource || acatStream) return;
+    acatStream = new EventSource('/api/tracking/stream');
+    // Sent on every (re)connect; reload to pick up anything missed while disconnected
+    acatStream.addEventListener('ready', () => refreshACATList());
+    // The server dropped our backlog; EventSource reconnects and "ready" reloads
+    acatStream.addEventListener('resync', () => { lastACATListTags = null; });
+    ['created', 'saved', 'status_changed', 'deleted'].forEach(type => {
+        acatStream.addEventListener(type, e => applyACATChange(type, JSON.parse(e.data)));
+    });
+}
+
+function isACATStreamLive() {
+    return acatStream !== null && acatStream.readyState === EventSource.OPEN;
+}
+
+function applyACATChange(type, change) {
+    const tbody = document.querySelector('#acatList tbody');
+    if (!tbody) {
+        // Nothing rendered yet (e.g. the empty-list message); draw the whole list
+        refreshACATList();
+        return;
+    }
+    change.records.forEach(record => {
+        const row = tbody.querySelector(`tr[data-id="${record.id}"]`);
+        if (type === 'deleted') {
+            if (row) row.remove();
+            return;
+        }
+        // The server sends each record's business-day age, reckoned as for the list
+        renderedACATAges[record.id] = record.business_days;
+        const template = document.createElement('template');
+        template.innerHTML = renderACATRow(record, renderedACATAges).trim();
+        if (row) {
+            row.replaceWith(template.content.firstChild);
+        } else {
+            tbody.appendChild(template.content.firstChild);
+        }
+    });
+    scheduleSummaryRefresh();
+}
+
+// Coalesce bursts of changes (e.g. a bulk status update) into one summary fetch
+function scheduleSummaryRefresh() {
+    clearTimeout(summaryRefreshTimer);
+    summaryRefreshTimer = setTimeout(async () => {
+        const res = await fetch('/api/tracking/summary');
+        if (res.ok) renderStatusSummary(await res.json());
+    }, 500);
+}
+
 function renderStatusActions(record) {
     const isReadOnly = currentUser && currentUser.role === 'read_only';
     
@@ -711,17 +768,18 @@ function renderStatusActions(record) {
     ];
     const options = statuses.map(s => `<option value="${s}" ${record.status===s?'selected':''}>${s}</option>`).join('');
     return `
-        <select onchange="showStatusUpdateModal('${record.id}', this.value)">
+        <select onchange="showStatusUpdateModal('${record.id}', this.value, ${record.version})">
             ${options}
         </select>
     `;
 }
 
-function showStatusUpdateModal(recordId, newStatus) {
-    // Store pending status change data
+function showStatusUpdateModal(recordId, newStatus, expectedVersion) {
+    // Store pending status change data; the version rejects the change if someone else got there first
     pendingStatusChange = {
         recordId: recordId,
-        newStatus: newStatus
+        newStatus: newStatus,
+        expectedVersion: expectedVersion
     };
     
     // Show status change modal
@@ -752,7 +810,7 @@ async function updateRecordStatus(id, status, reason) {
         });
         
         if (!res.ok) throw new Error('Failed to update status');
-        await refreshACATList();
+        if (!isACATStreamLive()) await refreshACATList();
         
         // Refresh learning insights after status change
         if (currentUser.role === 'full') {
@@ -807,10 +865,20 @@ async function confirmStatusChange() {
                 reason: reason,
                 updated_by: currentUser.username,
                 password: password,
-                session_id: sessionId
+                session_id: sessionId,
+                expected_version: pendingStatusChange.expectedVersion
             })
         });
         
+        if (response.status === 409) {
+            document.getElementById('statusChangeModal').style.display = 'none';
+            pendingStatusChange = null;
+            lastACATListTags = null;
+            refreshACATList();
+            alert('This ACAT was changed by someone else. The list has been refreshed; please review and try again.');
+            return;
+        }
+        
         if (!response.ok) {
             const error = await response.json();
             throw new Error(error.detail || 'Failed to update status');
@@ -822,7 +890,7 @@ async function confirmStatusChange() {
         const newStatus = pendingStatusChange.newStatus;
         document.getElementById('statusChangeModal').style.display = 'none';
         pendingStatusChange = null;
-        refreshACATList();
+        if (!isACATStreamLive()) refreshACATList();
         
         // Refresh learning insights after status change
         if (currentUser.role === 'full' || currentUser.role === 'owner') {
@@ -1294,7 +1362,7 @@ async function submitNewACAT() {
         
         // Return to dashboard
         cancelACATCreation();
-        refreshACATList();
+        if (!isACATStreamLive()) refreshACATList();
     } catch (error) {
         alert('Failed to create ACAT: ' + error.message);
     }
@@ -1321,12 +1389,24 @@ async function showAuditLog() {
     document.querySelector('.main-content').style.display = 'none';
     document.getElementById('auditLogScreen').style.display = 'block';
     
-    // Load audit log
+    // Load the newest page of the audit log
+    auditEntries = [];
+    auditNextCursor = null;
+    await loadAuditEntries();
+}
+
+// Entries shown so far and the cursor of the next (older) page, if any
+let auditEntries = [];
+let auditNextCursor = null;
+
+async function loadAuditEntries() {
     try {
-        const response = await fetch(`/api/audit/changes?session_id=${sessionId}`);
+        const cursor = auditNextCursor !== null ? `&cursor=${auditNextCursor}` : '';
+        const response = await fetch(`/api/audit/changes?session_id=${sessionId}${cursor}`);
         if (!response.ok) throw new Error('Failed to load audit log');
         
-        const auditEntries = await response.json();
+        auditEntries = auditEntries.concat(await response.json());
+        auditNextCursor = response.headers.get('X-Next-Cursor');
         renderAuditLog(auditEntries);
     } catch (error) {
         document.getElementById('auditLogContent').innerHTML = '<p>Failed to load audit log</p>';
@@ -1392,6 +1472,7 @@ function renderAuditLog(entries) {
                 ${rows}
             </tbody>
         </table>
+        ${auditNextCursor !== null ? '<button class="btn-secondary" onclick="loadAuditEntries()">Load older entries</button>' : ''}
     `;
 }
 
@@ -0,0 +1,32 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services.dwell_analytics import DwellTimeAnalytics
+from services.idempotency import IdempotencyCache
+from services.tracking_service import AuditLog, InMemoryACATStore
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """An empty in-memory tracking store (with its audit log) in place of the app's seeded one."""
+    audit_log = AuditLog()
+    tracking_store = InMemoryACATStore(audit_log)
+    tracking_store.add_listener(main._publish_tracking_change)
+    monkeypatch.setattr(main, "audit_log", audit_log)
+    monkeypatch.setattr(main, "tracking_store", tracking_store)
+    monkeypatch.setattr(main, "dwell_analytics", DwellTimeAnalytics(tracking_store))
+    monkeypatch.setattr(main, "idempotency_cache", IdempotencyCache())
+    return tracking_store
+
+
+@pytest.fixture
+def client(store):
+    """A client for the app, without running its startup tasks."""
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def session_id(client):
+    """A session for the default owner user (password "test")."""
+    return client.post("/api/auth/login", params={"username": "owner", "password": "test"}).json()["session_id"]
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from models.acat import ACATRequest, ACATStatus, AssetType, CustomerInfo, Security, TransferType
+from services.tracking_service import AuditEntry
+
+
+def make_request(n: int, contra_firm: str = "0123", cusip: str = "037833100", quantity: int = 10) -> ACATRequest:
+    """A valid ACAT request; different `n` give different transfers."""
+    return ACATRequest(
+        delivering_account=f"DEL{100000 + n}",
+        receiving_account=f"REC{100000 + n}",
+        contra_firm=contra_firm,
+        transfer_type=TransferType.FULL,
+        securities=[Security(cusip=cusip, symbol="AAPL", description="Apple Inc", quantity=quantity, asset_type=AssetType.EQUITY)],
+        customer=CustomerInfo(first_name="Test", last_name=f"Customer{n}"),
+    )
+
+
+def request_json(n: int, **overrides) -> dict:
+    """make_request() as a JSON request body."""
+    return make_request(n, **overrides).dict() | {"transfer_date": "2024-01-02T00:00:00"}
+
+
+FIRMS = ("0123", "4567", "8901")
+STATUSES = (ACATStatus.NEW, ACATStatus.SUBMITTED, ACATStatus.PENDING_REVIEW, ACATStatus.COMPLETED, ACATStatus.REJECTED)
+
+
+def populate(store, count: int, start: datetime = datetime(2024, 1, 1)) -> list:
+    """Create `count` records spread over firms, statuses and creation days, as they are after each write."""
+    records = []
+    for n in range(count):
+        record = store.create(make_request(n % 7, contra_firm=FIRMS[n % 3], quantity=n + 1))
+        record.created_at = start + timedelta(days=n % 11, minutes=n)
+        record = store.save(record)
+        status = STATUSES[n % len(STATUSES)]
+        if status != ACATStatus.NEW:
+            record = store.update_status(record.id, status, "test", "tester")
+        records.append(record)
+    return records
+
+
+AUDIT_START = datetime(2024, 1, 1)
+
+
+def audit_entries(count: int, start: int = 0) -> list:
+    """Entry n is performed n minutes after AUDIT_START, by one of two users, on one of three records."""
+    return [
+        AuditEntry(
+            id=f"entry-{n}",
+            action="create" if n % 4 == 0 else "status_change",
+            entity_type="user" if n % 5 == 0 else "acat",
+            entity_id=f"record-{n % 3}",
+            details={"n": n},
+            performed_by=f"user{n % 2}",
+            performed_at=AUDIT_START + timedelta(minutes=n),
+        )
+        for n in range(start, start + count)
+    ]
+
+
+def append_in_batches(log, entries: list, batch_size: int = 5) -> None:
+    """A segmented log rotates between appends, so small batches spread the entries over several segments."""
+    for start in range(0, len(entries), batch_size):
+        log.append_entries(entries[start:start + batch_size])
@@ -0,0 +1,73 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from services.aging_service import AgingService, SettlementHolidayCalendar
+from services.compact_records import to_epoch_us
+from tests.support import populate
+
+
+def test_2024_settlement_holidays():
+    assert SettlementHolidayCalendar().holidays_for_year(2024) == [
+        date(2024, 1, 1), date(2024, 1, 15), date(2024, 2, 19), date(2024, 3, 29), date(2024, 5, 27),
+        date(2024, 6, 19), date(2024, 7, 4), date(2024, 9, 2), date(2024, 11, 28), date(2024, 12, 25),
+    ]
+
+
+@pytest.mark.parametrize("year, observed, not_observed", [
+    (2022, date(2022, 6, 20), date(2022, 6, 19)),     # Sunday Juneteenth is observed on Monday
+    (2022, date(2022, 12, 26), date(2022, 12, 25)),
+    (2021, date(2021, 12, 24), date(2021, 12, 25)),   # Saturday Christmas is observed on Friday
+    (2021, date(2021, 7, 5), date(2021, 7, 4)),
+    (2021, None, date(2021, 6, 18)),                  # Juneteenth starts in 2022
+    (2021, None, date(2021, 12, 31)),                 # Saturday New Year's Day 2022 is not moved back
+])
+def test_observed_holidays(year, observed, not_observed):
+    holidays = SettlementHolidayCalendar().holidays_for_year(year)
+    assert not_observed not in holidays
+    if observed is not None:
+        assert observed in holidays
+
+
+def test_extra_holidays():
+    calendar = SettlementHolidayCalendar(extra_holidays=[date(2025, 1, 9)])
+    assert date(2025, 1, 9) in calendar.holidays_for_year(2025)
+    assert date(2025, 1, 9) not in SettlementHolidayCalendar().holidays_for_year(2025)
+
+
+def test_business_day_ages_skip_weekends_and_holidays():
+    service = AgingService()
+    created = [
+        datetime(2024, 3, 28, 15),   # Thursday before Good Friday
+        datetime(2024, 3, 29),       # Good Friday
+        datetime(2024, 3, 30),       # Saturday
+        datetime(2024, 4, 1, 23),    # as_of itself
+        datetime(2024, 4, 5),        # after as_of
+        datetime(2023, 12, 29),      # across New Year's Day
+    ]
+    ages = service.business_day_ages([to_epoch_us(value) for value in created], date(2024, 4, 1))
+    assert ages.tolist() == [1, 0, 0, 0, 0, 62]
+    iso_ages = service.business_day_ages([value.isoformat() for value in created], date(2024, 4, 1))
+    assert iso_ages.tolist() == ages.tolist()
+    assert service.business_day_ages([], date(2024, 4, 1)).tolist() == []
+
+
+def test_buckets_include_their_upper_edge():
+    assert AgingService().bucket_indexes(np.array([0, 5, 6, 10, 11, 400])).tolist() == [0, 0, 1, 1, 2, 2]
+
+
+def test_aging_endpoint(client, store):
+    records = populate(store, 40, start=datetime(2024, 1, 2))
+    response = client.get("/api/tracking/aging", params={"as_of": "2024-01-22", "include_records": True})
+    assert response.status_code == 200
+    report = response.json()
+    ages = report["records"]
+    expected = AgingService().business_day_ages([to_epoch_us(record.created_at) for record in records], date(2024, 1, 22))
+    assert [ages[record.id] for record in records] == expected.tolist()
+    assert sum(report["overall"].values()) == 40
+    by_firm = {firm: sum(counts.values()) for firm, counts in report["by_contra_firm"].items()}
+    assert by_firm == {"0123": 14, "4567": 13, "8901": 13}
+    over_ten = sum(1 for record in records if ages[record.id] > 10)
+    assert report["overall"][">10"] == over_ten
+    assert sum(counts[">10"] for counts in report["by_status"].values()) == over_ten
@@ -0,0 +1,116 @@
+import glob
+import os
+
+import pytest
+
+from services.audit_chain import GENESIS_HASH, leaf_hash, merkle_root
+from services.audit_store import SegmentedAuditLog
+from services.tracking_service import AuditLog
+from tests.support import append_in_batches, audit_entries
+
+
+def open_segmented(directory) -> SegmentedAuditLog:
+    return SegmentedAuditLog(str(directory), segment_bytes=1024, index_interval=4, checkpoint_interval=8)
+
+
+def tamper(directory, entry_number: int) -> None:
+    """Change entry `entry_number`'s details in place, as someone editing a segment file would."""
+    original, forged = f'{{"n":{entry_number}}}'.encode(), f'{{"n":{entry_number + 1}}}'.encode()
+    for path in glob.glob(os.path.join(directory, "*.log")):
+        with open(path, "rb") as f:
+            data = f.read()
+        if original in data and len(original) == len(forged):
+            with open(path, "r+b") as f:
+                f.seek(data.index(original))
+                f.write(forged)
+            return
+    raise AssertionError(f"entry {entry_number} not found")
+
+
+def test_merkle_root():
+    leaves = [leaf_hash(bytes([n])) for n in range(5)]
+    assert merkle_root([]) == GENESIS_HASH
+    assert merkle_root(leaves[:1]) == leaves[0]
+    assert merkle_root(leaves) != merkle_root(leaves[:4])
+    assert merkle_root(leaves) != merkle_root(leaves[1:] + leaves[:1])
+
+
+def test_intact_log_verifies(tmp_path):
+    for log in (AuditLog(checkpoint_interval=8), open_segmented(tmp_path)):
+        append_in_batches(log, audit_entries(100))
+        result = log.verify(full=True)
+        assert result["ok"] and result["error"] is None
+        assert result["checked"] == 100
+        assert result["head"] == log.chain_head()
+        assert log.chain_head()["position"] == 100
+
+
+def test_edited_entry_is_found_in_memory():
+    log = AuditLog(checkpoint_interval=8)
+    append_in_batches(log, audit_entries(40))
+    log.get_entries()[-13].details["n"] = 99  # entry-12
+    result = log.verify(full=True)
+    assert not result["ok"]
+    assert result["error"]["position"] == 12
+    assert result["verified_through"] == 8
+
+
+def test_verify_resumes_after_the_last_checkpoint():
+    log = AuditLog(checkpoint_interval=8)
+    append_in_batches(log, audit_entries(40))
+    assert log.verify()["checked"] == 40
+    append_in_batches(log, audit_entries(5, start=40))
+    # 40 is a checkpoint boundary, so only the new entries are rehashed
+    result = log.verify()
+    assert result["ok"] and result["checked"] == 5
+    assert log.verify(full=True)["checked"] == 45
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_edited_segment_is_found(tmp_path, processes):
+    log = open_segmented(tmp_path)
+    append_in_batches(log, audit_entries(100))
+    assert len(log._segments) > 3
+    log.close()
+    tamper(tmp_path, 37)
+    log = open_segmented(tmp_path)
+    result = log.verify(full=True, processes=processes)
+    assert not result["ok"]
+    assert result["error"]["position"] == 37
+    log.close()
+
+
+def test_incremental_segment_check(tmp_path):
+    log = open_segmented(tmp_path)
+    append_in_batches(log, audit_entries(100))
+    first = log.verify()
+    assert first["checked"] == 100
+    append_in_batches(log, audit_entries(10, start=100))
+    # Rehashing restarts at the last checkpoint the first check passed
+    result = log.verify()
+    assert result["ok"] and result["checked"] == 110 - first["verified_through"]
+    assert result["verified_through"] > first["verified_through"]
+    log.close()
+
+
+def test_rewritten_chain_file_is_found(tmp_path):
+    log = open_segmented(tmp_path)
+    append_in_batches(log, audit_entries(60))
+    chain_path = log._segments[1].chain_path
+    log.close()
+    with open(chain_path, "r+b") as f:
+        f.seek(32)
+        f.write(bytes(32))
+    log = open_segmented(tmp_path)
+    result = log.verify(full=True)
+    assert not result["ok"]
+    assert result["error"]["position"] == log._segments[1].first_position + 1
+    log.close()
+
+
+def test_verify_endpoint(client, store, session_id):
+    append_in_batches(store.audit_log, audit_entries(20))
+    result = client.get("/api/audit/verify", params={"session_id": session_id, "full": True}).json()
+    assert result["ok"] and result["checked"] == 20
+    viewer = client.post("/api/auth/login", params={"username": "viewer", "password": "test"}).json()["session_id"]
+    assert client.get("/api/audit/verify", params={"session_id": viewer}).status_code == 403
@@ -0,0 +1,80 @@
+import pytest
+
+from services import audit_store
+from services.audit_store import SegmentedAuditLog
+from services.tracking_service import AuditLog
+from tests.support import append_in_batches, audit_entries
+
+
+def open_segmented(directory) -> SegmentedAuditLog:
+    return SegmentedAuditLog(str(directory), segment_bytes=1024, index_interval=4, checkpoint_interval=16)
+
+
+@pytest.fixture(params=["memory", "segmented"])
+def log(request, tmp_path):
+    if request.param == "memory":
+        yield AuditLog()
+        return
+    segmented = open_segmented(tmp_path)
+    yield segmented
+    segmented.close()
+
+
+def walk(read, value: str, limit: int) -> list:
+    """Ids and chain hashes of every page read(value, limit, cursor) returns, following cursors to the end."""
+    seen, cursor = [], None
+    while True:
+        page, cursor = read(value, limit=limit, cursor=cursor)
+        assert len(page) <= limit
+        seen.extend((entry.id, entry.chain_hash) for entry in page)
+        if cursor is None:
+            return seen
+
+
+def scan(log, field: str, value: str) -> list:
+    return [(entry.id, entry.chain_hash) for entry in log.get_entries() if getattr(entry, field) == value]
+
+
+@pytest.mark.parametrize("limit", [1, 4, 100])
+def test_entity_and_actor_pages_match_a_scan(log, limit):
+    append_in_batches(log, audit_entries(90))
+    for record_id in ("record-0", "record-1", "record-2"):
+        assert walk(log.entity_entries, record_id, limit) == scan(log, "entity_id", record_id)
+    for user in ("user0", "user1"):
+        assert walk(log.actor_entries, user, limit) == scan(log, "performed_by", user)
+    assert log.entity_entries("record-9") == ([], None)
+    assert log.actor_entries("nobody") == ([], None)
+
+
+def test_indexes_survive_a_reopen(tmp_path):
+    log = open_segmented(tmp_path)
+    append_in_batches(log, audit_entries(90))
+    expected = scan(log, "entity_id", "record-2")
+    log.close()
+    log = open_segmented(tmp_path)
+    assert walk(log.entity_entries, "record-2", 7) == expected
+    append_in_batches(log, audit_entries(3, start=90))
+    assert [entry.id for entry in log.entity_entries("record-2", limit=2)[0]] == ["entry-92", "entry-89"]
+    log.close()
+
+
+def test_keys_sharing_a_hash_are_told_apart(tmp_path, monkeypatch):
+    # Every key hashes alike, so each lookup has to check the entries it reads
+    monkeypatch.setattr(audit_store, "_key_hash", lambda value: 1)
+    log = open_segmented(tmp_path)
+    append_in_batches(log, audit_entries(60))
+    assert walk(log.entity_entries, "record-1", 5) == scan(log, "entity_id", "record-1")
+    assert walk(log.actor_entries, "user0", 5) == scan(log, "performed_by", "user0")
+    log.close()
+
+
+def test_entity_and_actor_endpoints(client, store, session_id):
+    append_in_batches(store.audit_log, audit_entries(30))
+    response = client.get("/api/audit/entity/record-1", params={"session_id": session_id, "limit": 4})
+    assert [entry["id"] for entry in response.json()] == ["entry-28", "entry-25", "entry-22", "entry-19"]
+    rest = client.get("/api/audit/entity/record-1", params={"session_id": session_id, "cursor": response.headers["X-Next-Cursor"]})
+    assert [entry["id"] for entry in rest.json()] == [f"entry-{n}" for n in range(16, 0, -3)]
+    assert "X-Next-Cursor" not in rest.headers
+    by_actor = client.get("/api/audit/actor/user1", params={"session_id": session_id, "limit": 100}).json()
+    assert len(by_actor) == 15
+    assert client.get("/api/audit/actor/user1", params={"session_id": "missing"}).status_code == 403
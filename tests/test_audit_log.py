@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+import pytest
+
+from services.audit_store import SegmentedAuditLog
+from services.tracking_service import AuditLog
+from tests.support import AUDIT_START, append_in_batches, audit_entries
+
+
+@pytest.fixture(params=["memory", "segmented"])
+def log(request, tmp_path):
+    if request.param == "memory":
+        yield AuditLog(checkpoint_interval=16)
+        return
+    # Small segments, so pages and time ranges cross segment boundaries
+    segmented = SegmentedAuditLog(str(tmp_path), segment_bytes=1024, index_interval=4, checkpoint_interval=16)
+    yield segmented
+    segmented.close()
+
+
+def walk(log, limit: int, **filters) -> list:
+    """Ids of every page's entries, following cursors to the end."""
+    seen, cursor = [], None
+    while True:
+        page, cursor = log.page(limit=limit, cursor=cursor, **filters)
+        assert len(page) <= limit
+        seen.extend(entry.id for entry in page)
+        if cursor is None:
+            return seen
+
+
+def test_pages_are_newest_first_and_cover_everything_once(log):
+    written = audit_entries(100)
+    append_in_batches(log, written)
+    assert walk(log, 7) == [entry.id for entry in reversed(written)]
+    assert [entry.id for entry in log.page(limit=3)[0]] == ["entry-99", "entry-98", "entry-97"]
+    assert log.page(limit=100)[1] is None
+    if isinstance(log, SegmentedAuditLog):
+        assert len(log._segments) > 3
+
+
+@pytest.mark.parametrize("filters", [
+    {"entity_type": "user"},
+    {"action": "create"},
+    {"performed_by": "user1"},
+    {"action": "status_change", "performed_by": "user0", "entity_type": "acat"},
+    {"action": "delete"},
+])
+def test_filtered_pages(log, filters):
+    written = audit_entries(100)
+    append_in_batches(log, written)
+    expected = [entry.id for entry in reversed(written) if all(getattr(entry, field) == value for field, value in filters.items())]
+    assert walk(log, 6, **filters) == expected
+
+
+def test_time_range(log):
+    written = audit_entries(100)
+    append_in_batches(log, written)
+    since, until = AUDIT_START + timedelta(minutes=20), AUDIT_START + timedelta(minutes=45)
+    assert walk(log, 4, since=since, until=until) == [f"entry-{n}" for n in range(44, 19, -1)]
+    assert walk(log, 4, since=since, until=until, performed_by="user1") == [f"entry-{n}" for n in range(43, 20, -2)]
+    assert walk(log, 10, until=AUDIT_START) == []
+    assert walk(log, 10, since=AUDIT_START + timedelta(days=1)) == []
+    assert walk(log, 50, since=AUDIT_START + timedelta(minutes=99, seconds=30)) == []
+
+
+def test_log_action_appends_in_time_order(log):
+    for n in range(20):
+        log.log_action("update", "acat", f"record-{n}", {"n": n}, "tester")
+    newest_first = log.get_entries()
+    assert [entry.details["n"] for entry in newest_first] == list(range(19, -1, -1))
+    times = [entry.performed_at for entry in newest_first]
+    assert times == sorted(times, reverse=True)
+    assert walk(log, 5, since=times[-1]) == [entry.id for entry in newest_first]
+
+
+def test_audit_changes_endpoint(client, store, session_id):
+    append_in_batches(store.audit_log, audit_entries(30))
+    first = client.get("/api/audit/changes", params={"session_id": session_id, "limit": 10, "performed_by": "user0"})
+    assert first.status_code == 200
+    assert [entry["id"] for entry in first.json()] == [f"entry-{n}" for n in range(28, 8, -2)]
+    second = client.get("/api/audit/changes", params={
+        "session_id": session_id, "limit": 10, "performed_by": "user0", "cursor": first.headers["X-Next-Cursor"],
+    })
+    assert [entry["id"] for entry in second.json()] == [f"entry-{n}" for n in range(8, -1, -2)]
+    assert "X-Next-Cursor" not in second.headers
+
+
+def test_audit_needs_an_admin(client, store):
+    viewer = client.post("/api/auth/login", params={"username": "viewer", "password": "test"}).json()["session_id"]
+    assert client.get("/api/audit/changes", params={"session_id": viewer}).status_code == 403
+    assert client.get("/api/audit/changes", params={"session_id": "missing"}).status_code == 403
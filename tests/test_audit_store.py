@@ -0,0 +1,118 @@
+import glob
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.audit_store import SegmentedAuditLog
+from services.tracking_service import AuditLog
+from tests.support import AUDIT_START, append_in_batches, audit_entries
+
+
+def log_updates(log: SegmentedAuditLog, count: int, start: int = 0) -> None:
+    for n in range(start, start + count):
+        log.log_action("update", "acat", f"record-{n % 3}", {"n": n}, f"user{n % 2}")
+
+
+def test_time_range_on_a_fresh_log_is_empty(tmp_path):
+    log = SegmentedAuditLog(str(tmp_path))
+    assert log.page(since=datetime(2020, 1, 1)) == ([], None)
+    assert log.page(until=datetime.utcnow() + timedelta(days=1)) == ([], None)
+    log.close()
+
+
+def test_time_range_right_after_a_rotation(tmp_path):
+    log = SegmentedAuditLog(str(tmp_path), segment_bytes=1024, index_interval=4)
+    started = datetime.utcnow()
+    while len(log._segments) < 2:
+        log_updates(log, 1)
+    # The new active segment is still empty
+    assert log._segments[-1].count == 0
+    total = len(log.get_entries())
+    entries, cursor = log.page(since=started)
+    assert len(entries) == total and cursor is None
+    assert log.page(since=datetime.utcnow() + timedelta(days=1)) == ([], None)
+    entries, _ = log.page(until=datetime.utcnow() + timedelta(days=1))
+    assert len(entries) == total
+    log.close()
+
+
+def open_log(directory) -> SegmentedAuditLog:
+    return SegmentedAuditLog(str(directory), segment_bytes=1024, index_interval=4, checkpoint_interval=16)
+
+
+def page_ids(log, **options) -> list:
+    entries, cursor = log.page(**options)
+    return [entry.id for entry in entries], cursor
+
+
+def test_segments_rotate_at_the_size_limit(tmp_path):
+    log = open_log(tmp_path)
+    append_in_batches(log, audit_entries(100))
+    segments = log._segments
+    assert len(segments) > 3
+    assert all(segment.size >= 1024 for segment in segments[:-1])
+    # Segments are named by their first position, which follows on from the previous segment
+    assert [segment.first_position for segment in segments[1:]] == [
+        segment.first_position + segment.count for segment in segments[:-1]
+    ]
+    assert sum(segment.count for segment in segments) == 100
+    log.close()
+
+
+def test_reopened_log_reads_the_same(tmp_path):
+    log = open_log(tmp_path)
+    append_in_batches(log, audit_entries(100))
+    first_page, cursor = page_ids(log, limit=30)
+    head = log.chain_head()
+    log.close()
+
+    log = open_log(tmp_path)
+    assert page_ids(log, limit=30) == (first_page, cursor)
+    # Cursors handed out before the restart still point at the same entries
+    assert page_ids(log, limit=5, cursor=cursor)[0] == [f"entry-{n}" for n in range(69, 64, -1)]
+    assert log.chain_head() == head
+    append_in_batches(log, audit_entries(10, start=100))
+    assert page_ids(log, limit=1)[0] == ["entry-109"]
+    assert log.verify(full=True)["ok"]
+    log.close()
+
+
+def test_lost_indexes_are_rebuilt(tmp_path):
+    log = open_log(tmp_path)
+    append_in_batches(log, audit_entries(100))
+    expected = page_ids(log, limit=100, since=AUDIT_START + timedelta(minutes=33))
+    log.close()
+    for path in glob.glob(os.path.join(tmp_path, "*.idx")) + glob.glob(os.path.join(tmp_path, "*.keys")):
+        os.remove(path)
+    log = open_log(tmp_path)
+    assert page_ids(log, limit=100, since=AUDIT_START + timedelta(minutes=33)) == expected
+    assert [entry.id for entry in log.entity_entries("record-1", limit=3)[0]] == ["entry-97", "entry-94", "entry-91"]
+    log.close()
+
+
+def test_torn_frame_is_cut_off(tmp_path):
+    log = open_log(tmp_path)
+    append_in_batches(log, audit_entries(12))
+    active = log._segments[-1].path
+    log.close()
+    intact = os.path.getsize(active)
+    with open(active, "ab") as f:
+        f.write(b"\x00\x00\x01\x00partial")
+    log = open_log(tmp_path)
+    assert os.path.getsize(active) == intact
+    assert len(log.get_entries()) == 12
+    append_in_batches(log, audit_entries(1, start=12))
+    assert page_ids(log, limit=2)[0] == ["entry-12", "entry-11"]
+    log.close()
+
+
+@pytest.mark.parametrize("minutes", [-1, 0, 1, 14, 15, 16, 44.5, 59, 99, 100])
+def test_time_lookups_match_the_in_memory_log(tmp_path, minutes):
+    log, reference = open_log(tmp_path), AuditLog()
+    for target in (log, reference):
+        append_in_batches(target, audit_entries(100))
+    at = AUDIT_START + timedelta(minutes=minutes)
+    for options in ({"since": at}, {"until": at}, {"since": at, "until": at + timedelta(minutes=7)}):
+        assert page_ids(log, limit=200, **options) == page_ids(reference, limit=200, **options)
+    log.close()
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import threading
+
+from models.acat import ACATStatus
+from services.audit_writer import AuditWriter
+from services.concurrent_store import ConcurrentACATStore
+from services.event_store import EventLog, EventSourcedACATStore, EventSourcedAuditLog
+from services.tracking_service import AuditLog
+from tests.support import make_request
+
+
+def run_with_timeout(main, timeout: float = 30) -> None:
+    """Run a coroutine function on its own event loop in a daemon thread, failing rather than hanging on a deadlock."""
+    errors = []
+
+    def target():
+        try:
+            asyncio.run(main())
+        except BaseException as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), f"still running after {timeout} s (deadlock?)"
+    if errors:
+        raise errors[0]
+
+
+def test_writes_synchronously_unless_started():
+    writer = AuditWriter(AuditLog())
+    writer.log_action("update", "acat", "record-1", {}, "tester")
+    assert len(writer.get_entries()) == 1
+    assert writer.metrics()["running"] is False
+
+
+def test_queued_actions_are_written_in_batches():
+    writer = AuditWriter(AuditLog(), max_batch=50)
+
+    async def main():
+        await writer.start()
+        for n in range(120):
+            writer.log_action("update", "acat", f"record-{n}", {"n": n}, "tester")
+        # Nothing is written until the writer task gets to run
+        assert writer.get_entries() == []
+        assert writer.metrics()["queue_depth"] == 120
+        await writer.stop()
+
+    run_with_timeout(main)
+    metrics = writer.metrics()
+    assert (metrics["entries"], metrics["batches"], metrics["queue_depth"]) == (120, 3, 0)
+    assert metrics["max_queue_depth"] == 120 and metrics["inline_flushes"] == 0
+    newest_first = writer.get_entries()
+    assert [entry.details["n"] for entry in reversed(newest_first)] == list(range(120))
+    times = [entry.performed_at for entry in newest_first]
+    assert times == sorted(times, reverse=True)
+    # Stopped writers are synchronous again
+    writer.log_action("update", "acat", "record-x", {}, "tester")
+    assert len(writer.get_entries()) == 121
+
+
+def test_audit_metrics_endpoint(client, session_id, monkeypatch):
+    monkeypatch.setattr("main.audit_log", AuditWriter(AuditLog(), max_queued=64))
+    metrics = client.get("/api/audit/metrics", params={"session_id": session_id}).json()
+    assert metrics["queue_capacity"] == 64 and metrics["running"] is False
+
+
+def test_thread_writes_while_the_loop_waits_on_the_same_records():
+    writer = AuditWriter(AuditLog(), max_queued=50)
+    store = ConcurrentACATStore(writer, stripes=4)
+    records = store.create_many([make_request(n) for n in range(4)])
+    record_ids = [record.id for record in records]
+    statuses = [ACATStatus.PENDING_REVIEW, ACATStatus.PENDING_CLIENT]
+    rounds = 300
+
+    async def main():
+        await writer.start()
+
+        def background():
+            for n in range(rounds):
+                store.update_status_many([(record_id, statuses[n % 2], "thread") for record_id in record_ids], "worker")
+
+        thread = threading.Thread(target=background)
+        thread.start()
+        # Update the same records from the loop, blocking it on their stripe locks
+        for n in range(rounds):
+            store.update_status_many([(record_id, statuses[n % 2], "loop") for record_id in record_ids], "loop")
+            if n % 10 == 0:
+                await asyncio.sleep(0)
+        while thread.is_alive():
+            await asyncio.sleep(0.01)
+        await writer.stop()
+
+    run_with_timeout(main)
+    assert len(writer.get_entries()) == len(record_ids) * (1 + 2 * rounds)
+    assert writer.verify(full=True)["ok"]
+
+
+def test_full_queue_is_written_inline_in_order():
+    writer = AuditWriter(AuditLog(checkpoint_interval=4), max_queued=5, max_batch=3)
+
+    async def main():
+        await writer.start()
+        # No awaits in between, so the writer task never gets to drain the queue
+        for n in range(23):
+            writer.log_action("update", "acat", f"record-{n}", {"n": n}, "tester")
+        assert writer.metrics()["inline_flushes"] >= 3
+        await writer.stop()
+
+    run_with_timeout(main)
+    assert [entry.details["n"] for entry in reversed(writer.get_entries())] == list(range(23))
+    assert writer.metrics()["entries"] == 23
+    assert writer.verify(full=True)["ok"]
+
+
+class _OffsetHook:
+    """EventLog stand-in that runs `on_offset` right after the offset has been read."""
+
+    def __init__(self, event_log: EventLog, on_offset):
+        self._event_log = event_log
+        self._on_offset = on_offset
+
+    def __getattr__(self, name):
+        return getattr(self._event_log, name)
+
+    @property
+    def offset(self) -> int:
+        offset = self._event_log.offset
+        self._on_offset()
+        return offset
+
+
+def open_event_store(directory: str):
+    event_log = EventLog(os.path.join(directory, "events.log"))
+    writer = AuditWriter(EventSourcedAuditLog(event_log))
+    store = EventSourcedACATStore(event_log, os.path.join(directory, "snapshot.bin"), writer)
+    store.recover()
+    return event_log, writer, store
+
+
+def test_snapshot_during_batch_write_restores_each_entry_once(tmp_path):
+    event_log, writer, store = open_event_store(str(tmp_path))
+    store.create_many([make_request(n) for n in range(3)])
+
+    # A batch from the writer's worker thread lands just as the snapshot reads the offset
+    batch = threading.Thread(target=writer.log_actions, args=([
+        {"action": "update", "entity_type": "acat", "entity_id": f"record-{n}", "details": {}, "performed_by": "tester"}
+        for n in range(5)
+    ],))
+
+    def write_batch():
+        batch.start()
+        # Gives the batch time to finish, unless the snapshot holds it off until it has its entries
+        batch.join(0.2)
+
+    store.event_log = _OffsetHook(event_log, write_batch)
+    snapshot = store.capture_snapshot()
+    store.event_log = event_log
+    batch.join()
+    store.write_snapshot(snapshot)
+    writer.log_action("update", "acat", "record-x", {}, "tester")
+    expected = [entry.id for entry in writer.get_entries()]
+    event_log.close()
+
+    event_log, writer, store = open_event_store(str(tmp_path))
+    assert [entry.id for entry in writer.get_entries()] == expected
+    result = writer.verify(full=True)
+    assert result["ok"], result["error"]
+    event_log.close()
@@ -0,0 +1,64 @@
+import json
+
+import main
+from tests.support import make_request, request_json
+
+
+def test_bulk_create_reports_each_item(client, store):
+    existing = store.create(make_request(0))
+    response = client.post("/api/tracking/bulk", json=[request_json(0), request_json(1), {"contra_firm": "x"}, request_json(1)])
+    assert response.status_code == 200
+    body = response.json()
+    assert [result["status"] for result in body["results"]] == ["duplicate", "created", "invalid", "duplicate"]
+    assert body["results"][0]["existing_id"] == existing.id
+    assert body["results"][3]["duplicate_of_index"] == 1
+    assert (body["created"], body["failed"]) == (1, 3)
+    assert store.get(body["results"][1]["id"]) is not None
+
+
+def test_duplicate_created_after_the_check_fails_only_its_item(client, store, monkeypatch):
+    existing = store.create(make_request(0))
+    find_duplicate = store.find_duplicate
+    checks = []
+
+    def created_after_the_check(acat_request):
+        # The endpoint's own check misses it, as if another worker created it just after
+        checks.append(acat_request)
+        return find_duplicate(acat_request) if len(checks) > 3 else None
+
+    monkeypatch.setattr(store, "find_duplicate", created_after_the_check)
+    response = client.post("/api/tracking/bulk", json=[request_json(1), request_json(0), request_json(2)])
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == ["created", "duplicate", "created"]
+    assert results[1]["existing_id"] == existing.id
+    assert len(store) == 3
+
+
+def test_ndjson_body(client, store):
+    body = "\n".join(json.dumps(request_json(n)) for n in range(3)) + "\n\n"
+    response = client.post("/api/tracking/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.json()["created"] == 3
+    assert len(store) == 3
+
+
+def test_too_many_items_is_refused_before_creating_any(client, store, monkeypatch):
+    monkeypatch.setattr(main, "MAX_BULK_ITEMS", 2)
+    body = "\n".join(json.dumps(request_json(n)) for n in range(3))
+    assert client.post("/api/tracking/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}).status_code == 413
+    assert client.post("/api/tracking/bulk", json=[request_json(n) for n in range(3)]).status_code == 413
+    assert len(store) == 0
+
+
+def test_malformed_body_is_rejected(client):
+    assert client.post("/api/tracking/bulk", content=b"{not json", headers={"Content-Type": "application/x-ndjson"}).status_code == 400
+
+
+def test_bulk_create_writes_one_audit_batch(client, store):
+    response = client.post("/api/tracking/bulk", json=[request_json(n) for n in range(5)])
+    created = {result["id"] for result in response.json()["results"]}
+    entries = store.audit_log.get_entries()
+    assert {entry.entity_id for entry in entries} == created
+    assert {entry.action for entry in entries} == {"create"}
+    # One log_actions() call stamps the whole batch at once
+    assert len({entry.performed_at for entry in entries}) == 1
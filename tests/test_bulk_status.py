@@ -0,0 +1,48 @@
+from models.acat import ACATStatus
+from tests.support import populate
+
+
+def bulk_update(client, session_id, transitions, password="test"):
+    return client.patch("/api/tracking/bulk/status", json={
+        "transitions": transitions,
+        "updated_by": "owner",
+        "password": password,
+        "session_id": session_id,
+    })
+
+
+def test_bulk_status_reports_each_item(client, store, session_id):
+    records = populate(store, 3)
+    transitions = [{"record_id": record.id, "status": "pending_client", "reason": "DTCC cycle"} for record in records]
+    transitions.insert(1, {"record_id": "missing", "status": "pending_client", "reason": "DTCC cycle"})
+    response = bulk_update(client, session_id, transitions)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["updated"] == 3 and body["failed"] == 1
+    assert [result["status"] for result in body["results"]] == ["updated", "not_found", "updated", "updated"]
+    assert body["results"][1]["record_id"] == "missing"
+    for record in records:
+        assert store.get(record.id).status == ACATStatus.PENDING_CLIENT
+    changes = [entry for entry in store.audit_log.get_entries() if entry.action == "status_change" and entry.performed_by == "owner"]
+    assert sorted(entry.entity_id for entry in changes) == sorted(record.id for record in records)
+
+
+def test_stale_version_rejects_the_whole_batch(client, store, session_id):
+    first, second = populate(store, 2)
+    transitions = [
+        {"record_id": first.id, "status": "pending_client", "reason": "DTCC cycle", "expected_version": first.version},
+        {"record_id": second.id, "status": "pending_client", "reason": "DTCC cycle", "expected_version": second.version - 1},
+    ]
+    response = bulk_update(client, session_id, transitions)
+    assert response.status_code == 409
+    assert response.headers["ETag"] == f'"{second.version}"'
+    assert store.get(first.id).status == first.status
+    assert store.get(second.id).status == second.status
+
+
+def test_bulk_status_needs_the_password(client, store, session_id):
+    record, = populate(store, 1)
+    response = bulk_update(client, session_id, [{"record_id": record.id, "status": "pending_client", "reason": "x"}], password="wrong")
+    assert response.status_code == 403
+    assert store.get(record.id).status == record.status
+
@@ -0,0 +1,66 @@
+import pytest
+
+import main
+from services.learning_service import ContraFirmLearningService
+from tests.support import make_request, populate
+
+
+@pytest.fixture
+def records(store):
+    return populate(store, 5)
+
+
+@pytest.mark.parametrize("path", ["/api/tracking", "/api/tracking/summary", "/api/tracking/aging", "/api/tracking/dwell-times", "/api/securities/037833100/acats"])
+def test_unchanged_store_answers_304(client, records, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache"
+    repeat = client.get(path, headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+    assert repeat.headers["ETag"] == etag
+
+
+@pytest.mark.parametrize("if_none_match", ["*", "W/{etag}", '"other", {etag}'])
+def test_if_none_match_forms(client, records, if_none_match):
+    etag = client.get("/api/tracking").headers["ETag"]
+    response = client.get("/api/tracking", headers={"If-None-Match": if_none_match.format(etag=etag)})
+    assert response.status_code == 304
+
+
+def test_etag_changes_after_a_write(client, store, records):
+    etag = client.get("/api/tracking/summary").headers["ETag"]
+    store.update_status(records[0].id, "cancelled", "test", "tester")
+    response = client.get("/api/tracking/summary", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["by_status"]["cancelled"] == 1
+
+
+def test_etag_is_per_store_instance(client, store, records, monkeypatch):
+    etag = client.get("/api/tracking").headers["ETag"]
+    # A restarted app starts its counters from scratch; it must not reuse the old tags
+    monkeypatch.setattr(main, "tracking_store", type(store)(store.audit_log))
+    assert client.get("/api/tracking", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_record_etag_is_its_version(client, store, records):
+    record = records[1]
+    response = client.get(f"/api/tracking/{record.id}")
+    assert response.headers["ETag"] == f'"{record.version}"'
+    assert client.get(f"/api/tracking/{record.id}", headers={"If-None-Match": f'"{record.version}"'}).status_code == 304
+    store.update_status(record.id, "cancelled", "test", "tester")
+    response = client.get(f"/api/tracking/{record.id}", headers={"If-None-Match": f'"{record.version}"'})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{record.version + 1}"'
+    assert client.get("/api/tracking/missing", headers={"If-None-Match": "*"}).status_code == 404
+
+
+def test_learning_insights_etag_follows_status_changes(client, store, records, monkeypatch):
+    learning_service = ContraFirmLearningService()
+    monkeypatch.setattr(main, "learning_service", learning_service)
+    etag = client.get("/api/learning/insights").headers["ETag"]
+    assert client.get("/api/learning/insights", headers={"If-None-Match": etag}).status_code == 304
+    store.update_status(records[0].id, "rejected", "Account title mismatch", "tester", learning_service)
+    assert client.get("/api/learning/insights", headers={"If-None-Match": etag}).status_code == 200
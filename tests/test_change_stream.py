@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+
+import main
+from services.change_stream import ChangeBroadcaster, format_sse
+from tests.support import make_request
+
+
+def published_frames(monkeypatch, write, count: int = 1) -> list:
+    """The data of the first `count` frames a subscriber receives while `write` runs."""
+    broadcaster = ChangeBroadcaster()
+    monkeypatch.setattr(main, "change_broadcaster", broadcaster)
+
+    async def receive():
+        subscription = broadcaster.subscribe()
+        write()
+        return [await subscription.next_frame(1) for _ in range(count)]
+
+    return [json.loads(frame.split("data: ", 1)[1]) for frame in asyncio.run(receive())]
+
+
+def test_streamed_records_carry_their_business_day_age(store, monkeypatch):
+    record = store.create(make_request(1))
+    record.created_at = datetime.utcnow() - timedelta(days=30)
+    [data] = published_frames(monkeypatch, lambda: store.save(record))
+    expected = main.aging_service.report(store.aging_columns(), include_records=True)["records"][record.id]
+    assert expected > 0
+    assert data["records"][0]["business_days"] == expected
+
+
+def test_every_subscriber_gets_the_same_frame():
+    async def run():
+        broadcaster = ChangeBroadcaster()
+        first, second = broadcaster.subscribe(), broadcaster.subscribe()
+        broadcaster.publish("created", {"records": [{"id": "a"}]}, event_id=7)
+        return await first.next_frame(1), await second.next_frame(1)
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert first == format_sse("created", {"records": [{"id": "a"}]}, 7)
+    assert first.startswith("id: 7\nevent: created\n")
+
+
+def test_slow_subscriber_is_dropped_with_a_resync():
+    async def run():
+        broadcaster = ChangeBroadcaster(max_queued=3)
+        slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+        received = []
+        for n in range(5):
+            broadcaster.publish("created", {"n": n})
+            received.append(await fast.next_frame(1))
+        return broadcaster, slow, fast, received
+
+    broadcaster, slow, fast, received = asyncio.run(run())
+    assert len(received) == 5 and len(broadcaster) == 1
+    assert slow.closed and not fast.closed
+    assert slow.queue.qsize() == 1
+    assert slow.queue.get_nowait() == ChangeBroadcaster.RESYNC_FRAME
+
+
+def test_publish_from_another_thread():
+    async def run():
+        broadcaster = ChangeBroadcaster()
+        subscription = broadcaster.subscribe()
+        writer = threading.Thread(target=broadcaster.publish, args=("deleted", {"records": [{"id": "a"}]}))
+        writer.start()
+        writer.join()
+        return await subscription.next_frame(1)
+
+    assert asyncio.run(run()).startswith("event: deleted\n")
+
+
+def test_keepalive_and_close():
+    async def run():
+        broadcaster = ChangeBroadcaster()
+        subscription = broadcaster.subscribe()
+        keepalive = await subscription.next_frame(0.01)
+        broadcaster.close()
+        return keepalive, await subscription.next_frame(1), len(broadcaster)
+
+    assert asyncio.run(run()) == (": keepalive\n\n", None, 0)
+
+
+def test_store_writes_are_published(store, monkeypatch):
+    record = store.create(make_request(1))
+    frames = published_frames(monkeypatch, lambda: (
+        store.update_status(record.id, "submitted", "sent", "tester"),
+        store.delete(record.id),
+    ), count=2)
+    assert frames[0]["records"][0]["id"] == record.id
+    assert frames[0]["records"][0]["status"] == "submitted"
+    assert frames[1]["version"] == store.version
+    assert frames[1]["records"][0]["id"] == record.id
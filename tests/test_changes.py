@@ -0,0 +1,90 @@
+import pytest
+
+from models.acat import ACATStatus
+from services.sqlite_store import SQLiteACATStore
+from services.tracking_service import AuditLog, InMemoryACATStore
+from tests.support import make_request, populate
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def changes_store(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryACATStore(AuditLog())
+        return
+    store = SQLiteACATStore(str(tmp_path / "tracking.db"), AuditLog())
+    yield store
+    store.close()
+
+
+def sync(store, since: int, limit: int = 1000) -> dict:
+    """Follow next_since until has_more is off; returns {record id: change} as a client would hold it."""
+    seen = {}
+    while True:
+        changes = store.changes_since(since, limit)
+        assert not changes["resync_required"]
+        seen.update((change["id"], change) for change in changes["changes"])
+        since = changes["next_since"]
+        if not changes["has_more"]:
+            return seen
+
+
+def test_changes_hold_the_latest_state_and_tombstones(changes_store):
+    first, second, third = populate(changes_store, 3)
+    since = changes_store.version
+    changes_store.update_status(first.id, ACATStatus.CANCELLED, "client withdrew", "tester")
+    changes_store.update_status(first.id, ACATStatus.NEW, "reopened", "tester")
+    changes_store.delete(second.id)
+    changes = changes_store.changes_since(since)
+    assert changes["next_since"] == changes["version"] == changes_store.version
+    assert changes["has_more"] is False
+    assert [change["id"] for change in changes["changes"]] == [first.id, second.id]
+    updated, tombstone = changes["changes"]
+    assert updated["deleted"] is False and updated["record"].status == ACATStatus.NEW
+    assert updated["version"] == since + 2
+    assert tombstone == {"id": second.id, "version": since + 3, "deleted": True}
+    assert changes_store.changes_since(changes_store.version)["changes"] == []
+
+
+def test_limited_pages_add_up_to_one_sync(changes_store):
+    records = populate(changes_store, 25)
+    changes_store.update_status_many([(record.id, ACATStatus.PENDING_CLIENT, "batch") for record in records[:10]], "tester")
+    changes_store.delete(records[20].id)
+    paged = sync(changes_store, 0, limit=4)
+    assert paged == sync(changes_store, 0)
+    assert len(paged) == 25
+    assert paged[records[20].id]["deleted"]
+    assert all(paged[record.id]["record"].status == ACATStatus.PENDING_CLIENT for record in records[:10])
+
+
+def test_resync_when_since_is_out_of_reach(changes_store):
+    populate(changes_store, 2)
+    future = changes_store.changes_since(changes_store.version + 5)
+    assert future["resync_required"] and future["changes"] == [] and future["next_since"] is None
+
+
+def test_resync_once_the_change_log_wrapped():
+    store = InMemoryACATStore(AuditLog(), change_log_size=10)
+    populate(store, 20)
+    assert store.changes_since(0)["resync_required"]
+    assert not store.changes_since(store.version - 5)["resync_required"]
+
+
+def test_resync_after_a_bulk_load():
+    source = InMemoryACATStore(AuditLog())
+    populate(source, 3)
+    store = InMemoryACATStore(AuditLog())
+    store.load(source.list())
+    assert store.changes_since(0)["resync_required"]
+    store.create(make_request(9))
+    assert len(store.changes_since(store.version - 1)["changes"]) == 1
+
+
+def test_changes_endpoint(client, store):
+    record = store.create(make_request(1))
+    response = client.get("/api/tracking/changes", params={"since": 0})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["instance_id"] == store.instance_id
+    assert [change["id"] for change in body["changes"]] == [record.id]
+    assert client.get("/api/tracking/changes", params={"since": 99}).json()["resync_required"]
+    assert client.get("/api/tracking/changes", params={"since": -1}).status_code == 422
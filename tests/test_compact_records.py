@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+
+from models.acat import ACATRecord, ACATStatus, CustomerInfo
+from services.compact_records import CompactRecord, from_epoch_us, to_epoch_us
+from tests.support import make_request
+
+
+def full_record() -> ACATRecord:
+    request = make_request(1, quantity=250)
+    request.customer = CustomerInfo(first_name="Ada", last_name="Lovelace", ssn="123-45-6789", tax_id="T-1", date_of_birth=datetime(1980, 5, 17))
+    request.special_instructions = "Call before delivery"
+    request.account_type = "IRA"
+    request.transfer_date = datetime(2024, 3, 4, 9, 30, 15, 123456)
+    return ACATRecord(
+        id="record-1",
+        status=ACATStatus.PENDING_REVIEW,
+        acat_data=request,
+        created_at=datetime(2024, 3, 1, 8, 0, 0, 1),
+        updated_at=datetime(2024, 3, 2, 17, 45),
+        status_history=[
+            {"from_status": "new", "to_status": "submitted", "reason": "sent", "updated_by": "ops", "updated_at": "2024-03-01T09:00:00.000250"},
+            {"from_status": "submitted", "to_status": "pending_review", "reason": "DTCC", "updated_by": "ops", "updated_at": "2024-03-02T17:45:00"},
+        ],
+        version=3,
+    )
+
+
+def test_round_trip_keeps_every_field():
+    record = full_record()
+    assert CompactRecord.from_record(record).to_record().dict() == record.dict()
+
+
+def test_round_trip_keeps_history_timestamps_that_are_not_plain_iso():
+    record = full_record()
+    record.status_history[0]["updated_at"] = "2024-03-01T09:00:00+00:00"
+    record.status_history[1]["updated_at"] = "yesterday"
+    history = CompactRecord.from_record(record).to_record().status_history
+    assert [entry["updated_at"] for entry in history] == ["2024-03-01T09:00:00+00:00", "yesterday"]
+
+
+def test_aware_timestamps_are_stored_as_utc():
+    aware = datetime(2024, 3, 1, 12, 0, tzinfo=timezone(timedelta(hours=-5)))
+    assert from_epoch_us(to_epoch_us(aware)) == datetime(2024, 3, 1, 17, 0)
+
+
+def test_repeated_strings_are_shared():
+    first = CompactRecord.from_record(full_record())
+    second = CompactRecord.from_record(full_record())
+    assert first.contra_firm is second.contra_firm
+    assert first.history[0][2] is second.history[0][2]
+
+
+def test_replace_and_tuple_form():
+    compact = CompactRecord.from_record(full_record())
+    moved = compact.replace(status=ACATStatus.COMPLETED, version=4)
+    assert (moved.status, moved.version) == (ACATStatus.COMPLETED, 4)
+    assert (compact.status, compact.version) == (ACATStatus.PENDING_REVIEW, 3)
+    assert CompactRecord.from_tuple(compact.as_tuple()).to_record().dict() == compact.to_record().dict()
+    assert compact.quantities_by_cusip() == {"037833100": 250}
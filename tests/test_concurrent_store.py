@@ -0,0 +1,81 @@
+import sys
+import threading
+
+import pytest
+
+import main
+from models.acat import ACATStatus
+from services.concurrent_store import ConcurrentACATStore
+from services.tracking_service import AuditLog, DuplicateTransfer, VersionConflict
+from tests.support import make_request, populate
+
+
+@pytest.fixture(autouse=True)
+def frequent_switches():
+    # Switch threads far more often than the default 5ms, so races show up in a short test
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def run_threads(count: int, target) -> list:
+    """Run target(n) on `count` threads released together; returns what each raised (or None)."""
+    barrier = threading.Barrier(count)
+    errors = [None] * count
+
+    def run(n):
+        barrier.wait()
+        try:
+            target(n)
+        except Exception as error:
+            errors[n] = error
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_threaded_updates_lose_nothing():
+    store = ConcurrentACATStore(AuditLog())
+    records = populate(store, 8)
+    versions = {record.id: record.version for record in records}
+    rounds = 50
+
+    def update(n):
+        for i in range(rounds):
+            record = records[(n + i) % len(records)]
+            store.update_status(record.id, ACATStatus.PENDING_CLIENT, f"thread {n}", "tester")
+
+    assert run_threads(8, update) == [None] * 8
+    updates = sum(store.get(record.id).version - versions[record.id] for record in records)
+    assert updates == 8 * rounds
+    assert sum(len(store.get(record.id).status_history) for record in records) == 8 * rounds + sum(
+        len(record.status_history) for record in records
+    )
+    assert len([entry for entry in store.audit_log.get_entries() if entry.details.get("reason", "").startswith("thread")]) == 8 * rounds
+
+
+def test_only_one_writer_wins_an_expected_version():
+    store = ConcurrentACATStore(AuditLog())
+    record = store.create(make_request(1))
+    errors = run_threads(8, lambda n: store.update_status(record.id, ACATStatus.SUBMITTED, f"thread {n}", "tester", expected_version=1))
+    assert sum(error is None for error in errors) == 1
+    assert all(isinstance(error, VersionConflict) for error in errors if error is not None)
+    assert store.get(record.id).version == 2
+
+
+def test_racing_creates_of_one_transfer_keep_one():
+    store = ConcurrentACATStore(AuditLog())
+    errors = run_threads(8, lambda n: store.create(make_request(1), reject_duplicates=True))
+    assert len(store.list()) == 1
+    assert sum(isinstance(error, DuplicateTransfer) for error in errors) == 7
+
+
+def test_striped_store_is_not_a_backend(monkeypatch):
+    monkeypatch.setenv("TRACKING_STORE", "concurrent")
+    with pytest.raises(ValueError):
+        main.create_tracking_store()
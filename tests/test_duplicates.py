@@ -0,0 +1,85 @@
+import pytest
+
+from models.acat import ACATStatus, AssetType, Security
+from services.sqlite_store import SQLiteACATStore
+from services.tracking_service import AuditLog, DuplicateTransfer, InMemoryACATStore, request_fingerprint
+from tests.support import make_request, request_json
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def dedupe_store(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryACATStore(AuditLog())
+        return
+    store = SQLiteACATStore(str(tmp_path / "tracking.db"), AuditLog())
+    yield store
+    store.close()
+
+
+def with_securities(n: int, *lots):
+    request = make_request(n)
+    request.securities = [
+        Security(cusip=cusip, symbol="X", description="Test security", quantity=quantity, asset_type=AssetType.EQUITY)
+        for cusip, quantity in lots
+    ]
+    return request
+
+
+def test_fingerprint_ignores_security_order():
+    first = with_securities(1, ("037833100", 10), ("594918104", 3))
+    assert request_fingerprint(first) == request_fingerprint(with_securities(1, ("594918104", 3), ("037833100", 10)))
+    assert request_fingerprint(first) == request_fingerprint(with_securities(1, ("037833100", 4), ("594918104", 3), ("037833100", 6)))
+    assert request_fingerprint(first) != request_fingerprint(with_securities(1, ("037833100", 11), ("594918104", 3)))
+    assert request_fingerprint(first) != request_fingerprint(with_securities(2, ("037833100", 10), ("594918104", 3)))
+
+
+def test_in_flight_duplicates_are_rejected(dedupe_store):
+    record = dedupe_store.create(with_securities(1, ("037833100", 10), ("594918104", 3)))
+    assert dedupe_store.find_duplicate(with_securities(1, ("594918104", 3), ("037833100", 10))) == record.id
+    with pytest.raises(DuplicateTransfer) as duplicate:
+        dedupe_store.create(with_securities(1, ("594918104", 3), ("037833100", 10)), reject_duplicates=True)
+    assert duplicate.value.existing_id == record.id
+    assert len(dedupe_store.list()) == 1
+
+
+def test_closed_transfers_do_not_block(dedupe_store):
+    record = dedupe_store.create(make_request(1))
+    dedupe_store.update_status(record.id, ACATStatus.REJECTED, "bad account", "tester")
+    assert dedupe_store.find_duplicate(make_request(1)) is None
+    retry = dedupe_store.create(make_request(1), reject_duplicates=True)
+    # Reopening the rejected one makes the earliest in-flight record the match again
+    dedupe_store.update_status(record.id, ACATStatus.PENDING_REVIEW, "reopened", "tester")
+    assert dedupe_store.find_duplicate(make_request(1)) == record.id
+    dedupe_store.delete(record.id)
+    assert dedupe_store.find_duplicate(make_request(1)) == retry.id
+
+
+def test_duplicate_groups(dedupe_store):
+    first = dedupe_store.create(make_request(1))
+    second = dedupe_store.create(make_request(1))
+    closed = dedupe_store.create(make_request(2))
+    reopened = dedupe_store.create(make_request(2))
+    dedupe_store.update_status(closed.id, ACATStatus.COMPLETED, "settled", "tester")
+    dedupe_store.create(make_request(3))
+    groups = dedupe_store.duplicate_groups()
+    assert [[entry["id"] for entry in group["records"]] for group in groups] == [[first.id, second.id]]
+    groups = dedupe_store.duplicate_groups(include_closed=True)
+    assert [[entry["id"] for entry in group["records"]] for group in groups] == [[first.id, second.id], [closed.id, reopened.id]]
+    assert groups[1]["records"][0]["status"] == ACATStatus.COMPLETED
+
+
+def test_duplicate_create_is_409(client, store):
+    created = client.post("/api/tracking", json=request_json(1))
+    assert created.status_code == 200
+    duplicate = client.post("/api/tracking", json=request_json(1))
+    assert duplicate.status_code == 409
+    assert duplicate.headers["Location"] == f"/api/tracking/{created.json()['id']}"
+
+
+def test_duplicates_endpoint(client, store):
+    store.create(make_request(1))
+    store.create(make_request(1))
+    store.create(make_request(1))
+    body = client.get("/api/tracking/duplicates").json()
+    assert (body["groups"], body["duplicate_records"]) == (1, 2)
+    assert len(body["duplicates"][0]["records"]) == 3
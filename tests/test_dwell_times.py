@@ -0,0 +1,120 @@
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+import main
+from models.acat import ACATStatus
+from services.dwell_analytics import DwellTimeAnalytics, grouped_percentiles
+from tests.support import FIRMS, make_request
+
+PATH = [ACATStatus.NEW, ACATStatus.SUBMITTED, ACATStatus.PENDING_REVIEW, ACATStatus.PENDING_CLIENT, ACATStatus.COMPLETED]
+
+
+def with_history(store, n: int, hours, start: datetime = datetime(2024, 1, 1)):
+    """A record that stayed hours[i] in PATH[i], created at `start` plus n hours."""
+    record = store.create(make_request(n, contra_firm=FIRMS[n % 3], quantity=n + 1))
+    record.created_at = entered = start + timedelta(hours=n)
+    history = []
+    for from_status, to_status, stay in zip(PATH, PATH[1:], hours):
+        entered += timedelta(hours=stay)
+        history.append({"from_status": from_status, "to_status": to_status, "reason": "test", "updated_by": "tester", "updated_at": entered.isoformat()})
+    record.status_history = history
+    record.status = PATH[len(history)]
+    return store.save(record)
+
+
+def expected_stays(records):
+    """(status, contra firm, hours) of every completed stay, straight from the histories."""
+    stays = []
+    for record in records:
+        entered = record.created_at
+        for entry in record.status_history:
+            left = datetime.fromisoformat(entry["updated_at"])
+            stays.append((entry["from_status"], record.acat_data.contra_firm, (left - entered) / timedelta(hours=1)))
+            entered = left
+    return stays
+
+
+@pytest.fixture
+def records(store):
+    rng = np.random.default_rng(7)
+    return [with_history(store, n, rng.uniform(0, 200, size=rng.integers(0, 5)).round(3)) for n in range(60)]
+
+
+def test_grouped_percentiles_match_numpy():
+    rng = np.random.default_rng(3)
+    keys = rng.integers(0, 6, size=500)
+    values = rng.exponential(30, size=500)
+    groups, counts, means, quantiles = grouped_percentiles(keys, values, (0, 25, 50, 90, 99.5, 100))
+    for group, count, mean, row in zip(groups, counts, means, quantiles):
+        selected = values[keys == group]
+        assert count == selected.size
+        assert mean == pytest.approx(selected.mean())
+        assert row == pytest.approx(np.percentile(selected, (0, 25, 50, 90, 99.5, 100)))
+
+
+def test_report_matches_the_histories(store, records):
+    report = DwellTimeAnalytics(store).report(percentiles=(50, 90))
+    by_status = defaultdict(list)
+    by_firm = defaultdict(list)
+    for status, firm, hours in expected_stays(records):
+        by_status[status].append(hours)
+        by_firm[status, firm].append(hours)
+    assert report["stays"] == sum(len(hours) for hours in by_status.values())
+    for status, hours in by_status.items():
+        stats = report["by_status"][status]
+        assert stats["count"] == len(hours)
+        assert stats["mean"] == pytest.approx(np.mean(hours), abs=0.01)
+        assert [stats["p50"], stats["p90"]] == pytest.approx(np.percentile(hours, (50, 90)), abs=0.01)
+    for (status, firm), hours in by_firm.items():
+        assert report["by_status_and_contra_firm"][status][firm]["p50"] == pytest.approx(np.percentile(hours, 50), abs=0.01)
+    assert set(report["by_status_and_week"][ACATStatus.NEW.value]) == {"2024-01-01"}
+
+
+def test_report_filters(store, records):
+    analytics = DwellTimeAnalytics(store)
+    stays = expected_stays(records)
+    report = analytics.report(status=ACATStatus.SUBMITTED, contra_firm="4567")
+    assert report["stays"] == sum(1 for status, firm, _ in stays if status == ACATStatus.SUBMITTED and firm == "4567")
+    assert list(report["by_status"]) == [ACATStatus.SUBMITTED.value]
+    assert analytics.report(contra_firm="9999")["stays"] == 0
+    assert analytics.report(since=date(2030, 1, 1))["stays"] == 0
+
+
+def test_incremental_refresh_matches_a_rebuild(store, records):
+    analytics = DwellTimeAnalytics(store, batch_size=7)
+    analytics.report()
+    store.update_status(records[0].id, ACATStatus.REJECTED, "bad", "tester")
+    store.delete(records[1].id)
+    rewritten = store.get(records[2].id)
+    rewritten.status_history = rewritten.status_history[:1]
+    store.save(rewritten)
+    with_history(store, 100, [5, 6, 7])
+    assert analytics.refresh()
+    assert not analytics.refresh()
+    assert analytics.report() == DwellTimeAnalytics(store).report()
+    assert len(analytics) == len(expected_stays(store.list()))
+
+
+def test_bad_percentiles_are_400(client, store):
+    assert client.get("/api/tracking/dwell-times", params={"percentiles": "50,abc"}).status_code == 400
+    assert client.get("/api/tracking/dwell-times", params={"percentiles": "101"}).status_code == 400
+
+
+def test_report_is_built_off_the_event_loop(client, monkeypatch):
+    report = main.dwell_analytics.report
+    loops = []
+
+    def recording_report(**options):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return report(**options)
+
+    monkeypatch.setattr(main.dwell_analytics, "report", recording_report)
+    assert client.get("/api/tracking/dwell-times").status_code == 200
+    assert loops == [None]
@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+
+import pytest
+
+from main import EXPORT_CSV_COLUMNS
+from tests.support import populate
+
+
+@pytest.fixture
+def records(store):
+    return populate(store, 30)
+
+
+def test_ndjson_export_has_every_record(client, store, records):
+    response = client.get("/api/tracking/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["id"] for record in exported] == [record.id for record in store.query()]
+    assert exported[0]["acat_data"]["contra_firm"] == store.query()[0].acat_data.contra_firm
+
+
+def test_csv_export_rows(client, records):
+    response = client.get("/api/tracking/export", params={"format": "csv"})
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == 'attachment; filename="acats.csv"'
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == EXPORT_CSV_COLUMNS
+    by_id = {row[0]: dict(zip(EXPORT_CSV_COLUMNS, row)) for row in rows[1:]}
+    assert by_id.keys() == {record.id for record in records}
+    record = records[4]
+    row = by_id[record.id]
+    assert row["status"] == record.status.value
+    assert row["securities"] == f"037833100:{record.acat_data.securities[0].quantity}"
+    assert row["status_changes"] == str(len(record.status_history))
+
+
+def test_export_keeps_filters(client, store, records):
+    response = client.get("/api/tracking/export", params={"contra_firm": "8901", "status": "completed"})
+    exported = [json.loads(line)["id"] for line in response.text.splitlines()]
+    assert exported == [record.id for record in store.query(contra_firm="8901", status="completed")]
+    assert exported
+
+
+def test_export_spans_several_batches(client, store):
+    populate(store, 1200)
+    response = client.get("/api/tracking/export", params={"format": "csv"})
+    assert len(response.text.splitlines()) == 1201
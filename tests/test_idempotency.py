@@ -0,0 +1,129 @@
+import threading
+
+import pytest
+
+import main
+from models.acat import ACATRequest
+from services.learning_service import ContraFirmLearningService
+from services.idempotency import IdempotencyCache, StoredResponse
+from services.shared_state import SharedStateDB, SQLiteIdempotencyCache
+from tests.support import make_request, request_json
+
+
+@pytest.fixture(params=["memory", "shared"])
+def caches(request, tmp_path):
+    """Two handles on one idempotency cache, as two workers would have."""
+    if request.param == "memory":
+        cache = IdempotencyCache()
+        return cache, cache
+    path = str(tmp_path / "shared.db")
+    return SQLiteIdempotencyCache(SharedStateDB(path)), SQLiteIdempotencyCache(SharedStateDB(path))
+
+
+def test_only_one_concurrent_request_reserves_a_key(caches):
+    results = []
+    barrier = threading.Barrier(8)
+
+    def reserve(cache):
+        barrier.wait()
+        results.append(cache.reserve("tracking key-1", "hash"))
+
+    threads = [threading.Thread(target=reserve, args=(caches[n % 2],)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(None) == 1
+    assert all(result.in_progress for result in results if result is not None)
+
+
+def test_reservation_is_replaced_by_the_response_or_released(caches):
+    first, second = caches
+    assert first.reserve("tracking key-1", "hash") is None
+    first.put("tracking key-1", StoredResponse("hash", 200, {"id": "record-1"}))
+    # Releasing after the response is stored keeps the response
+    first.release("tracking key-1")
+    assert second.reserve("tracking key-1", "hash") == StoredResponse("hash", 200, {"id": "record-1"})
+
+    assert first.reserve("tracking key-2", "hash") is None
+    first.release("tracking key-2")
+    assert second.reserve("tracking key-2", "hash") is None
+
+
+def test_reservation_lapses():
+    now = [0.0]
+    cache = IdempotencyCache(reservation_seconds=10, clock=lambda: now[0])
+    assert cache.reserve("tracking key-1", "hash") is None
+    now[0] = 11
+    assert cache.reserve("tracking key-1", "hash") is None
+
+
+def test_request_with_a_key_in_progress_gets_409(client, store):
+    body = request_json(1)
+    main.idempotency_cache.reserve("tracking key-1", main._request_hash(ACATRequest.parse_obj(body)))
+    response = client.post("/api/tracking", json=body, headers={"Idempotency-Key": "key-1"})
+    assert response.status_code == 409
+    assert response.headers["Retry-After"] == "1"
+    assert len(store) == 0
+
+
+def test_failed_request_gives_its_key_back(client, store):
+    existing = store.create(make_request(1))
+    response = client.post("/api/tracking", json=request_json(1), headers={"Idempotency-Key": "key-1"})
+    assert response.status_code == 409
+    store.delete(existing.id)
+    response = client.post("/api/tracking", json=request_json(1), headers={"Idempotency-Key": "key-1"})
+    assert response.status_code == 200
+    assert "Idempotent-Replayed" not in response.headers
+
+
+def test_cache_entries_expire_and_are_bounded():
+    now = [0.0]
+    cache = IdempotencyCache(max_entries=2, ttl_seconds=60, clock=lambda: now[0])
+    for n in range(3):
+        cache.put(f"key-{n}", StoredResponse("hash", 200, n))
+    assert cache.get("key-0") is None and len(cache) == 2
+    assert cache.get("key-1").body == 1
+    cache.put("key-3", StoredResponse("hash", 200, 3))
+    # key-1 was used more recently than key-2
+    assert cache.get("key-2") is None and cache.get("key-1").body == 1
+    now[0] = 61
+    assert cache.get("key-1") is None
+
+
+def test_retry_replays_the_first_response(client, store):
+    body = request_json(1)
+    del body["transfer_date"]  # defaults to now, so it differs between the two requests
+    first = client.post("/api/tracking", json=body, headers={"Idempotency-Key": "key-1"})
+    retry = client.post("/api/tracking", json=body, headers={"Idempotency-Key": "key-1"})
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert len(store) == 1
+
+
+def test_key_reused_with_another_body_is_422(client, store):
+    client.post("/api/tracking", json=request_json(1), headers={"Idempotency-Key": "key-1"})
+    response = client.post("/api/tracking", json=request_json(2), headers={"Idempotency-Key": "key-1"})
+    assert response.status_code == 422
+    assert len(store) == 1
+
+
+@pytest.mark.parametrize("key", ["", "k" * 256])
+def test_key_length_is_checked(client, store, key):
+    assert client.post("/api/tracking", json=request_json(1), headers={"Idempotency-Key": key}).status_code == 400
+
+
+def test_submission_retry_runs_nothing_twice(client, store, monkeypatch):
+    learning_service = ContraFirmLearningService()
+    monkeypatch.setattr(main, "learning_service", learning_service)
+    body = {"acat_data": request_json(1), "accepted_suggestions": ["contra_firm"]}
+    first = client.post("/api/submit-acat", json=body, headers={"Idempotency-Key": "key-1"})
+    retry = client.post("/api/submit-acat", json=body, headers={"Idempotency-Key": "key-1"})
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(store) == 1
+    assert learning_service.get_firm_preferences("0123")["total_submissions"] == 1
+    # Keys are per endpoint
+    assert client.post("/api/tracking", json=request_json(2), headers={"Idempotency-Key": "key-1"}).status_code == 200
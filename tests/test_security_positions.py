@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import pytest
+
+from models.acat import ACATStatus, AssetType, Security
+from services.sqlite_store import SQLiteACATStore
+from services.tracking_service import IN_FLIGHT_STATUSES, AuditLog, InMemoryACATStore
+from tests.support import make_request, populate
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def positions_store(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryACATStore(AuditLog())
+        return
+    store = SQLiteACATStore(str(tmp_path / "tracking.db"), AuditLog())
+    yield store
+    store.close()
+
+
+def two_lot_request(n: int):
+    """A transfer listing the same CUSIP twice (two tax lots) next to another security."""
+    request = make_request(n, cusip="38259P508", quantity=5)
+    request.securities += [
+        Security(cusip="38259P508", symbol="GOOG", description="Alphabet Inc", quantity=7, asset_type=AssetType.EQUITY),
+        Security(cusip="594918104", symbol="MSFT", description="Microsoft", quantity=3, asset_type=AssetType.EQUITY),
+    ]
+    return request
+
+
+def test_positions_follow_the_index(positions_store):
+    records = populate(positions_store, 12)
+    lots = positions_store.create(two_lot_request(20))
+    positions = positions_store.security_positions("037833100")
+    expected = sorted(records, key=lambda record: (record.created_at, record.id))
+    assert [position["id"] for position in positions] == [record.id for record in expected]
+    assert [position["quantity"] for position in positions] == [record.acat_data.securities[0].quantity for record in expected]
+    assert positions[0]["created_at"] == expected[0].created_at
+    [lot_position] = positions_store.security_positions("38259p508")
+    assert (lot_position["id"], lot_position["quantity"]) == (lots.id, 12)
+    assert positions_store.security_positions("000000000") == []
+
+
+def test_positions_follow_status_changes_and_deletes(positions_store):
+    records = populate(positions_store, 10)
+    in_flight = [record.id for record in sorted(records, key=lambda record: (record.created_at, record.id)) if record.status in IN_FLIGHT_STATUSES]
+    assert [position["id"] for position in positions_store.security_positions("037833100", IN_FLIGHT_STATUSES)] == in_flight
+    positions_store.update_status(in_flight[0], ACATStatus.COMPLETED, "settled", "tester")
+    positions_store.delete(in_flight[1])
+    assert [position["id"] for position in positions_store.security_positions("037833100", IN_FLIGHT_STATUSES)] == in_flight[2:]
+    [completed] = [p for p in positions_store.security_positions("037833100", [ACATStatus.COMPLETED]) if p["id"] == in_flight[0]]
+    assert completed["status"] == ACATStatus.COMPLETED
+    assert in_flight[1] not in {position["id"] for position in positions_store.security_positions("037833100")}
+
+
+def test_security_endpoint(client, store):
+    records = populate(store, 10, start=datetime(2024, 1, 1))
+    store.create(two_lot_request(20))
+    body = client.get("/api/securities/037833100/acats").json()
+    assert body["cusip"] == "037833100"
+    assert body["transfers"] == 10
+    assert body["total_quantity"] == sum(record.acat_data.securities[0].quantity for record in records)
+    in_flight = client.get("/api/securities/037833100/acats", params={"in_flight": True}).json()
+    assert in_flight["transfers"] == sum(record.status in IN_FLIGHT_STATUSES for record in records)
+    assert {acat["status"] for acat in in_flight["acats"]} <= {status.value for status in IN_FLIGHT_STATUSES}
+    lots = client.get("/api/securities/38259p508/acats").json()
+    assert (lots["cusip"], lots["transfers"], lots["total_quantity"]) == ("38259P508", 1, 12)
@@ -0,0 +1,76 @@
+import pytest
+
+import main
+from models.acat import ACATStatus
+from services.shared_state import SharedStateDB, SQLiteAuthService, SQLiteLearningService
+from services.sqlite_store import SQLiteACATStore
+from services.tracking_service import AuditLog
+from tests.support import make_request
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two handles on one shared database, as two uvicorn workers would have."""
+    path = str(tmp_path / "shared.db")
+    first, second = SharedStateDB(path), SharedStateDB(path)
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_sessions_are_valid_on_every_worker(workers):
+    first, second = (SQLiteAuthService(db) for db in workers)
+    assert len(first.get_all_users()) == len(second.get_all_users()) == 3
+    user = first.authenticate("owner", "test")
+    session_id = first.create_session(user)
+    assert second.get_user_from_session(session_id).username == "owner"
+    assert second.get_user_from_session("missing") is None
+
+
+def test_user_changes_are_shared(workers):
+    first, second = (SQLiteAuthService(db) for db in workers)
+    created = first.create_user("clerk", "secret", "Test", "Clerk", "clerk@vanta.com")
+    assert second.create_user("clerk", "other", "Other", "Clerk", "other@vanta.com") is None
+    assert second.authenticate("clerk", "secret") is None  # not approved yet
+    assert second.approve_user(created.id, "owner")
+    session_id = first.create_session(first.authenticate("clerk", "secret"))
+    assert first.reject_user(created.id)
+    assert second.get_user_from_session(session_id) is None
+
+
+def test_learning_data_is_shared(workers):
+    first, second = (SQLiteLearningService(db) for db in workers)
+    assert first.instance_id == second.instance_id
+    version = second.version
+    first.record_status_changes([("0123", "submitted", "rejected", "Invalid account title")])
+    first.record_validation_result("0123", {"suggestions": []}, was_accepted=True)
+    assert second.version == version + 2
+    preferences = second.get_firm_preferences("0123")
+    assert preferences["total_submissions"] == 1 and preferences["success_rate"] == 1.0
+    assert preferences["common_rejections"]["status_change"] == 1
+    assert second.export_learning_data()["firm_preferences"] == first.export_learning_data()["firm_preferences"]
+
+
+def test_only_one_worker_claims_a_job(workers):
+    first, second = workers
+    assert first.claim("seed demo data")
+    assert not second.claim("seed demo data")
+    assert not first.claim("seed demo data")
+    assert second.claim("something else")
+
+
+def test_tracking_records_are_shared(workers):
+    first, second = (SQLiteACATStore(db.path, AuditLog()) for db in workers)
+    record = first.create(make_request(1))
+    second.update_status(record.id, ACATStatus.SUBMITTED, "sent", "tester")
+    assert first.get(record.id).status == ACATStatus.SUBMITTED
+    assert first.version == second.version
+    assert [change["id"] for change in first.changes_since(0)["changes"]] == [record.id]
+    first.close()
+    second.close()
+
+
+def test_shared_state_needs_the_sqlite_store(workers, monkeypatch):
+    monkeypatch.setenv("TRACKING_STORE", "memory")
+    with pytest.raises(ValueError):
+        main.create_tracking_store(workers[0])
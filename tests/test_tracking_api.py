@@ -0,0 +1,52 @@
+import base64
+
+import pytest
+
+from tests.support import populate
+
+
+@pytest.fixture
+def records(store):
+    return populate(store, 45)
+
+
+def test_cursor_pages_cover_every_record_once(client, records):
+    seen, cursor = [], None
+    while True:
+        response = client.get("/api/tracking", params={"limit": 10, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 10
+        seen.extend(record["id"] for record in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    expected = [record.id for record in sorted(records, key=lambda record: (record.created_at, record.id))]
+    assert seen == expected
+
+
+def test_cursor_pages_keep_filters(client, records):
+    response = client.get("/api/tracking", params={"contra_firm": "4567", "limit": 4})
+    second = client.get("/api/tracking", params={"contra_firm": "4567", "limit": 4, "cursor": response.headers["X-Next-Cursor"]})
+    page_ids = [record["id"] for record in response.json() + second.json()]
+    assert len(set(page_ids)) == 8
+    assert {record["acat_data"]["contra_firm"] for record in response.json() + second.json()} == {"4567"}
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", base64.urlsafe_b64encode(b'["yesterday", "x"]').decode(), "W10"])
+def test_bad_cursor_is_400(client, records, cursor):
+    response = client.get("/api/tracking", params={"limit": 10, "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_fields_projection(client, records):
+    response = client.get("/api/tracking", params={"fields": "id,status,acat_data.contra_firm", "limit": 3})
+    assert response.status_code == 200
+    for record in response.json():
+        assert set(record) == {"id", "status", "acat_data"}
+        assert set(record["acat_data"]) == {"contra_firm"}
+
+
+@pytest.mark.parametrize("fields", ["id,nope", "acat_data.nope", "status.value"])
+def test_unknown_field_is_400(client, records, fields):
+    assert client.get("/api/tracking", params={"fields": fields}).status_code == 400
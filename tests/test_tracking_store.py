@@ -0,0 +1,94 @@
+from collections import Counter
+from datetime import datetime
+from itertools import product
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from models.acat import ACATStatus
+from services.tracking_service import AuditLog, InMemoryACATStore, summarize_status_counts
+from tests.support import FIRMS, populate
+
+
+def matching(records, status=None, contra_firm=None, delivering_account=None, created_after=None, created_before=None):
+    """What query() should return, found by scanning."""
+    return sorted(
+        (
+            record for record in records
+            if (status is None or record.status == status)
+            and (contra_firm is None or record.acat_data.contra_firm == contra_firm)
+            and (delivering_account is None or record.acat_data.delivering_account == delivering_account)
+            and (created_after is None or record.created_at >= created_after)
+            and (created_before is None or record.created_at < created_before)
+        ),
+        key=lambda record: (record.created_at, record.id),
+    )
+
+
+@pytest.fixture
+def populated():
+    store = InMemoryACATStore(AuditLog())
+    populate(store, 60)
+    return store
+
+
+@pytest.mark.parametrize("status,contra_firm,delivering_account,created_after,created_before", product(
+    (None, ACATStatus.COMPLETED, ACATStatus.NEW),
+    (None, FIRMS[1]),
+    (None, "DEL100003"),
+    (None, datetime(2024, 1, 4)),
+    (None, datetime(2024, 1, 9)),
+))
+def test_query_matches_a_scan(populated, status, contra_firm, delivering_account, created_after, created_before):
+    filters = dict(status=status, contra_firm=contra_firm, delivering_account=delivering_account,
+                   created_after=created_after, created_before=created_before)
+    expected = [record.id for record in matching(populated.list(), **filters)]
+    assert [record.id for record in populated.query(**filters)] == expected
+
+
+def test_query_follows_status_changes_and_deletes(populated):
+    record = populated.query(status=ACATStatus.NEW)[0]
+    populated.update_status(record.id, ACATStatus.CANCELLED, "test", "tester")
+    assert record.id not in {found.id for found in populated.query(status=ACATStatus.NEW)}
+    assert record.id in {found.id for found in populated.query(status=ACATStatus.CANCELLED)}
+
+    populated.delete(record.id)
+    assert populated.query(status=ACATStatus.CANCELLED) == []
+    assert record.id not in {found.id for found in populated.query(contra_firm=record.acat_data.contra_firm)}
+
+
+def test_unknown_value_matches_nothing(populated):
+    assert populated.query(contra_firm="9999") == []
+    assert populated.query(created_after=datetime(2030, 1, 1)) == []
+
+
+def recomputed_summary(records):
+    counts, by_firm = Counter(), {}
+    for record in records:
+        counts[record.status] += 1
+        by_firm.setdefault(record.acat_data.contra_firm, Counter())[record.status] += 1
+    return {**summarize_status_counts(counts), "by_contra_firm": {
+        firm: summarize_status_counts(firm_counts) for firm, firm_counts in sorted(by_firm.items())
+    }}
+
+
+def test_summary_counters_follow_every_write(populated):
+    assert populated.summary() == recomputed_summary(populated.list())
+    records = populated.list()
+    populated.update_status_many([(record.id, ACATStatus.COMPLETED, "test") for record in records[:10]], "tester")
+    for record in records[10:25]:
+        populated.delete(record.id)
+    saved = records[30]
+    saved.status = ACATStatus.REJECTED
+    populated.save(saved)
+    summary = populated.summary()
+    assert summary == recomputed_summary(populated.list())
+    assert summary["total"] == 45
+    assert summary["success_rate"] == summary["completed"] / 45
+
+
+def test_summary_endpoint(client, store):
+    populate(store, 12)
+    response = client.get("/api/tracking/summary")
+    assert response.status_code == 200
+    assert response.json() == jsonable_encoder(recomputed_summary(store.list()))
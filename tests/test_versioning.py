@@ -0,0 +1,76 @@
+import pytest
+
+from models.acat import ACATStatus
+from services.sqlite_store import SQLiteACATStore
+from services.tracking_service import AuditLog, InMemoryACATStore, VersionConflict
+from tests.support import make_request
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def versioned_store(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryACATStore(AuditLog())
+        return
+    store = SQLiteACATStore(str(tmp_path / "tracking.db"), AuditLog())
+    yield store
+    store.close()
+
+
+def test_every_change_bumps_the_version(versioned_store):
+    record = versioned_store.create(make_request(1))
+    assert record.version == 1
+    updated = versioned_store.update_status(record.id, ACATStatus.SUBMITTED, "sent", "tester", expected_version=1)
+    assert updated.version == 2
+    assert versioned_store.record_version(record.id) == 2
+
+
+def test_stale_version_is_rejected_and_nothing_changes(versioned_store):
+    record = versioned_store.create(make_request(1))
+    other = versioned_store.create(make_request(2))
+    versioned_store.update_status(record.id, ACATStatus.SUBMITTED, "sent", "first clerk")
+    audited = len(versioned_store.audit_log.get_entries())
+    with pytest.raises(VersionConflict) as conflict:
+        versioned_store.update_status_many(
+            [(other.id, ACATStatus.SUBMITTED, "sent"), (record.id, ACATStatus.REJECTED, "bad")],
+            "second clerk",
+            expected_versions={other.id: 1, record.id: 1},
+        )
+    assert (conflict.value.record_id, conflict.value.expected, conflict.value.actual) == (record.id, 1, 2)
+    assert versioned_store.get(record.id).status == ACATStatus.SUBMITTED
+    assert versioned_store.get(other.id).status == ACATStatus.NEW
+    assert len(versioned_store.audit_log.get_entries()) == audited
+
+
+def status_change(client, record_id, headers=None, **body):
+    return client.patch(
+        f"/api/tracking/{record_id}/status",
+        json={"status": "submitted", "reason": "sent", "updated_by": "tester", **body},
+        headers=headers or {},
+    )
+
+
+def test_expected_version_conflict_is_409(client, store):
+    record = store.create(make_request(1))
+    first = status_change(client, record.id, expected_version=1)
+    assert first.status_code == 200
+    assert first.headers["ETag"] == '"2"'
+    second = status_change(client, record.id, expected_version=1, status="rejected")
+    assert second.status_code == 409
+    assert second.headers["ETag"] == '"2"'
+    assert store.get(record.id).status == ACATStatus.SUBMITTED
+
+
+@pytest.mark.parametrize("if_match, status_code", [('"1"', 200), ('W/"1"', 200), ("1", 200), ("*", 200), ('"7"', 409), ("soon", 400)])
+def test_if_match(client, store, if_match, status_code):
+    record = store.create(make_request(1))
+    assert status_change(client, record.id, headers={"If-Match": if_match}).status_code == status_code
+
+
+def test_body_version_wins_over_if_match(client, store):
+    record = store.create(make_request(1))
+    response = status_change(client, record.id, headers={"If-Match": '"7"'}, expected_version=1)
+    assert response.status_code == 200
+
+
+def test_unknown_record_is_404(client, store):
+    assert status_change(client, "missing", expected_version=1).status_code == 404